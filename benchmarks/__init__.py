@@ -0,0 +1 @@
+"""Micro- and load benchmarks (run as python -m benchmarks.<name>)."""
@@ -0,0 +1,75 @@
+"""Benchmark the latency MMR reranking adds to a vector-store query.
+
+Usage: python -m benchmarks.bench_mmr [--dim 768] [--fetch-k 20,50,100] [--k 5] [--max-ms 5]
+
+Times ingest.rerank.rerank_results on synthetic Chroma-shaped results (one
+query row of fetch_k candidates with embeddings). Exits 1 if any p95 exceeds
+--max-ms.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from ingest.rerank import rerank_results
+
+
+def _synthetic_result(rng: np.random.Generator, fetch_k: int, dim: int) -> tuple[dict, np.ndarray]:
+    emb = rng.standard_normal((fetch_k, dim)).astype(np.float32)
+    emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+    q = rng.standard_normal(dim).astype(np.float32)
+    q /= np.linalg.norm(q)
+    distances = np.sort(2.0 - 2.0 * (emb @ q))
+    result = {
+        "ids": [[f"chunk_{i}" for i in range(fetch_k)]],
+        "documents": [[f"doc {i}" for i in range(fetch_k)]],
+        "metadatas": [[{"path": f"f{i}.py"} for i in range(fetch_k)]],
+        "distances": [distances.tolist()],
+        "embeddings": [list(emb)],
+        "included": ["documents", "metadatas", "distances", "embeddings"],
+    }
+    return result, q
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--fetch-k", default="20,50,100")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--lambda", dest="lambda_mult", type=float, default=0.5)
+    parser.add_argument("--runs", type=int, default=300)
+    parser.add_argument("--max-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'fetch_k':>8} {'k':>4} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    worst_p95 = 0.0
+    for fetch_k in (int(x) for x in args.fetch_k.split(",")):
+        result, q = _synthetic_result(rng, fetch_k, args.dim)
+        for _ in range(10):  # warm-up
+            rerank_results(result, args.k, args.lambda_mult, query_embeddings=[q])
+        samples = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            rerank_results(result, args.k, args.lambda_mult, query_embeddings=[q])
+            samples.append((time.perf_counter() - start) * 1000)
+        p95 = _percentile(samples, 95)
+        worst_p95 = max(worst_p95, p95)
+        print(f"{fetch_k:>8} {args.k:>4} {statistics.median(samples):>8.3f} {p95:>8.3f} {max(samples):>8.3f}")
+    if worst_p95 > args.max_ms:
+        print(f"FAIL: p95 {worst_p95:.3f} ms exceeds {args.max_ms} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
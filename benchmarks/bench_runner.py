@@ -0,0 +1,156 @@
+"""Benchmark Runner POST /execute throughput and latency under increasing concurrency.
+
+Usage: python -m benchmarks.bench_runner [--concurrency 1,4,16] [--requests 64]
+       [--transport inprocess,uvicorn] [--max-error-rate 0]
+
+Drives runner.app with trivial `python -c` commands, in-process (httpx ASGI
+transport) and over a local uvicorn server, keeping --concurrency requests
+in flight. Every request has its own argv, so none is answered from the
+result cache or coalesced with another. The Runner takes its usual RUNNER_*
+settings from the environment (RUNNER_MAX_QUEUE defaults to the highest
+concurrency here, so a full queue does not count as an error). Prints
+p50/p95/p99 latency, throughput and error rate per level; exits 1 if any
+error rate exceeds --max-error-rate.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from runner.app import app
+
+SCRIPT = "import sys; print(sys.argv[1])"
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _level(
+    client: httpx.AsyncClient, project: str, concurrency: int, requests: int, tag: str
+) -> tuple[list[float], int, float]:
+    """(latencies ms, errors, wall seconds) for requests POSTs with concurrency in flight."""
+    pending = iter(range(requests))
+    samples: list[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in pending:
+            command = [sys.executable, "-c", SCRIPT, f"{tag}-{i}"]
+            body = {"project_path": project, "command": command, "use_cache": False}
+            start = time.perf_counter()
+            try:
+                response = await client.post("/execute", json=body)
+                ok = response.status_code == 200 and response.json()["exit_code"] == 0
+            except httpx.HTTPError:
+                ok = False
+            samples.append((time.perf_counter() - start) * 1000)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, errors, time.perf_counter() - start
+
+
+async def _bench(client: httpx.AsyncClient, name: str, project: str, args: argparse.Namespace) -> float:
+    """Print one row per concurrency level; returns the worst error rate."""
+    await _level(client, project, 1, 3, f"{name}-warmup")
+    worst = 0.0
+    for concurrency in args.levels:
+        samples, errors, wall = await _level(client, project, concurrency, args.requests, f"{name}-{concurrency}")
+        error_rate = errors / len(samples)
+        worst = max(worst, error_rate)
+        print(
+            f"{name:<10} {concurrency:>5} {len(samples):>6} {len(samples) / wall:>8.1f}"
+            f" {statistics.median(samples):>8.1f} {_percentile(samples, 95):>8.1f} {_percentile(samples, 99):>8.1f}"
+            f" {error_rate:>7.1%}"
+        )
+    return worst
+
+
+async def _inprocess(project: str, args: argparse.Namespace) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://runner", timeout=args.timeout) as client:
+        return await _bench(client, "inprocess", project, args)
+
+
+async def _uvicorn(project: str, args: argparse.Namespace) -> float:
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "runner.app:app", "--host", "127.0.0.1", "--port", str(port)]
+        + ["--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+    )
+    limits = httpx.Limits(max_connections=max(args.levels), max_keepalive_connections=max(args.levels))
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise SystemExit("uvicorn did not start")
+                await asyncio.sleep(0.1)
+            return await _bench(client, "uvicorn", project, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level")
+    parser.add_argument("--transport", default="inprocess,uvicorn")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    args.levels = [int(x) for x in args.concurrency.split(",")]
+
+    with tempfile.TemporaryDirectory(prefix="bench-runner-") as tmp:
+        project = Path(tmp) / "project"
+        project.mkdir()
+        os.environ["ALLOWED_ROOT"] = tmp
+        os.environ.setdefault("RUNNER_MAX_QUEUE", str(max(args.levels)))
+        print(
+            f"{'transport':<10} {'conc':>5} {'reqs':>6} {'req/s':>8}"
+            f" {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        worst = 0.0
+        for transport in args.transport.split(","):
+            if transport == "inprocess":
+                worst = max(worst, asyncio.run(_inprocess(str(project), args)))
+            elif transport == "uvicorn":
+                worst = max(worst, asyncio.run(_uvicorn(str(project), args)))
+            else:
+                parser.error(f"unknown transport {transport!r}")
+    if worst > args.max_error_rate:
+        print(f"FAIL: error rate {worst:.1%} exceeds {args.max_error_rate:.1%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark warm-pool runs against cold subprocess.run for python and pytest commands.
+
+Usage: python -m benchmarks.bench_warm_pool [--runs 20] [--tests 20] [--min-speedup 2]
+
+Creates a throwaway project with --tests trivial tests and times
+`python -c pass` and `python -m pytest -q` started cold (subprocess.run)
+and through runner.warm.WarmPool (first run, which starts the worker,
+excluded). Exits 1 if the pytest median speedup is below --min-speedup.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from runner.executor import run_process
+from runner.result_cache import TreeFingerprinter
+from runner.warm import WarmPool
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _cold(command: list[str], cwd: str, runs: int) -> list[float]:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def _warm(pool: WarmPool, command: list[str], cwd: str, runs: int) -> list[float]:
+    spawn = pool.spawner(cwd)
+    await run_process(command, cwd=cwd, spawn=spawn)  # starts the worker
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = await run_process(command, cwd=cwd, spawn=spawn)
+        samples.append((time.perf_counter() - start) * 1000)
+        if result.exit_code != 0:
+            raise SystemExit(f"warm run failed ({result.exit_code}): {result.stderr.decode(errors='replace')}")
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--tests", type=int, default=20)
+    parser.add_argument("--min-speedup", type=float, default=2.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-warm-") as tmp:
+        project = Path(tmp) / "project"
+        project.mkdir()
+        (project / "test_bench.py").write_text(
+            "".join(f"def test_{i}():\n    assert {i} == {i}\n\n" for i in range(args.tests))
+        )
+        commands = {
+            "python -c pass": [sys.executable, "-c", "pass"],
+            "pytest -q": [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider"],
+        }
+        pool = WarmPool(Path(tmp) / "warm", TreeFingerprinter())
+        print(f"{'command':<16} {'mode':<5} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+        speedup = 0.0
+        try:
+            for name, command in commands.items():
+                medians = {}
+                for mode in ("cold", "warm"):
+                    if mode == "cold":
+                        samples = _cold(command, str(project), args.runs)
+                    else:
+                        samples = asyncio.run(_warm(pool, command, str(project), args.runs))
+                    medians[mode] = statistics.median(samples)
+                    print(
+                        f"{name:<16} {mode:<5} {medians[mode]:>8.1f} {_percentile(samples, 95):>8.1f} {max(samples):>8.1f}"
+                    )
+                speedup = medians["cold"] / medians["warm"]
+                print(f"{name:<16} speedup x{speedup:.1f}")
+        finally:
+            pool.close()
+    if speedup < args.min_speedup:
+        print(f"FAIL: pytest speedup x{speedup:.1f} below x{args.min_speedup}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
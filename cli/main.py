@@ -1,6 +1,7 @@
 """CLI entry point: run-tests and chat subcommands."""
 
 import argparse
+import json
 import os
 import sys
 
@@ -11,22 +12,10 @@ def _api_base_url() -> str:
     return os.environ.get("CODE_HELPER_API_URL", "http://localhost:8000").rstrip("/")
 
 
-def _run_tests(path: str) -> int:
-    project_path = os.path.abspath(path)
-    base_url = _api_base_url()
-    payload = {"project_path": project_path, "action": "run_tests"}
-    try:
-        with httpx.Client(base_url=base_url, timeout=120.0) as client:
-            response = client.post("/run", json=payload)
-            response.raise_for_status()
-    except httpx.ConnectError as e:
-        print(f"Error: cannot connect to {base_url}", file=sys.stderr)
-        print(str(e), file=sys.stderr)
-        return 1
-    except httpx.HTTPStatusError as e:
-        print(f"Error: {e.response.status_code} {e.response.text}", file=sys.stderr)
-        return 1
-
+def _run_tests_buffered(client: httpx.Client, payload: dict) -> int:
+    """POST /run and print the output once the run finished (Crew APIs without /run/stream)."""
+    response = client.post("/run", json=payload)
+    response.raise_for_status()
     data = response.json()
     summary = data.get("summary", "")
     stdout = data.get("stdout", "")
@@ -42,6 +31,45 @@ def _run_tests(path: str) -> int:
     return exit_code
 
 
+def _run_tests(path: str) -> int:
+    project_path = os.path.abspath(path)
+    base_url = _api_base_url()
+    payload = {"project_path": project_path, "action": "run_tests"}
+    exit_code = 1
+    try:
+        # No read timeout: a test suite may be silent for a long time; the Runner enforces its own.
+        with httpx.Client(base_url=base_url, timeout=httpx.Timeout(120.0, read=None)) as client:
+            with client.stream("POST", "/run/stream", json=payload) as response:
+                if response.status_code == 404:
+                    return _run_tests_buffered(client, payload)
+                if response.status_code >= 400:
+                    response.read()
+                    response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    kind = event.get("type")
+                    if kind == "stdout":
+                        print(event.get("data", ""), end="", flush=True)
+                    elif kind == "stderr":
+                        print(event.get("data", ""), end="", file=sys.stderr, flush=True)
+                    elif kind == "exit":
+                        exit_code = event.get("exit_code", 1)
+                        if event.get("timed_out"):
+                            print("Timed out", file=sys.stderr)
+                    elif kind == "error":
+                        print(f"Error: {event.get('message', event.get('error', ''))}", file=sys.stderr)
+    except httpx.ConnectError as e:
+        print(f"Error: cannot connect to {base_url}", file=sys.stderr)
+        print(str(e), file=sys.stderr)
+        return 1
+    except httpx.HTTPStatusError as e:
+        print(f"Error: {e.response.status_code} {e.response.text}", file=sys.stderr)
+        return 1
+    return exit_code
+
+
 def _chat_one(message: str, project_path: str | None) -> None:
     base_url = _api_base_url()
     payload = {"message": message}
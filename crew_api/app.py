@@ -1,6 +1,7 @@
 """FastAPI app for the crew API."""
 
 import asyncio
+import json
 import sys
 import time
 import uuid
@@ -10,18 +11,23 @@ from contextvars import ContextVar
 import httpx
 import structlog
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from crew_api import runner_client
+from crew_api.attachments import get_attachment_index
 from crew_api.chat import handle_chat
 from crew_api import ingest_job
 from crew_api.ingest_job import IngestJobAlreadyActive
 from prometheus_fastapi_instrumentator import Instrumentator
 
 from crew_api.config import CrewApiSettings
+from crew_api.crew.tools.rag_tool import get_query_cache
 from crew_api.logging_config import configure_logging
+from crew_api.test_report import format_test_report, tail_output
+from ingest.run import collection_id_for
+from ingest.vector_store import client_for_url
 
 # Request ID for propagation to Runner (set by middleware)
 _request_id_ctx: ContextVar[str | None] = ContextVar("request_id", default=None)
@@ -117,6 +123,20 @@ def _vector_db_url(request: Request) -> str:
     return _get_settings(request).vector_db_url.rstrip("/")
 
 
+def _vector_client(request: Request):
+    """Shared Chroma client for VECTOR_DB_URL (None when unset or unreachable)."""
+    if getattr(request.app.state, "vector_client", None) is None:
+        url = _vector_db_url(request)
+        if not url:
+            return None
+        try:
+            request.app.state.vector_client = client_for_url(url)
+        except Exception as e:
+            structlog.get_logger().warning("vector_client_unavailable", error=str(e))
+            return None
+    return request.app.state.vector_client
+
+
 def _llm_url(request: Request) -> str:
     return _get_settings(request).llm_url.rstrip("/")
 
@@ -228,6 +248,9 @@ def get_project(request: Request):
             index_status = refreshed
         except Exception:
             pass  # keep current index_status on K8s error
+        if index_status == "ready":
+            # New index generation: drop cached RAG results eagerly (keys also carry the generation).
+            get_query_cache().invalidate_collection(collection_id_for(project_path))
 
     return {
         "project_path": project_path,
@@ -288,6 +311,8 @@ def post_chat(request: Request, body: ChatPostBody):
             pinned_repo=body.pinned_repo,
             attachments=body.attachments,
             request_id=request_id,
+            vector_client=_vector_client(request),
+            attachment_index=get_attachment_index() if body.attachments else None,
         )
         return result
     except Exception:
@@ -305,32 +330,56 @@ def post_chat(request: Request, body: ChatPostBody):
 # --- POST /run (Runner integration) ---
 
 RUN_TESTS_COMMAND = ["pytest"]
+# /run action that lets the Runner pick only the tests affected by recent changes (full-suite fallback).
+RUN_AFFECTED_TESTS = "run_affected_tests"
 
 
 class RunPostBody(BaseModel):
     """Body for POST /run."""
 
     project_path: str
-    action: str  # e.g. "run_tests", "verify"
+    action: str  # e.g. "run_tests", "run_affected_tests", "verify"
     command: list[str] | None = None
+    shards: int | None = None  # pytest: parallel processes on the Runner (POST /run only; /run/stream rejects > 1)
+    cached_deps: bool = False  # run in the Runner's cached virtualenv / node_modules for the project's lockfiles
+    isolated: bool = False  # run in a private clone of the project (safe alongside other runs on it)
 
 
-def _run_summary(exit_code: int, stdout: str) -> str:
-    """Derive a short summary from exit_code and stdout."""
+def _run_summary(exit_code: int, stdout: str, tests: dict | None = None) -> str:
+    """Derive a short summary from the structured test report if any, else from exit_code and the end of stdout."""
+    if tests:
+        return format_test_report(tests)
     if exit_code == 0:
-        return stdout.strip() or "Tests passed"
-    return stdout.strip() or f"Exit code {exit_code}"
+        return tail_output(stdout) or "Tests passed"
+    return tail_output(stdout) or f"Exit code {exit_code}"
 
 
-@app.post("/run")
-async def post_run(request: Request, body: RunPostBody):
-    """Run a command via the Runner service; action run_tests defaults to pytest."""
+def _run_command(body: RunPostBody) -> list[str]:
+    """Command for a /run body; run_tests, run_affected_tests (and verify without command) default to pytest."""
     command = body.command
-    if body.action == "run_tests" and command is None:
+    if body.action in ("run_tests", RUN_AFFECTED_TESTS) and command is None:
         command = RUN_TESTS_COMMAND
     if command is None:
         command = RUN_TESTS_COMMAND  # fallback for "verify" without command
+    return command
+
+
+def _runner_unavailable() -> dict:
+    return {
+        "error": "runner_unavailable",
+        "message": "Runner request failed after retries. Check Runner service and network.",
+    }
+
+
+@app.post("/run")
+async def post_run(request: Request, body: RunPostBody):
+    """Run a command via the Runner service; action run_tests defaults to pytest.
 
+    Action run_affected_tests runs only the test modules that import files
+    changed since the last passing affected run, falling back to the full
+    suite when that cannot be determined; the response's selection says which.
+    """
+    command = _run_command(body)
     runner_url = _get_settings(request).runner_url
     runner_transport = getattr(request.app.state, "runner_transport", None)
 
@@ -342,16 +391,15 @@ async def post_run(request: Request, body: RunPostBody):
             runner_url=runner_url,
             transport=runner_transport,
             request_id=request_id,
+            shards=body.shards,
+            affected=body.action == RUN_AFFECTED_TESTS,
+            cached_deps=body.cached_deps,
+            isolated=body.isolated,
+            priority="interactive",
         )
-    except (httpx.ConnectError, httpx.TimeoutException, httpx.HTTPStatusError) as e:
+    except (httpx.ConnectError, httpx.TimeoutException, httpx.HTTPStatusError, runner_client.RunnerJobError) as e:
         structlog.get_logger().warning("runner_request_failed", error=str(e))
-        return JSONResponse(
-            status_code=502,
-            content={
-                "error": "runner_unavailable",
-                "message": "Runner request failed after retries. Check Runner service and network.",
-            },
-        )
+        return JSONResponse(status_code=502, content=_runner_unavailable())
 
     exit_code = result["exit_code"]
     stdout = result.get("stdout", "")
@@ -361,13 +409,72 @@ async def post_run(request: Request, body: RunPostBody):
     return {
         "success": exit_code == 0,
         "exit_code": exit_code,
-        "summary": _run_summary(exit_code, stdout),
+        "summary": _run_summary(exit_code, stdout, result.get("tests")),
         "stdout": stdout,
         "stderr": stderr,
         "duration_seconds": duration_seconds,
+        "stdout_truncated": result.get("stdout_truncated", False),
+        "stderr_truncated": result.get("stderr_truncated", False),
+        "output_id": result.get("output_id"),
+        "cached": result.get("cached", False),
+        "selection": result.get("selection"),
+        "tests": result.get("tests"),
+        "environments": result.get("environments", []),
     }
 
 
+@app.post("/run/stream")
+async def post_run_stream(request: Request, body: RunPostBody):
+    """Like POST /run, but streams the Runner's NDJSON events as the command runs.
+
+    The final exit event is extended with success and summary (and carries the
+    Runner's selection for run_affected_tests). Runner failures
+    before the first event return 502; later ones end the stream with an
+    {"type": "error"} event. shards > 1 cannot be streamed (400; use POST /run).
+    """
+    if body.shards is not None and body.shards > 1:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "invalid_input", "message": "shards > 1 cannot be streamed; use POST /run"},
+        )
+    events = runner_client.execute_stream(
+        project_path=body.project_path,
+        command=_run_command(body),
+        runner_url=_get_settings(request).runner_url,
+        transport=getattr(request.app.state, "runner_transport", None),
+        request_id=_request_id_ctx.get(),
+        affected=body.action == RUN_AFFECTED_TESTS,
+        cached_deps=body.cached_deps,
+        isolated=body.isolated,
+    )
+    try:
+        first = await anext(events)
+    except (StopAsyncIteration, httpx.HTTPError) as e:
+        structlog.get_logger().warning("runner_request_failed", error=str(e))
+        return JSONResponse(status_code=502, content=_runner_unavailable())
+
+    async def ndjson():
+        # The output was already streamed; summarize from its last line (e.g. pytest's totals).
+        last_line = ""
+        event = first
+        try:
+            while True:
+                if event.get("type") == "stdout" and event.get("data", "").strip():
+                    last_line = event["data"]
+                elif event.get("type") == "exit":
+                    exit_code = event.get("exit_code", -1)
+                    event = {**event, "success": exit_code == 0, "summary": _run_summary(exit_code, last_line)}
+                yield json.dumps(event) + "\n"
+                event = await anext(events)
+        except StopAsyncIteration:
+            return
+        except httpx.HTTPError as e:
+            structlog.get_logger().warning("runner_stream_failed", error=str(e))
+            yield json.dumps({"type": "error", **_runner_unavailable()}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
 Instrumentator(
     excluded_handlers=["/metrics"],
     should_ignore_untemplated=True,
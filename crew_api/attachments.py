@@ -0,0 +1,149 @@
+"""Index large chat attachments so only their relevant chunks reach the prompt.
+
+Attachments at or above a size threshold are chunked, embedded into an
+ephemeral Chroma collection named by their content hash and searched with
+the chat message; the attachment is replaced in the crew inputs by a
+token-budgeted excerpt. Indexed attachments are kept (LRU) so the same paste
+in a later turn is not embedded again. Smaller attachments pass through.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any
+
+import chromadb
+import structlog
+
+from crew_api.config import CrewApiSettings
+from crew_api.crew.tools.context import ContextChunk, assemble_context, chunks_from_results
+from ingest.chunk import chunk_text
+from ingest.query_cache import CACHE_REQUESTS
+from ingest.vector_store import query, upsert
+
+DEFAULT_THRESHOLD_CHARS = 8000
+DEFAULT_CACHE_SIZE = 32
+DEFAULT_TOKEN_BUDGET = 1000
+# Chunks retrieved per attachment before packing into the token budget; those
+# scoring below ADAPTIVE_RATIO of the best chunk are dropped (rerank.apply_cutoff)
+# so adjacent irrelevant windows are not merged into the excerpt.
+N_RESULTS = 8
+ADAPTIVE_RATIO = 0.8
+CHUNK_LINES = 40
+
+_attachment_index: AttachmentIndex | None = None
+_index_lock = threading.Lock()
+
+
+def attachment_text(attachment: Any) -> tuple[str | None, str | None]:
+    """(name, text) of an attachment given as a string or a dict with content/text; text None if neither."""
+    if isinstance(attachment, str):
+        return None, attachment
+    if isinstance(attachment, dict):
+        text = attachment.get("content", attachment.get("text"))
+        if isinstance(text, str):
+            return attachment.get("name") or attachment.get("filename"), text
+    return None, None
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()
+
+
+class AttachmentIndex:
+    """Content-hash keyed cache of attachment collections, with excerpt retrieval."""
+
+    def __init__(
+        self,
+        *,
+        client: chromadb.Client | None = None,
+        embedding_function: chromadb.api.types.EmbeddingFunction | None = None,
+        threshold_chars: int = DEFAULT_THRESHOLD_CHARS,
+        maxsize: int = DEFAULT_CACHE_SIZE,
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+    ) -> None:
+        self.client = client if client is not None else chromadb.EphemeralClient()
+        self.embedding_function = embedding_function
+        self.threshold_chars = threshold_chars
+        self.maxsize = maxsize
+        self.token_budget = token_budget
+        self._collections: OrderedDict[str, str] = OrderedDict()  # content hash -> collection name
+        self._lock = threading.Lock()
+
+    def _ensure_indexed(self, digest: str, name: str, text: str) -> str:
+        """Collection name holding text's chunks, indexing it on first sight."""
+        with self._lock:
+            collection_id = self._collections.get(digest)
+            if collection_id is not None:
+                self._collections.move_to_end(digest)
+                CACHE_REQUESTS.labels(cache="attachment", outcome="hit").inc()
+                return collection_id
+            CACHE_REQUESTS.labels(cache="attachment", outcome="miss").inc()
+            collection_id = f"attachment_{digest[:40]}"
+            chunks = chunk_text(text, {"path": name}, chunk_lines=CHUNK_LINES)
+            upsert(
+                collection_id,
+                [t for t, _ in chunks],
+                metadatas=[m for _, m in chunks],
+                client=self.client,
+                embedding_function=self.embedding_function,
+            )
+            self._collections[digest] = collection_id
+            while len(self._collections) > max(self.maxsize, 1):
+                _, evicted = self._collections.popitem(last=False)
+                self.client.delete_collection(evicted)
+            return collection_id
+
+    def excerpt(self, name: str, text: str, query_text: str, *, digest: str | None = None) -> str:
+        """Chunks of text most relevant to query_text, packed within token_budget."""
+        collection_id = self._ensure_indexed(digest or content_hash(text), name, text)
+        result = query(
+            collection_id,
+            query_text,
+            n_results=N_RESULTS,
+            client=self.client,
+            embedding_function=self.embedding_function,
+            adaptive_ratio=ADAPTIVE_RATIO,
+        )
+        return assemble_context(chunks_from_results(result), self.token_budget)
+
+    def prepare(self, attachments: list, query_text: str) -> list:
+        """Replace attachments of threshold_chars or more with relevant excerpts; others pass through.
+
+        A replaced attachment becomes {"name", "excerpt", "original_chars",
+        "content_hash"}. If indexing fails the attachment is cut to the head
+        that fits the token budget instead.
+        """
+        if self.threshold_chars <= 0:
+            return attachments
+        out = []
+        for i, attachment in enumerate(attachments):
+            name, text = attachment_text(attachment)
+            if text is None or len(text) < self.threshold_chars:
+                out.append(attachment)
+                continue
+            name = name or f"attachment-{i + 1}"
+            digest = content_hash(text)
+            try:
+                excerpt = self.excerpt(name, text, query_text, digest=digest)
+            except Exception as e:
+                structlog.get_logger().warning("attachment_index_failed", attachment=name, error=str(e))
+                excerpt = assemble_context([ContextChunk(text, 0, name)], self.token_budget)
+            out.append({"name": name, "excerpt": excerpt, "original_chars": len(text), "content_hash": digest})
+        return out
+
+
+def get_attachment_index() -> AttachmentIndex:
+    """Process-wide attachment index, configured from settings (ATTACHMENT_*)."""
+    global _attachment_index
+    with _index_lock:
+        if _attachment_index is None:
+            s = CrewApiSettings()
+            _attachment_index = AttachmentIndex(
+                threshold_chars=s.attachment_index_threshold_chars,
+                maxsize=s.attachment_cache_size,
+                token_budget=s.attachment_context_token_budget,
+            )
+    return _attachment_index
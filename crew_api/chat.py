@@ -1,9 +1,14 @@
 """Chat handler: build crew inputs, run kickoff, return response."""
 
 import time
+from typing import Any
+
 import structlog
 
+from crew_api.attachments import AttachmentIndex
 from crew_api.crew import create_crew
+from ingest.repo_map import get_repo_map
+from ingest.run import collection_id_for
 
 
 def _step_names_from_result(result) -> list[str]:
@@ -17,21 +22,44 @@ def _step_names_from_result(result) -> list[str]:
     return steps
 
 
+def _repo_map_for(project_path: str, vector_client: Any) -> str | None:
+    """Repo map stored at ingest for the project's current index, or None (never raises)."""
+    try:
+        return get_repo_map(collection_id_for(project_path), client=vector_client)
+    except Exception as e:
+        structlog.get_logger().warning("repo_map_unavailable", project_path=project_path, error=str(e))
+        return None
+
+
 def handle_chat(
     message: str,
     project_path: str | None = None,
     pinned_repo: str | None = None,
     attachments: list | None = None,
     request_id: str | None = None,
+    vector_client: Any = None,
+    attachment_index: AttachmentIndex | None = None,
 ) -> dict:
-    """Run crew with message (and optional project_path, pinned_repo, attachments); return response dict."""
+    """Run crew with message (and optional project_path, pinned_repo, attachments); return response dict.
+
+    With project_path and a Chroma vector_client, the project's repo map (see
+    ingest.repo_map) is passed to the crew as the repo_map input. With
+    attachment_index, large attachments are replaced by their excerpts most
+    relevant to the message (see crew_api.attachments).
+    """
     inputs: dict = {"message": message}
     if project_path is not None:
         inputs["project_path"] = project_path
     if pinned_repo is not None:
         inputs["pinned_repo"] = pinned_repo
     if attachments is not None:
+        if attachment_index is not None:
+            attachments = attachment_index.prepare(attachments, message)
         inputs["attachments"] = attachments
+    if project_path is not None and vector_client is not None:
+        repo_map = _repo_map_for(project_path, vector_client)
+        if repo_map:
+            inputs["repo_map"] = repo_map
 
     start = time.perf_counter()
     crew = create_crew()
@@ -33,6 +33,19 @@ class CrewApiSettings(BaseSettings):
     llm_health_path: str | None = Field(None, validation_alias="LLM_HEALTH_PATH")
     k8s_namespace: str = Field("code-helper", validation_alias="K8S_NAMESPACE")
     ingest_image: str = Field("code-helper-ingest", validation_alias="INGEST_IMAGE")
+    rag_cache_size: int = Field(256, validation_alias="RAG_CACHE_SIZE")
+    rag_cache_ttl_seconds: float = Field(300.0, validation_alias="RAG_CACHE_TTL_SECONDS")
+    rag_embedding_cache_size: int = Field(1024, validation_alias="RAG_EMBEDDING_CACHE_SIZE")
+    rag_context_token_budget: int = Field(2000, validation_alias="RAG_CONTEXT_TOKEN_BUDGET")
+    rag_mmr_lambda: float | None = Field(None, ge=0.0, le=1.0, validation_alias="RAG_MMR_LAMBDA")
+    rag_mmr_fetch_k: int = Field(20, ge=1, validation_alias="RAG_MMR_FETCH_K")
+    rag_max_results: int = Field(5, ge=1, validation_alias="RAG_MAX_RESULTS")
+    rag_min_similarity: float | None = Field(None, ge=-1.0, le=1.0, validation_alias="RAG_MIN_SIMILARITY")
+    rag_adaptive_ratio: float | None = Field(None, gt=0.0, le=1.0, validation_alias="RAG_ADAPTIVE_RATIO")
+    rag_adaptive_max_results: int = Field(15, ge=1, validation_alias="RAG_ADAPTIVE_MAX_RESULTS")
+    attachment_index_threshold_chars: int = Field(8000, ge=0, validation_alias="ATTACHMENT_INDEX_THRESHOLD_CHARS")
+    attachment_cache_size: int = Field(32, ge=1, validation_alias="ATTACHMENT_CACHE_SIZE")
+    attachment_context_token_budget: int = Field(1000, ge=1, validation_alias="ATTACHMENT_CONTEXT_TOKEN_BUDGET")
     validate_startup: bool = Field(
         False,
         validation_alias="CREW_API_VALIDATE_DEPS",
@@ -18,6 +18,15 @@ from crew_api.crew.tasks import (
 )
 
 
+NO_REPO_MAP = "(no repository map available)"
+
+
+def _default_inputs(inputs: dict) -> dict:
+    """Fill task placeholders the caller may omit (before_kickoff callback)."""
+    inputs.setdefault("repo_map", NO_REPO_MAP)
+    return inputs
+
+
 def create_crew(
     llm: Any = None,
     manager_llm: Any = None,
@@ -46,4 +55,5 @@ def create_crew(
         manager_llm=manager_llm,
         manager_agent=manager,
         memory=False,
+        before_kickoff_callbacks=[_default_inputs],
     )
@@ -6,7 +6,10 @@ from crewai import Agent, Task
 def create_research_task(researcher: Agent) -> Task:
     """Task: research using the user message."""
     return Task(
-        description="Research the topic or question: {message}. Use your search tool and summarize findings.",
+        description=(
+            "Research the topic or question: {message}. Use your search tool and summarize findings.\n\n"
+            "Repository map:\n{repo_map}"
+        ),
         expected_output="A short summary of research results.",
         agent=researcher,
     )
@@ -15,7 +18,10 @@ def create_research_task(researcher: Agent) -> Task:
 def create_code_task(coder: Agent, context: list[Task] | None = None) -> Task:
     """Task: suggest or explain code related to the request."""
     return Task(
-        description="Based on the request '{message}', suggest or explain relevant code.",
+        description=(
+            "Based on the request '{message}', suggest or explain relevant code.\n\n"
+            "Repository map (use it to locate files before searching):\n{repo_map}"
+        ),
         expected_output="A clear code suggestion or explanation.",
         agent=coder,
         context=context or [],
@@ -0,0 +1,197 @@
+"""Assemble RAG hits into a compact prompt context.
+
+Chunks from the same file whose line ranges overlap or touch are merged,
+near-duplicate chunks are dropped, and the result is packed in retrieval
+order up to a token budget, each section headed by its source path and lines.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass, field
+
+# Rough tokens-per-character ratio for code/English with BPE tokenizers.
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = 2000
+DEFAULT_DUPLICATE_THRESHOLD = 0.9
+# Do not start a truncated section with less room than this.
+MIN_SECTION_TOKENS = 40
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer dependency): ceil(chars / CHARS_PER_TOKEN)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+@dataclass
+class ContextChunk:
+    """One retrieved chunk; rank is its position in the retrieval results (0 = best)."""
+
+    text: str
+    rank: int
+    path: str | None = None
+    start_line: int | None = None
+    end_line: int | None = None
+    chunk_id: str | None = None
+    _words: frozenset[str] | None = field(default=None, repr=False, compare=False)
+
+    @property
+    def words(self) -> frozenset[str]:
+        if self._words is None:
+            self._words = frozenset(_WORD_RE.findall(self.text))
+        return self._words
+
+    def header(self) -> str:
+        if self.path is None:
+            return "### (unknown source)"
+        if self.start_line is None or self.end_line is None:
+            return f"### {self.path}"
+        return f"### {self.path}:{self.start_line}-{self.end_line}"
+
+
+def chunks_from_results(results: dict, query_index: int = 0) -> list[ContextChunk]:
+    """Build ContextChunks from a Chroma query result (one query's row)."""
+    documents = (results.get("documents") or [[]])[query_index] or []
+    metadatas = (results.get("metadatas") or [[]])[query_index] or [None] * len(documents)
+    ids = (results.get("ids") or [[]])[query_index] or [None] * len(documents)
+    chunks: list[ContextChunk] = []
+    for rank, (text, meta, chunk_id) in enumerate(zip(documents, metadatas, ids)):
+        if not text:
+            continue
+        meta = meta or {}
+        chunks.append(
+            ContextChunk(
+                text=text,
+                rank=rank,
+                path=meta.get("rel_path") or meta.get("path"),
+                start_line=meta.get("start_line"),
+                end_line=meta.get("end_line"),
+                chunk_id=chunk_id,
+            )
+        )
+    return chunks
+
+
+def chunks_from_result_sets(result_sets: list[dict]) -> list[ContextChunk]:
+    """Interleave several single-query results by rank, keeping each chunk id once.
+
+    The best hit of every query comes before any query's second hit, so each
+    sub-question is represented when the budget is tight. Ranks are reassigned
+    in interleaved order.
+    """
+    per_query = [chunks_from_results(r) for r in result_sets]
+    seen: set[str] = set()
+    out: list[ContextChunk] = []
+    for depth in range(max((len(c) for c in per_query), default=0)):
+        for chunks in per_query:
+            if depth >= len(chunks):
+                continue
+            c = chunks[depth]
+            if c.chunk_id is not None:
+                if c.chunk_id in seen:
+                    continue
+                seen.add(c.chunk_id)
+            c.rank = len(out)
+            out.append(c)
+    return out
+
+
+def merge_adjacent(chunks: list[ContextChunk]) -> list[ContextChunk]:
+    """Merge chunks of the same path whose line ranges overlap or are adjacent.
+
+    A merged chunk keeps the best (lowest) rank of its parts. Chunks without
+    a path or line range are passed through unchanged.
+    """
+    by_path: dict[str, list[ContextChunk]] = {}
+    passthrough: list[ContextChunk] = []
+    for c in chunks:
+        if c.path is None or c.start_line is None or c.end_line is None:
+            passthrough.append(c)
+        else:
+            by_path.setdefault(c.path, []).append(c)
+
+    merged: list[ContextChunk] = []
+    for path, group in by_path.items():
+        group.sort(key=lambda c: c.start_line)
+        cur = group[0]
+        lines = cur.text.split("\n")
+        start, end, rank = cur.start_line, cur.end_line, cur.rank
+        for nxt in group[1:]:
+            if nxt.start_line <= end + 1:
+                if nxt.end_line > end:
+                    skip = end - nxt.start_line + 1
+                    lines.extend(nxt.text.split("\n")[skip:])
+                    end = nxt.end_line
+                rank = min(rank, nxt.rank)
+                continue
+            merged.append(ContextChunk("\n".join(lines), rank, path, start, end))
+            lines = nxt.text.split("\n")
+            start, end, rank = nxt.start_line, nxt.end_line, nxt.rank
+        merged.append(ContextChunk("\n".join(lines), rank, path, start, end))
+    result = merged + passthrough
+    result.sort(key=lambda c: c.rank)
+    return result
+
+
+def _jaccard(a: frozenset[str], b: frozenset[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def drop_near_duplicates(
+    chunks: list[ContextChunk],
+    threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+) -> list[ContextChunk]:
+    """Keep chunks in order, dropping any whose word set is >= threshold Jaccard-similar to a kept one."""
+    kept: list[ContextChunk] = []
+    for c in chunks:
+        if any(_jaccard(c.words, k.words) >= threshold for k in kept):
+            continue
+        kept.append(c)
+    return kept
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep whole leading lines of text within max_tokens (minus room for a marker)."""
+    out: list[str] = []
+    used = 0
+    for line in text.split("\n"):
+        cost = estimate_tokens(line + "\n")
+        if used + cost > max_tokens - 2:
+            break
+        out.append(line)
+        used += cost
+    return "\n".join(out + ["..."])
+
+
+def pack(chunks: list[ContextChunk], token_budget: int) -> str:
+    """Render chunks (in the given order) with source headers up to token_budget."""
+    sections: list[str] = []
+    remaining = token_budget
+    for c in chunks:
+        header = c.header()
+        section = f"{header}\n{c.text}"
+        cost = estimate_tokens(section) + 1
+        if cost <= remaining:
+            sections.append(section)
+            remaining -= cost
+            continue
+        if remaining >= MIN_SECTION_TOKENS:
+            body = _truncate_to_tokens(c.text, remaining - estimate_tokens(header) - 1)
+            sections.append(f"{header}\n{body}")
+        break
+    return "\n\n".join(sections)
+
+
+def assemble_context(
+    chunks: list[ContextChunk],
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    *,
+    duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+) -> str:
+    """Merge, de-duplicate and pack chunks into a context string of at most ~token_budget tokens."""
+    return pack(drop_near_duplicates(merge_adjacent(chunks), duplicate_threshold), token_budget)
@@ -4,50 +4,139 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, Any, Optional
 
+import structlog
 from crewai.tools.base_tool import BaseTool
 from pydantic import BaseModel, Field
 
-from ingest.vector_store import query as vector_store_query
+from crew_api.config import CrewApiSettings
+from crew_api.crew.tools.context import assemble_context, chunks_from_result_sets, estimate_tokens
+from ingest.query_cache import QueryCache
+from ingest.vector_store import attribute_filter
+from ingest.vector_store import query_many as vector_store_query_many
 
 if TYPE_CHECKING:
     import chromadb
 
+_settings: CrewApiSettings | None = None
+_query_cache: QueryCache | None = None
+
+
+def _get_settings() -> CrewApiSettings:
+    global _settings
+    if _settings is None:
+        _settings = CrewApiSettings()
+    return _settings
+
+
+def get_query_cache() -> QueryCache:
+    """Process-wide RAG query cache, sized from settings (RAG_CACHE_*). Shared by all RAGTool instances."""
+    global _query_cache
+    if _query_cache is None:
+        s = _get_settings()
+        _query_cache = QueryCache(
+            maxsize=s.rag_cache_size,
+            ttl_seconds=s.rag_cache_ttl_seconds,
+            embedding_maxsize=s.rag_embedding_cache_size,
+        )
+    return _query_cache
+
 
 class RAGToolInput(BaseModel):
     """Input schema for RAGTool."""
 
-    query: str = Field(..., description="Search query to find relevant document chunks.")
+    query: str | list[str] = Field(
+        ...,
+        description=(
+            "Search query to find relevant document chunks, or a list of queries "
+            "(e.g. sub-questions) searched together in one round trip."
+        ),
+    )
     collection_id: str = Field(..., description="Chroma collection id (e.g. project identifier).")
+    path_prefix: str | None = Field(
+        None,
+        description="Only search this project-relative directory or file, e.g. 'runner/' or 'runner/app.py'.",
+    )
+    language: str | None = Field(None, description="Only search files of this language, e.g. 'python'.")
+    kind: str | None = Field(None, description="Only search 'source', 'test' or 'doc' files.")
 
 
 class RAGTool(BaseTool):
-    """Query a Chroma collection and return top-k document chunks as formatted text."""
+    """Query a Chroma collection and return top-k chunks as a token-budgeted context.
+
+    Overlapping/adjacent chunks of a file are merged, near-duplicates dropped,
+    and each section is headed by its path and line range.
+    """
 
     name: str = "rag_search"
     description: str = (
         "Search project documentation/code chunks in the vector store. "
-        "Provide a query and collection_id (project). Returns top relevant chunks."
+        "Provide a query (or a list of queries) and collection_id (project); "
+        "optionally scope with path_prefix, language or kind (source/test/doc). "
+        "Returns relevant code sections, each headed by path:start-end."
     )
     args_schema: type[BaseModel] = RAGToolInput
 
     client: Optional[Any] = None
     embedding_function: Optional[Any] = None
-    n_results: int = 5
+    # None -> RAG_MAX_RESULTS; an upper bound when a similarity cutoff or adaptive ratio is set.
+    n_results: Optional[int] = None
+    # None -> shared process-wide cache (get_query_cache); set use_cache=False to bypass.
+    cache: Optional[Any] = None
+    use_cache: bool = True
+    # None -> RAG_CONTEXT_TOKEN_BUDGET from settings.
+    token_budget: Optional[int] = None
+    # None -> RAG_MMR_LAMBDA / RAG_MMR_FETCH_K from settings; MMR rerank is off when lambda is unset.
+    mmr_lambda: Optional[float] = None
+    fetch_k: Optional[int] = None
+    # None -> RAG_MIN_SIMILARITY / RAG_ADAPTIVE_RATIO from settings; both off when unset.
+    min_similarity: Optional[float] = None
+    adaptive_ratio: Optional[float] = None
+    # None -> RAG_ADAPTIVE_MAX_RESULTS; hits an adaptive query may return.
+    adaptive_max: Optional[int] = None
+
+    def _cache(self) -> QueryCache | None:
+        if not self.use_cache:
+            return None
+        return self.cache if self.cache is not None else get_query_cache()
 
-    def _run(self, query: str, collection_id: str) -> str:
-        results = vector_store_query(
+    def _run(
+        self,
+        query: str | list[str],
+        collection_id: str,
+        path_prefix: str | None = None,
+        language: str | None = None,
+        kind: str | None = None,
+    ) -> str:
+        s = _get_settings()
+        queries = [query] if isinstance(query, str) else [q for q in query if q and q.strip()]
+        if not queries:
+            return "No results found."
+        result_sets = vector_store_query_many(
             collection_id,
-            query,
-            n_results=self.n_results,
+            queries,
+            n_results=self.n_results if self.n_results is not None else s.rag_max_results,
             client=self.client,
             embedding_function=self.embedding_function,
+            cache=self._cache(),
+            mmr_lambda=self.mmr_lambda if self.mmr_lambda is not None else s.rag_mmr_lambda,
+            fetch_k=self.fetch_k if self.fetch_k is not None else s.rag_mmr_fetch_k,
+            where=attribute_filter(language=language, kind=kind),
+            path_prefix=path_prefix,
+            min_similarity=self.min_similarity if self.min_similarity is not None else s.rag_min_similarity,
+            adaptive_ratio=self.adaptive_ratio if self.adaptive_ratio is not None else s.rag_adaptive_ratio,
+            max_results=self.adaptive_max if self.adaptive_max is not None else s.rag_adaptive_max_results,
         )
-        if not results or "documents" not in results:
-            return "No results found."
-        doc_list = results["documents"]
-        # Chroma returns list of lists (one per query)
-        flat = doc_list[0] if doc_list and isinstance(doc_list[0], list) else doc_list
-        chunks = [c for c in flat if c]
+        chunks = chunks_from_result_sets([r for r in result_sets if r and "documents" in r])
         if not chunks:
             return "No results found."
-        return "\n\n---\n\n".join(chunks)
+        budget = self.token_budget if self.token_budget is not None else s.rag_context_token_budget
+        context = assemble_context(chunks, budget)
+        structlog.get_logger().info(
+            "rag_context_assembled",
+            collection_id=collection_id,
+            queries=len(queries),
+            chunks=len(chunks),
+            raw_tokens=sum(estimate_tokens(c.text) for c in chunks),
+            context_tokens=estimate_tokens(context),
+        )
+        return context
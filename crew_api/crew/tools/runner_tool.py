@@ -7,6 +7,7 @@ from crewai.tools.base_tool import BaseTool
 from pydantic import BaseModel, Field
 
 from crew_api import runner_client
+from crew_api.test_report import format_test_report, tail_output
 
 
 class RunnerToolInput(BaseModel):
@@ -17,21 +18,24 @@ class RunnerToolInput(BaseModel):
 
 
 def _default_execute_sync(project_path: str, command: list[str], runner_url: Optional[str] = None) -> dict:
-    """Run async runner_client.execute in a sync context."""
+    """Run async runner_client.execute in a sync context, queued behind interactive runs."""
     return asyncio.run(
-        runner_client.execute(project_path=project_path, command=command, runner_url=runner_url)
+        runner_client.execute(project_path=project_path, command=command, runner_url=runner_url, priority="agent")
     )
 
 
 def _run_summary(result: dict) -> str:
-    """Build a short summary from execute result."""
+    """Build a short summary from execute result: the structured test report when present, else the end of the output."""
     exit_code = result.get("exit_code", -1)
     stdout = result.get("stdout", "")
     stderr = result.get("stderr", "")
     duration = result.get("duration_seconds", 0)
+    if result.get("tests"):
+        return f"Exit code: {exit_code}. {format_test_report(result['tests'])} (duration: {duration}s)"
     if exit_code == 0:
-        return f"Exit code: 0. {stdout.strip() or 'Tests passed.'} (duration: {duration}s)"
-    return f"Exit code: {exit_code}. stderr: {stderr.strip() or stdout.strip() or 'No output'} (duration: {duration}s)"
+        return f"Exit code: 0. {tail_output(stdout) or 'Tests passed.'} (duration: {duration}s)"
+    output = tail_output(stderr) or tail_output(stdout) or "No output"
+    return f"Exit code: {exit_code}. stderr: {output} (duration: {duration}s)"
 
 
 class RunnerTool(BaseTool):
@@ -1,8 +1,24 @@
-"""Client for the Runner service (POST /execute)."""
+"""Client for the Runner service (POST /jobs with polling, POST /execute/stream)."""
 
+import asyncio
+import json
 import os
+from typing import AsyncIterator
+
 import httpx
-from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+from tenacity import RetryCallState, retry, retry_if_exception, stop_after_attempt, wait_exponential
+
+# Runner's default timeout_seconds; the HTTP timeout must outlast the run itself.
+DEFAULT_RUN_TIMEOUT_SECONDS = 300
+# Extra time allowed for waiting in the Runner's queue and for the response.
+QUEUE_ALLOWANCE_SECONDS = 60.0
+# Upper bound on honouring a Runner Retry-After header.
+MAX_RETRY_AFTER_SECONDS = 30.0
+ATTEMPTS = 3
+# Long-poll window for GET /jobs/{id}?wait= and the timeout of each short request.
+POLL_WAIT_SECONDS = 10.0
+REQUEST_TIMEOUT_SECONDS = 30.0
+JOB_FINISHED = ("completed", "failed", "cancelled")
 
 
 def _default_runner_url() -> str:
@@ -11,20 +27,104 @@ def _default_runner_url() -> str:
 
 
 def _retry_if_transient(exc: BaseException) -> bool:
-    """Retry on connection/timeout or 5xx."""
+    """Retry on connection/timeout, 429 (Runner queue full) or 5xx."""
     if isinstance(exc, (httpx.ConnectError, httpx.TimeoutException)):
         return True
     if isinstance(exc, httpx.HTTPStatusError):
-        return exc.response.status_code >= 500
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return False
+
+
+_backoff = wait_exponential(multiplier=0.5, min=1, max=4)
+
+
+def _retry_after(exc: BaseException | None) -> float | None:
+    """Seconds from a 429 response's Retry-After header (capped), if any."""
+    if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 429:
+        try:
+            return min(float(exc.response.headers.get("Retry-After", "")), MAX_RETRY_AFTER_SECONDS)
+        except ValueError:
+            pass
+    return None
+
+
+def _wait_retry_after(retry_state: RetryCallState) -> float:
+    """Honour Retry-After on 429 (capped); exponential backoff otherwise."""
+    delay = _retry_after(retry_state.outcome.exception() if retry_state.outcome else None)
+    return delay if delay is not None else _backoff(retry_state)
+
+
+def _payload(
+    project_path: str,
+    command: list[str],
+    cwd: str | None,
+    env: dict[str, str] | None,
+    timeout_seconds: int | None,
+) -> dict:
+    payload: dict = {"project_path": project_path, "command": command}
+    if cwd is not None:
+        payload["cwd"] = cwd
+    if env is not None:
+        payload["env"] = env
+    if timeout_seconds is not None:
+        payload["timeout_seconds"] = timeout_seconds
+    return payload
+
+
+def _client(base_url: str, transport: httpx.AsyncBaseTransport | None, http_timeout: float) -> httpx.AsyncClient:
+    if transport is not None:
+        return httpx.AsyncClient(transport=transport, base_url=base_url, timeout=http_timeout)
+    return httpx.AsyncClient(base_url=base_url, timeout=http_timeout)
+
+
+def _run_http_timeout(timeout_seconds: int | None) -> float:
+    """HTTP timeout for a request held open for the whole run: the run itself plus queueing."""
+    return (timeout_seconds or DEFAULT_RUN_TIMEOUT_SECONDS) + QUEUE_ALLOWANCE_SECONDS
+
+
+class RunnerJobError(Exception):
+    """A Runner job failed inside the Runner, was cancelled elsewhere, or did not finish in time."""
+
+
+def _retry_submit(exc: BaseException) -> bool:
+    """Retry POST /jobs or /execute/stream only when nothing can have started: connect errors, 429 and 5xx.
+
+    A timed-out request is not retried, since the command may already be running.
+    """
+    if isinstance(exc, httpx.ConnectError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
     return False
 
 
+@retry(retry=retry_if_exception(_retry_submit), stop=stop_after_attempt(ATTEMPTS), wait=_wait_retry_after, reraise=True)
+async def _submit_job(client: httpx.AsyncClient, payload: dict, headers: dict[str, str]) -> dict:
+    response = await client.post("/jobs", json=payload, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
 @retry(
     retry=retry_if_exception(_retry_if_transient),
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=0.5, min=1, max=4),
+    stop=stop_after_attempt(ATTEMPTS),
+    wait=_wait_retry_after,
     reraise=True,
 )
+async def _poll_job(client: httpx.AsyncClient, job_id: str, headers: dict[str, str]) -> dict:
+    response = await client.get(f"/jobs/{job_id}", params={"wait": POLL_WAIT_SECONDS}, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+async def _cancel_job(client: httpx.AsyncClient, job_id: str, headers: dict[str, str]) -> None:
+    """Best-effort DELETE /jobs/{job_id}, so an abandoned run does not keep a Runner slot."""
+    try:
+        await client.delete(f"/jobs/{job_id}", headers=headers)
+    except httpx.HTTPError:
+        pass
+
+
 async def execute(
     project_path: str,
     command: list[str],
@@ -34,30 +134,106 @@ async def execute(
     timeout_seconds: int | None = None,
     transport: httpx.AsyncBaseTransport | None = None,
     request_id: str | None = None,
+    shards: int | None = None,
+    affected: bool = False,
+    cached_deps: bool = False,
+    isolated: bool = False,
+    priority: str | None = None,
 ) -> dict:
     """
-    Call Runner service POST /execute. Returns dict with exit_code, stdout, stderr, duration_seconds.
-    Bounded retries (3 attempts) on transient failures (connect, timeout, 5xx).
+    Run a command as a Runner job: POST /jobs, then long-poll GET /jobs/{id} until it finishes.
+    Returns dict with exit_code, stdout, stderr, duration_seconds (see runner.app.ExecuteResponse).
+    No connection is held for the whole run, so retries (3 attempts on connect errors,
+    5xx and 429 after its Retry-After) never start the same command twice. shards
+    asks the Runner to split a pytest run into parallel processes; affected to run
+    only the tests importing files changed since the last passing affected run;
+    cached_deps to run inside dependency environments cached per lockfile; isolated
+    to run in a private clone of the project; priority ("interactive" or "agent")
+    picks the Runner queue class (the Runner defaults to interactive). Raises
+    RunnerJobError if the job fails or does not finish within the run timeout plus
+    queueing allowance; the job is cancelled if the caller gives up on it.
     """
     base_url = (runner_url or _default_runner_url()).rstrip("/")
-    payload: dict = {"project_path": project_path, "command": command}
-    if cwd is not None:
-        payload["cwd"] = cwd
-    if env is not None:
-        payload["env"] = env
-    if timeout_seconds is not None:
-        payload["timeout_seconds"] = timeout_seconds
-
+    payload = _payload(project_path, command, cwd, env, timeout_seconds)
+    if shards is not None:
+        payload["shards"] = shards
+    if affected:
+        payload["affected"] = True
+    if cached_deps:
+        payload["cached_deps"] = True
+    if isolated:
+        payload["isolated"] = True
+    if priority is not None:
+        payload["priority"] = priority
     headers: dict[str, str] = {}
     if request_id is not None:
         headers["X-Request-Id"] = request_id
 
-    if transport is not None:
-        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60.0) as client:
-            response = await client.post("/execute", json=payload, headers=headers)
-    else:
-        async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
-            response = await client.post("/execute", json=payload, headers=headers)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + _run_http_timeout(timeout_seconds)
+    async with _client(base_url, transport, POLL_WAIT_SECONDS + REQUEST_TIMEOUT_SECONDS) as client:
+        job = await _submit_job(client, payload, headers)
+        job_id = job["job_id"]
+        try:
+            while job["status"] not in JOB_FINISHED:
+                if loop.time() >= deadline:
+                    raise RunnerJobError(f"runner job {job_id} did not finish in time")
+                job = await _poll_job(client, job_id, headers)
+        except BaseException:
+            await asyncio.shield(_cancel_job(client, job_id, headers))
+            raise
+    if job["status"] != "completed":
+        raise RunnerJobError(f"runner job {job_id} {job['status']}: {job.get('error') or 'no result'}")
+    return job["result"]
 
-    response.raise_for_status()
-    return response.json()
+
+async def execute_stream(
+    project_path: str,
+    command: list[str],
+    runner_url: str | None = None,
+    cwd: str | None = None,
+    env: dict[str, str] | None = None,
+    timeout_seconds: int | None = None,
+    transport: httpx.AsyncBaseTransport | None = None,
+    request_id: str | None = None,
+    affected: bool = False,
+    cached_deps: bool = False,
+    isolated: bool = False,
+) -> AsyncIterator[dict]:
+    """
+    Call Runner service POST /execute/stream and yield its NDJSON events as they arrive
+    (start, stdout/stderr lines, exit; see runner.app.execute_stream). affected,
+    cached_deps and isolated are as for execute(). Connect errors, 429 and 5xx are
+    retried like the job submit in execute(), and only before the first event; a
+    timeout is not, since the command may already be running.
+    """
+    base_url = (runner_url or _default_runner_url()).rstrip("/")
+    payload = _payload(project_path, command, cwd, env, timeout_seconds)
+    if affected:
+        payload["affected"] = True
+    if cached_deps:
+        payload["cached_deps"] = True
+    if isolated:
+        payload["isolated"] = True
+    headers: dict[str, str] = {}
+    if request_id is not None:
+        headers["X-Request-Id"] = request_id
+
+    for attempt in range(1, ATTEMPTS + 1):
+        started = False
+        try:
+            async with _client(base_url, transport, _run_http_timeout(timeout_seconds)) as client:
+                async with client.stream("POST", "/execute/stream", json=payload, headers=headers) as response:
+                    if response.status_code >= 400:
+                        await response.aread()
+                        response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if line.strip():
+                            started = True
+                            yield json.loads(line)
+            return
+        except httpx.HTTPError as e:
+            if started or attempt == ATTEMPTS or not _retry_submit(e):
+                raise
+            delay = _retry_after(e)
+            await asyncio.sleep(delay if delay is not None else min(2 ** (attempt - 1), 4))
@@ -0,0 +1,33 @@
+"""Compact text for Runner results: structured test reports instead of raw output, for responses and agent context."""
+
+# Fallback when a run has no structured report: keep only the end of its output.
+OUTPUT_TAIL_LINES = 40
+OUTPUT_TAIL_CHARS = 4000
+
+
+def format_test_report(tests: dict) -> str:
+    """One count line (pytest style) followed by each reported failure with its trimmed traceback."""
+    counts = [
+        f"{tests.get(key, 0)} {label}"
+        for key, label in (("passed", "passed"), ("failed", "failed"), ("errors", "errors"), ("skipped", "skipped"))
+        if tests.get(key) or key == "passed"
+    ]
+    lines = [f"{', '.join(counts)} in {tests.get('duration_seconds', 0)}s"]
+    failures = tests.get("failures") or []
+    for failure in failures:
+        label = "FAILED" if failure.get("outcome") == "failed" else "ERROR"
+        lines.append(f"{label} {failure.get('test_id')}: {failure.get('message', '')}".rstrip(": "))
+        lines.extend("    " + line for line in (failure.get("traceback") or "").splitlines())
+    unreported = tests.get("failed", 0) + tests.get("errors", 0) - len(failures)
+    if unreported > 0:
+        lines.append(f"... and {unreported} more failing tests")
+    return "\n".join(lines)
+
+
+def tail_output(text: str) -> str:
+    """The last OUTPUT_TAIL_LINES lines (at most OUTPUT_TAIL_CHARS) of command output."""
+    lines = text.strip().splitlines()
+    tail = "\n".join(lines[-OUTPUT_TAIL_LINES:])
+    if len(lines) > OUTPUT_TAIL_LINES or len(tail) > OUTPUT_TAIL_CHARS:
+        return "...\n" + tail[-OUTPUT_TAIL_CHARS:]
+    return tail
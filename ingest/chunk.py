@@ -11,15 +11,60 @@ ALLOWED_EXTENSIONS = (".py", ".md", ".ts", ".js")
 # Default max lines per chunk (simple line-based chunking)
 DEFAULT_CHUNK_LINES = 50
 
+LANGUAGES = {".py": "python", ".md": "markdown", ".ts": "typescript", ".js": "javascript"}
+DOC_EXTENSIONS = (".md", ".rst", ".txt")
+TEST_DIRS = ("tests", "test", "__tests__")
+
+# Directory prefixes precomputed into metadata as dir1..dirN ("a", "a/b", ...)
+# so path-scoped queries are equality filters applied inside the index.
+MAX_DIR_DEPTH = 4
+
+
+def _file_kind(rel: Path) -> str:
+    """Classify a project-relative path as "test", "doc" or "source"."""
+    name = rel.name.lower()
+    if rel.suffix.lower() in DOC_EXTENSIONS or (rel.parts and rel.parts[0] == "docs"):
+        return "doc"
+    if (
+        name.startswith("test_")
+        or name.endswith(("_test.py", "_tests.py"))
+        or ".test." in name
+        or ".spec." in name
+        or any(part in TEST_DIRS for part in rel.parts[:-1])
+    ):
+        return "test"
+    return "source"
+
+
+def file_attributes(rel_path: str | Path) -> dict:
+    """Filterable metadata for a project-relative file path.
+
+    rel_path (posix), language, package (top-level directory, "" for root
+    files), kind (test/source/doc) and dir1..dirN directory prefixes.
+    """
+    rel = Path(rel_path)
+    dirs = rel.parts[:-1]
+    attrs = {
+        "rel_path": rel.as_posix(),
+        "language": LANGUAGES.get(rel.suffix.lower(), rel.suffix.lower().lstrip(".")),
+        "package": dirs[0] if dirs else "",
+        "kind": _file_kind(rel),
+    }
+    for depth in range(1, min(len(dirs), MAX_DIR_DEPTH) + 1):
+        attrs[f"dir{depth}"] = "/".join(dirs[:depth])
+    return attrs
+
 
 def chunk_file(
     path: str | Path,
     *,
     chunk_lines: int = DEFAULT_CHUNK_LINES,
+    root: str | Path | None = None,
 ) -> list[tuple[str, dict]]:
     """Read a single file and split into chunks. Returns list of (text, metadata).
 
-    metadata includes "path" (str) with the file path.
+    metadata includes "path" (str) with the file path. When root is given the
+    file_attributes of the path relative to root are added as well.
     """
     path = Path(path)
     if not path.is_file():
@@ -28,8 +73,19 @@ def chunk_file(
         content = path.read_text(encoding="utf-8", errors="replace")
     except OSError:
         return []
-    path_str = str(path)
-    metadata_base = {"path": path_str}
+    metadata_base = {"path": str(path)}
+    if root is not None:
+        metadata_base.update(file_attributes(path.relative_to(root)))
+    return chunk_text(content, metadata_base, chunk_lines=chunk_lines)
+
+
+def chunk_text(
+    content: str,
+    metadata_base: dict,
+    *,
+    chunk_lines: int = DEFAULT_CHUNK_LINES,
+) -> list[tuple[str, dict]]:
+    """Split text into windows of chunk_lines lines; each metadata is metadata_base plus start_line/end_line."""
     lines = content.splitlines()
     chunks: list[tuple[str, dict]] = []
     for i in range(0, len(lines), chunk_lines):
@@ -52,7 +108,8 @@ def chunk_directory(
 ) -> list[tuple[str, dict]]:
     """Walk directory, filter by extension, chunk each file. Returns list of (text, metadata).
 
-    metadata includes "path" with the file path. Only files with extension in
+    metadata includes "path" with the file path plus file_attributes (rel_path,
+    language, package, kind, dir prefixes). Only files with extension in
     extensions (e.g. .py, .md, .ts, .js) are included.
     """
     path = Path(path)
@@ -65,5 +122,5 @@ def chunk_directory(
             if ext not in extensions:
                 continue
             file_path = Path(root) / name
-            result.extend(chunk_file(file_path, chunk_lines=chunk_lines))
+            result.extend(chunk_file(file_path, chunk_lines=chunk_lines, root=path))
     return result
@@ -1,5 +1,7 @@
 """Centralized configuration for the Ingest service (pydantic-settings)."""
 
+from typing import Literal
+
 from pydantic import AliasChoices, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -13,3 +15,8 @@ class IngestSettings(BaseSettings):
         "",
         validation_alias=AliasChoices("VECTOR_DB_URL", "CHROMA_URL"),
     )
+    shard_by: Literal["", "dir", "hash"] = Field("", validation_alias="INGEST_SHARD_BY")
+    num_shards: int = Field(8, ge=1, validation_alias="INGEST_NUM_SHARDS")
+    shards: str = Field("", validation_alias="INGEST_SHARDS")
+    workers: int = Field(4, ge=1, validation_alias="INGEST_WORKERS")
+    repo_map_tokens: int = Field(1500, ge=0, validation_alias="INGEST_REPO_MAP_TOKENS")
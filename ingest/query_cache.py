@@ -0,0 +1,157 @@
+"""LRU + TTL caches for vector-store query results and query embeddings.
+
+Result keys include the collection's index generation (see
+vector_store.GENERATION_KEY), so entries written before an ingest completed
+are never served afterwards, even when the ingest ran in another process.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from prometheus_client import Counter, Gauge
+
+CACHE_REQUESTS = Counter(
+    "rag_query_cache_requests_total",
+    "RAG query cache lookups by cache and outcome (hit/miss).",
+    ["cache", "outcome"],
+)
+CACHE_ENTRIES = Gauge(
+    "rag_query_cache_entries",
+    "Entries currently held by each RAG query cache.",
+    ["cache"],
+)
+
+# Defaults; the Crew API overrides them from settings (RAG_CACHE_*).
+DEFAULT_RESULT_CACHE_SIZE = 256
+DEFAULT_RESULT_TTL_SECONDS = 300.0
+DEFAULT_EMBEDDING_CACHE_SIZE = 1024
+DEFAULT_EMBEDDING_TTL_SECONDS = 3600.0
+
+
+def normalize_query(text: str) -> str:
+    """Collapse whitespace so trivially different phrasings share a key.
+
+    Case is preserved: code queries often name identifiers where case matters.
+    """
+    return " ".join(text.split())
+
+
+class LRUTTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl_seconds.
+
+    maxsize <= 0 disables the cache (every get is a miss, set is a no-op).
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl_seconds: float,
+        *,
+        name: str = "default",
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._clock = clock
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        """Return the cached value or None on miss/expiry; refreshes LRU position on hit."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                CACHE_REQUESTS.labels(cache=self.name, outcome="miss").inc()
+                CACHE_ENTRIES.labels(cache=self.name).set(len(self._data))
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        CACHE_REQUESTS.labels(cache=self.name, outcome="hit").inc()
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting least recently used entries beyond maxsize."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            CACHE_ENTRIES.labels(cache=self.name).set(len(self._data))
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches predicate. Returns the number dropped."""
+        with self._lock:
+            doomed = [k for k in self._data if predicate(k)]
+            for k in doomed:
+                del self._data[k]
+            CACHE_ENTRIES.labels(cache=self.name).set(len(self._data))
+        return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            CACHE_ENTRIES.labels(cache=self.name).set(0)
+
+    def stats(self) -> dict:
+        """Return hits, misses, size and hit_rate for this cache."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+class QueryCache:
+    """Result cache keyed by (collection, generation, query, k) plus a query-embedding cache."""
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_RESULT_CACHE_SIZE,
+        ttl_seconds: float = DEFAULT_RESULT_TTL_SECONDS,
+        *,
+        embedding_maxsize: int = DEFAULT_EMBEDDING_CACHE_SIZE,
+        embedding_ttl_seconds: float = DEFAULT_EMBEDDING_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.results = LRUTTLCache(maxsize, ttl_seconds, name="result", clock=clock)
+        self.embeddings = LRUTTLCache(
+            embedding_maxsize, embedding_ttl_seconds, name="embedding", clock=clock
+        )
+
+    @staticmethod
+    def result_key(
+        collection_id: str,
+        generation: str,
+        query_text: str,
+        n_results: int,
+        *options: Hashable,
+    ) -> tuple:
+        """Key for one query; options carry anything else that changes the result (e.g. rerank settings)."""
+        return (collection_id, generation, normalize_query(query_text), n_results, *options)
+
+    @staticmethod
+    def embedding_key(model: str, query_text: str) -> tuple:
+        return (model, normalize_query(query_text))
+
+    def invalidate_collection(self, collection_id: str) -> int:
+        """Drop all cached results for collection_id (any generation). Embeddings are kept."""
+        return self.results.invalidate(lambda k: k[0] == collection_id)
+
+    def stats(self) -> dict:
+        return {"result": self.results.stats(), "embedding": self.embeddings.stats()}
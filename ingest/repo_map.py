@@ -0,0 +1,195 @@
+"""Compact repository map built at ingest: layout, entry points, key modules and public symbols.
+
+The map is stored on the project's base collection next to the index
+generation it was built for (see vector_store.mark_generation), so prompts
+can include it without any retrieval round trips and a stale map is never
+served after a re-ingest.
+"""
+
+from __future__ import annotations
+
+import ast
+import os
+import tomllib
+from collections import Counter
+from pathlib import Path
+
+import chromadb
+
+from ingest.chunk import file_attributes
+from ingest.vector_store import GENERATION_KEY
+
+REPO_MAP_KEY = "repo_map"
+REPO_MAP_GENERATION_KEY = "repo_map_generation"
+DEFAULT_TOKEN_BUDGET = 1500
+# Same rough estimate as the Crew API context packer (chars / 4).
+CHARS_PER_TOKEN = 4
+# Directory levels shown in the layout section.
+LAYOUT_DEPTH = 2
+MAX_SYMBOLS_PER_MODULE = 12
+SKIP_DIRS = frozenset({"__pycache__", "node_modules", "venv", "env", "build", "dist"})
+
+
+def _walk(root: Path) -> list[Path]:
+    """Project-relative file paths, skipping hidden, virtualenv and build directories."""
+    paths: list[Path] = []
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = sorted(
+            d for d in dirs if not d.startswith(".") and d not in SKIP_DIRS and not d.endswith(".egg-info")
+        )
+        rel_dir = Path(dirpath).relative_to(root)
+        paths.extend(rel_dir / f for f in sorted(files) if not f.startswith("."))
+    return paths
+
+
+def _module_name(rel: Path) -> str:
+    parts = list(rel.with_suffix("").parts)
+    if parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+def _is_main_guard(node: ast.stmt) -> bool:
+    if not isinstance(node, ast.If) or not isinstance(node.test, ast.Compare):
+        return False
+    names = [node.test.left, *node.test.comparators]
+    return any(isinstance(n, ast.Name) and n.id == "__name__" for n in names) and any(
+        isinstance(n, ast.Constant) and n.value == "__main__" for n in names
+    )
+
+
+def _scan_module(tree: ast.Module, package: str) -> tuple[list[str], set[str], bool]:
+    """(public top-level symbols, imported module names, has a __main__ guard).
+
+    package is the module's own package, used to resolve relative imports.
+    """
+    symbols: list[str] = []
+    imports: set[str] = set()
+    has_main = False
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and not node.name.startswith("_"):
+            symbols.append(f"class {node.name}")
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and not node.name.startswith("_"):
+            symbols.append(f"{node.name}()")
+        elif _is_main_guard(node):
+            has_main = True
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.update(a.name for a in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                parts = package.split(".") if package else []
+                parts = parts[: len(parts) - (node.level - 1)]
+                base = ".".join([*parts, base] if base else parts)
+            if base:
+                imports.add(base)
+                imports.update(f"{base}.{a.name}" for a in node.names)
+    return symbols, imports, has_main
+
+
+def _layout(paths: list[Path]) -> list[str]:
+    """Directory tree to LAYOUT_DEPTH levels with file counts."""
+    counts: Counter[tuple[str, ...]] = Counter()
+    for rel in paths:
+        for depth in range(1, min(len(rel.parts) - 1, LAYOUT_DEPTH) + 1):
+            counts[rel.parts[:depth]] += 1
+    root_files = [rel.name for rel in paths if len(rel.parts) == 1]
+    lines = [f"{'  ' * (len(d) - 1)}{d[-1]}/ ({n} files)" for d, n in sorted(counts.items())]
+    if root_files:
+        lines.append(", ".join(root_files))
+    return lines
+
+
+def _script_entry_points(root: Path) -> list[str]:
+    pyproject = root / "pyproject.toml"
+    if not pyproject.is_file():
+        return []
+    try:
+        scripts = tomllib.loads(pyproject.read_text(encoding="utf-8")).get("project", {}).get("scripts", {})
+    except (OSError, tomllib.TOMLDecodeError):
+        return []
+    return [f"{name} -> {target}" for name, target in sorted(scripts.items())]
+
+
+def _truncate(lines: list[str], budget_chars: int) -> tuple[list[str], int]:
+    """Leading lines that fit in budget_chars, and the chars they use."""
+    out: list[str] = []
+    used = 0
+    for line in lines:
+        if used + len(line) + 1 > budget_chars:
+            break
+        out.append(line)
+        used += len(line) + 1
+    return out, used
+
+
+def build_repo_map(project_path: str | Path, token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+    """Render a repository map of at most ~token_budget tokens.
+
+    Sections: layout (directory tree with file counts), entry points
+    (pyproject scripts, __main__ modules and guards) and key Python modules
+    (tests excluded) with their public classes and functions, most imported
+    first. Sections are filled in that order; whatever does not fit is cut.
+    """
+    root = Path(project_path)
+    paths = _walk(root)
+    modules: dict[str, tuple[Path, list[str]]] = {}
+    fan_in: Counter[str] = Counter()
+    entry_points = _script_entry_points(root)
+    for rel in paths:
+        if rel.suffix != ".py":
+            continue
+        try:
+            tree = ast.parse((root / rel).read_text(encoding="utf-8", errors="replace"))
+        except (OSError, SyntaxError, ValueError):
+            continue
+        module = _module_name(rel)
+        package = module if rel.name == "__init__.py" else module.rpartition(".")[0]
+        symbols, imports, has_main = _scan_module(tree, package)
+        if file_attributes(rel)["kind"] == "source":
+            modules[module] = (rel, symbols)
+        fan_in.update(i for i in imports if i != module)
+        if has_main or rel.name == "__main__.py":
+            entry_points.append(f"python -m {module.removesuffix('.__main__')}")
+
+    ranked = sorted(
+        (m for m, (_, symbols) in modules.items() if symbols),
+        key=lambda m: (-fan_in[m], -len(modules[m][1]), m),
+    )
+    key_modules = []
+    for m in ranked:
+        rel, symbols = modules[m]
+        shown = ", ".join(symbols[:MAX_SYMBOLS_PER_MODULE])
+        more = f", +{len(symbols) - MAX_SYMBOLS_PER_MODULE} more" if len(symbols) > MAX_SYMBOLS_PER_MODULE else ""
+        key_modules.append(f"{rel.as_posix()}: {shown}{more}")
+
+    remaining = token_budget * CHARS_PER_TOKEN
+    sections: list[str] = []
+    for title, lines in (("Layout", _layout(paths)), ("Entry points", entry_points), ("Key modules", key_modules)):
+        if not lines:
+            continue
+        header = f"## {title}"
+        kept, used = _truncate(lines, remaining - len(header) - 2)
+        if not kept:
+            break
+        sections.append("\n".join([header, *kept]))
+        remaining -= len(header) + used + 2
+    return "\n\n".join(sections)
+
+
+def repo_map_metadata(repo_map: str, generation: str) -> dict:
+    """Collection metadata entries storing repo_map for an index generation."""
+    return {REPO_MAP_KEY: repo_map, REPO_MAP_GENERATION_KEY: generation}
+
+
+def get_repo_map(collection_id: str, *, client: chromadb.Client) -> str | None:
+    """Stored repo map for the collection's current index generation, or None."""
+    try:
+        coll = client.get_collection(name=collection_id)
+    except Exception:
+        return None
+    meta = coll.metadata or {}
+    if not meta.get(REPO_MAP_KEY) or meta.get(REPO_MAP_GENERATION_KEY) != meta.get(GENERATION_KEY):
+        return None
+    return str(meta[REPO_MAP_KEY])
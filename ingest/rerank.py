@@ -0,0 +1,176 @@
+"""Post-retrieval selection: MMR reranking, score cutoffs and adaptive k.
+
+For MMR the query over-fetches candidates (fetch_k) with their embeddings;
+mmr() then greedily picks k of them, trading relevance to the query against
+similarity to what was already picked. Similarities are computed in batch
+with NumPy: one matrix-vector product per pick.
+
+apply_cutoff() drops hits below an absolute similarity and, for adaptive k,
+hits whose similarity falls too far below the best hit's or past a marked
+drop-off in the scores. Adaptive queries over-fetch (up to max_results in
+vector_store.query_many), so a broad question can get more hits than a
+focused one, not just fewer.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+DEFAULT_LAMBDA = 0.5
+DEFAULT_FETCH_K = 20
+# A gap between neighbouring similarities this many times the median gap marks a drop-off.
+GAP_FACTOR = 3.0
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def similarity_from_distances(distances, space: str = "l2") -> np.ndarray:
+    """Convert Chroma distances to cosine similarity.
+
+    Chroma's default space is squared L2; for unit-length embeddings (MiniLM,
+    nomic-embed-text) cos = 1 - d/2. For "cosine" and "ip" spaces d = 1 - sim.
+    """
+    d = np.asarray(distances, dtype=np.float32)
+    if space == "l2":
+        return 1.0 - d / 2.0
+    return 1.0 - d
+
+
+def mmr(
+    relevance: np.ndarray,
+    embeddings: np.ndarray,
+    k: int,
+    lambda_mult: float = DEFAULT_LAMBDA,
+) -> list[int]:
+    """Return indices of k candidates chosen by MMR, in pick order.
+
+    relevance[i] is candidate i's similarity to the query; embeddings are the
+    candidates' vectors (one row each). lambda_mult=1 is pure relevance order,
+    0 is maximal diversity.
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    rel = np.asarray(relevance, dtype=np.float32)
+    emb = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    max_sim = np.full(n, -np.inf, dtype=np.float32)
+    taken = np.zeros(n, dtype=bool)
+    picked = [int(np.argmax(rel))]
+    taken[picked[0]] = True
+    while len(picked) < k:
+        np.maximum(max_sim, emb @ emb[picked[-1]], out=max_sim)
+        scores = lambda_mult * rel - (1.0 - lambda_mult) * max_sim
+        scores[taken] = -np.inf
+        nxt = int(np.argmax(scores))
+        picked.append(nxt)
+        taken[nxt] = True
+    return picked
+
+
+_ROW_KEYS = ("ids", "documents", "metadatas", "distances", "uris", "data")
+
+
+def rerank_results(
+    results: dict,
+    k: int,
+    lambda_mult: float = DEFAULT_LAMBDA,
+    *,
+    query_embeddings=None,
+    space: str = "l2",
+) -> dict:
+    """Apply MMR to each query row of a Chroma result that includes embeddings.
+
+    Relevance is cosine similarity to query_embeddings[row] when given,
+    otherwise derived from the returned distances. Returns a new result dict
+    truncated to k per row, with embeddings dropped.
+    """
+    out = {key: results.get(key) for key in results}
+    out["embeddings"] = None
+    rows = results.get("embeddings")
+    if rows is None:
+        rows = []
+    for key in _ROW_KEYS:
+        if results.get(key) is not None:
+            out[key] = [list(r) if r is not None else None for r in results[key]]
+    for row, ids in enumerate(results.get("ids") or []):
+        emb = rows[row] if row < len(rows) else None
+        if emb is None or len(emb) == 0:
+            order = list(range(min(k, len(ids))))
+        else:
+            emb = np.asarray(emb, dtype=np.float32)
+            if query_embeddings is not None:
+                q = np.asarray(query_embeddings[row], dtype=np.float32)
+                q = q / (np.linalg.norm(q) or 1.0)
+                relevance = _normalize_rows(emb) @ q
+            else:
+                relevance = similarity_from_distances(results["distances"][row], space)
+            order = mmr(relevance, emb, k, lambda_mult)
+        for key in _ROW_KEYS:
+            if out.get(key) is not None and out[key][row] is not None:
+                out[key][row] = [out[key][row][i] for i in order]
+    if "included" in out and out["included"] is not None:
+        out["included"] = [i for i in out["included"] if i != "embeddings"]
+    return out
+
+
+def _drop_off(sims: np.ndarray) -> int:
+    """How many of sims (sorted descending) come before a marked drop-off; len(sims) if there is none.
+
+    A drop-off is the largest gap between neighbouring scores when it is
+    more than GAP_FACTOR times the median gap, i.e. a clear knee rather than
+    the ordinary decline of a list of similar hits.
+    """
+    if len(sims) < 3:
+        return len(sims)
+    gaps = sims[:-1] - sims[1:]
+    i = int(np.argmax(gaps))
+    if gaps[i] > GAP_FACTOR * float(np.median(gaps)):
+        return i + 1
+    return len(sims)
+
+
+def apply_cutoff(
+    row: dict,
+    *,
+    min_similarity: float | None = None,
+    adaptive_ratio: float | None = None,
+    min_k: int = 1,
+    space: str = "l2",
+) -> dict:
+    """Filter a single-row Chroma result by similarity (derived from its distances).
+
+    A hit is kept if its similarity is >= min_similarity and >= adaptive_ratio
+    times the best hit's similarity. With adaptive_ratio, the hits left are
+    also cut at a marked drop-off in similarity (see _drop_off), so k follows
+    the scores rather than a fixed fraction. The min_k best hits are always
+    kept so a query never comes back empty just because every score is low.
+    Hit order is preserved.
+    """
+    if min_similarity is None and adaptive_ratio is None:
+        return row
+    distances = (row.get("distances") or [[]])[0]
+    if not distances:
+        return row
+    sims = similarity_from_distances(distances, space)
+    best = float(sims.max())
+    keep_mask = np.ones(len(sims), dtype=bool)
+    if min_similarity is not None:
+        keep_mask &= sims >= min_similarity
+    if adaptive_ratio is not None:
+        keep_mask &= sims >= best * adaptive_ratio if best > 0 else sims >= best
+        ranked = [i for i in np.argsort(-sims, kind="stable") if keep_mask[i]]
+        keep_mask[ranked[_drop_off(sims[ranked]) :]] = False
+    if min_k > 0:
+        keep_mask[np.argsort(-sims, kind="stable")[:min_k]] = True
+    keep = np.flatnonzero(keep_mask).tolist()
+    out = dict(row)
+    for key in _ROW_KEYS + ("embeddings",):
+        value = row.get(key)
+        if value is not None and value[0] is not None:
+            out[key] = [[value[0][i] for i in keep]]
+    return out
@@ -3,9 +3,9 @@
 from __future__ import annotations
 
 import sys
+import uuid
 from pathlib import Path
 from typing import Callable
-from urllib.parse import urlparse
 
 import chromadb
 from chromadb.api.types import EmbeddingFunction, Documents, Embeddings
@@ -14,7 +14,10 @@ from ingest.chunk import chunk_directory
 from ingest.config import IngestSettings
 from ingest.embed import embed as ollama_embed
 from ingest.embed import DEFAULT_BASE_URL
-from ingest.vector_store import upsert
+from ingest.repo_map import DEFAULT_TOKEN_BUDGET as DEFAULT_REPO_MAP_TOKENS
+from ingest.repo_map import build_repo_map, repo_map_metadata
+from ingest.shards import DEFAULT_NUM_SHARDS, group_by_shard, set_manifest, write_shards
+from ingest.vector_store import client_for_url, mark_generation, upsert
 
 
 def _embedding_function_for(
@@ -44,6 +47,11 @@ def _embedding_function_for(
     return _Wrapper()
 
 
+def collection_id_for(project_path: str | Path) -> str:
+    """Chroma collection id used for a project: code_<directory name>."""
+    return f"code_{Path(project_path).resolve().name}"
+
+
 def run_ingest(
     project_path: str | Path,
     collection_id: str,
@@ -52,39 +60,65 @@ def run_ingest(
     client: chromadb.Client | None = None,
     embed_func: Callable[[list[str]], list[list[float]]] | None = None,
     embed_base_url: str = DEFAULT_BASE_URL,
+    shard_by: str | None = None,
+    num_shards: int = DEFAULT_NUM_SHARDS,
+    only_shards: set[str] | None = None,
+    max_workers: int = 4,
+    repo_map_tokens: int = DEFAULT_REPO_MAP_TOKENS,
 ) -> None:
     """Chunk project dir, embed texts, upsert to vector store.
 
     If client is provided it is used (e.g. for tests). Else if vector_db_url
     is set, a Chroma HttpClient is created; otherwise an in-memory client is used.
     If embed_func is provided it is used; otherwise Ollama is called via embed.embed.
+    On completion a new index generation is recorded on the collection, which
+    invalidates cached query results (see ingest.query_cache).
+
+    With shard_by ("dir" or "hash", see ingest.shards) chunks are written to
+    per-shard collections by up to max_workers threads and collection_id
+    becomes the shard manifest. only_shards limits the run to those shard keys
+    so one ingest can be split across jobs; the manifest always lists every
+    shard of the project.
+
+    A repo map of up to repo_map_tokens (see ingest.repo_map; 0 skips it) is
+    stored with the new generation.
     """
     project_path = Path(project_path)
     if not project_path.is_dir():
         raise NotADirectoryError(f"project_path is not a directory: {project_path}")
 
     if client is None and vector_db_url:
-        parsed = urlparse(vector_db_url)
-        client = chromadb.HttpClient(
-            host=parsed.hostname or "localhost",
-            port=parsed.port or 8000,
-        )
+        client = client_for_url(vector_db_url)
     elif client is None:
         client = chromadb.Client()
 
     chunks = chunk_directory(project_path)
     if not chunks:
         return
-    texts = [t for t, _ in chunks]
-    metadatas = [m for _, m in chunks]
     ef = _embedding_function_for(embed_func, embed_base_url=embed_base_url)
-    upsert(
-        collection_id,
-        texts,
-        metadatas=metadatas,
-        client=client,
-        embedding_function=ef,
-    )
+    base = client.get_or_create_collection(name=collection_id, embedding_function=ef)
+    if shard_by:
+        groups = group_by_shard(chunks, shard_by, num_shards)
+
+        def _write(name: str, key: str, texts: list[str], metadatas: list[dict]) -> None:
+            upsert(name, texts, metadatas=metadatas, client=client, embedding_function=ef, id_prefix=f"{key}:")
+
+        write_shards(groups, collection_id, _write, only=only_shards, max_workers=max_workers)
+        set_manifest(base, shard_by, list(groups))
+    else:
+        upsert(
+            collection_id,
+            [t for t, _ in chunks],
+            metadatas=[m for _, m in chunks],
+            client=client,
+            embedding_function=ef,
+        )
+        set_manifest(base, None, [])
+    generation = uuid.uuid4().hex
+    extra = None
+    if repo_map_tokens > 0:
+        extra = repo_map_metadata(build_repo_map(project_path, repo_map_tokens), generation)
+    mark_generation(collection_id, client=client, generation=generation, extra=extra)
 
 
 def _main() -> None:
@@ -98,8 +132,17 @@ def _main() -> None:
         sys.exit(1)
     settings = IngestSettings()
     vector_db_url = settings.vector_db_url or None  # empty string -> None for in-memory
-    collection_id = f"code_{project_path.name}"
-    run_ingest(project_path, collection_id, vector_db_url=vector_db_url)
+    collection_id = collection_id_for(project_path)
+    run_ingest(
+        project_path,
+        collection_id,
+        vector_db_url=vector_db_url,
+        shard_by=settings.shard_by or None,
+        num_shards=settings.num_shards,
+        only_shards=set(settings.shards.split(",")) if settings.shards else None,
+        max_workers=settings.workers,
+        repo_map_tokens=settings.repo_map_tokens,
+    )
 
 
 if __name__ == "__main__":
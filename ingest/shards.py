@@ -0,0 +1,161 @@
+"""Shard a project's index across several Chroma collections.
+
+A sharded project keeps its base collection (code_<project>) as a manifest:
+its metadata maps shard keys to shard collection names and still carries the
+index generation. Shards are keyed by top-level directory ("dir") or by a
+hash of the relative path ("hash"). Ingest writes shards independently and in
+parallel; queries fan out to all relevant shards concurrently and merge the
+top-k by distance.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+SHARDS_KEY = "shards"
+STRATEGY_KEY = "shard_strategy"
+STRATEGIES = ("dir", "hash")
+DEFAULT_NUM_SHARDS = 8
+# Upper bound on concurrent shard queries per process.
+FANOUT_WORKERS = 16
+
+_ROW_KEYS = ("ids", "documents", "metadatas", "distances", "embeddings", "uris", "data")
+_NAME_UNSAFE = re.compile(r"[^a-zA-Z0-9._-]")
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _fanout_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="shard-query")
+    return _pool
+
+
+def shard_key(meta: dict, strategy: str, num_shards: int = DEFAULT_NUM_SHARDS) -> str:
+    """Shard key for a chunk: its top-level package ("dir") or a path hash bucket ("hash")."""
+    if strategy == "dir":
+        return meta.get("package") or "root"
+    if strategy == "hash":
+        path = meta.get("rel_path") or meta.get("path", "")
+        return f"h{zlib.crc32(path.encode()) % num_shards:03d}"
+    raise ValueError(f"unknown shard strategy: {strategy!r} (expected one of {STRATEGIES})")
+
+
+def shard_collection_name(collection_id: str, key: str) -> str:
+    """Chroma-safe collection name for a shard; unsafe keys get a hash suffix to stay unique."""
+    safe = _NAME_UNSAFE.sub("-", key).strip("._-")
+    if safe != key:
+        safe = f"{safe or 'x'}-{zlib.crc32(key.encode()):08x}"
+    return f"{collection_id}__shard_{safe}"
+
+
+def group_by_shard(
+    chunks: list[tuple[str, dict]],
+    strategy: str,
+    num_shards: int = DEFAULT_NUM_SHARDS,
+) -> dict[str, list[tuple[str, dict]]]:
+    """Split (text, metadata) chunks into shard key -> chunks."""
+    groups: dict[str, list[tuple[str, dict]]] = {}
+    for text, meta in chunks:
+        groups.setdefault(shard_key(meta, strategy, num_shards), []).append((text, meta))
+    return groups
+
+
+def write_shards(
+    groups: dict[str, list[tuple[str, dict]]],
+    collection_id: str,
+    write: Callable[[str, str, list[str], list[dict]], None],
+    *,
+    only: set[str] | None = None,
+    max_workers: int = 4,
+) -> list[str]:
+    """Write each shard's chunks via write(shard_collection, key, texts, metadatas), in parallel.
+
+    only restricts the run to those shard keys (for splitting one ingest across
+    jobs). Returns the keys written. Errors from any shard are re-raised.
+    """
+    keys = [k for k in groups if only is None or k in only]
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="shard-ingest") as pool:
+        futures = [
+            pool.submit(
+                write,
+                shard_collection_name(collection_id, k),
+                k,
+                [t for t, _ in groups[k]],
+                [m for _, m in groups[k]],
+            )
+            for k in keys
+        ]
+        for f in futures:
+            f.result()
+    return keys
+
+
+def set_manifest(coll, strategy: str | None, keys: list[str]) -> None:
+    """Record (or with strategy None, clear) the shard map on the base collection's metadata."""
+    kept = {k: v for k, v in (coll.metadata or {}).items() if not k.startswith("hnsw:")}
+    if strategy is None:
+        if not kept.get(SHARDS_KEY):
+            return
+        kept.update({SHARDS_KEY: "", STRATEGY_KEY: ""})
+    else:
+        shards = {k: shard_collection_name(coll.name, k) for k in sorted(keys)}
+        kept.update({SHARDS_KEY: json.dumps(shards), STRATEGY_KEY: strategy})
+    coll.modify(metadata=kept)
+
+
+def read_manifest(coll) -> tuple[str | None, dict[str, str]]:
+    """(strategy, {shard key: collection name}) from the base collection; (None, {}) if unsharded."""
+    meta = coll.metadata or {}
+    raw = meta.get(SHARDS_KEY)
+    if not raw:
+        return None, {}
+    return meta.get(STRATEGY_KEY) or None, json.loads(raw)
+
+
+def prune_for_prefix(strategy: str | None, shards: dict[str, str], path_prefix: str | None) -> list[str]:
+    """Shard collection names that can hold hits under path_prefix (all of them unless dir-sharded)."""
+    if strategy == "dir" and path_prefix:
+        parts = [p for p in path_prefix.strip().strip("/").split("/") if p and p != "."]
+        if parts:
+            # A single path component can also be a root-level file.
+            keys = {parts[0]} if len(parts) > 1 else {parts[0], "root"}
+            return [name for key, name in shards.items() if key in keys]
+    return list(shards.values())
+
+
+def merge_by_distance(results: list[dict], n_results: int) -> dict:
+    """Merge per-shard Chroma results row by row, keeping the n_results nearest hits."""
+    base = results[0]
+    merged: dict = {k: v for k, v in base.items() if k not in _ROW_KEYS}
+    present = [k for k in _ROW_KEYS if base.get(k) is not None]
+    for k in _ROW_KEYS:
+        merged[k] = [] if k in present else None
+    for row in range(len(base["ids"])):
+        hits = []
+        for r in results:
+            for i, dist in enumerate(r["distances"][row]):
+                hits.append((dist, r, i))
+        hits.sort(key=lambda h: h[0])
+        top = hits[:n_results]
+        for k in present:
+            merged[k].append([r[k][row][i] for _, r, i in top])
+    return merged
+
+
+def fan_out_query(shard_collections: list, n_results: int, **kwargs) -> dict:
+    """Run collection.query(**kwargs) on every shard concurrently and merge the top n_results by distance."""
+    include = kwargs.get("include")
+    if include is not None and "distances" not in include:
+        kwargs["include"] = [*include, "distances"]
+    pool = _fanout_pool()
+    results = list(pool.map(lambda c: c.query(n_results=n_results, **kwargs), shard_collections))
+    return merge_by_distance(results, n_results)
@@ -0,0 +1,200 @@
+"""Export a project index to a single snapshot file and import it back without re-embedding.
+
+File layout (little-endian):
+
+    MAGIC (8 bytes) | header length (uint64) | JSON header | pad to 64 bytes
+    | per collection: float32 vectors (count x dim, C order), 64-byte aligned
+    | per collection: JSON records {"ids", "documents", "metadatas"}
+
+The header lists each collection (name, metadata, count, dim and the byte
+offsets of its vectors and records), base collection first, so the vectors
+can be memory-mapped straight from the file. A sharded project is exported
+with all of its shard collections (see ingest.shards).
+
+CLI:
+    python -m ingest.snapshot export <project_path> <file>
+    python -m ingest.snapshot import <file>
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import struct
+import sys
+from pathlib import Path
+
+import chromadb
+import numpy as np
+
+from ingest.config import IngestSettings
+from ingest.run import _embedding_function_for, collection_id_for
+from ingest.shards import read_manifest
+from ingest.vector_store import client_for_url
+
+MAGIC = b"CHSNAP01"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_LEN = struct.Struct("<Q")
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _read_collection(coll, batch_size: int) -> tuple[np.ndarray, dict]:
+    """(vectors, records) of every item in coll, paged by batch_size."""
+    ids: list[str] = []
+    documents: list = []
+    metadatas: list = []
+    vectors: list[np.ndarray] = []
+    offset = 0
+    while True:
+        page = coll.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(page["metadatas"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    matrix = np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    return matrix, {"ids": ids, "documents": documents, "metadatas": metadatas}
+
+
+def export_snapshot(collection_id: str, path: str | Path, *, client: chromadb.Client) -> dict:
+    """Write collection_id (and its shards, if sharded) to path; returns the header written."""
+    base = client.get_collection(name=collection_id)
+    _, shards = read_manifest(base)
+    batch_size = client.get_max_batch_size()
+    collections = []
+    payloads = []
+    for name in [collection_id, *shards.values()]:
+        coll = base if name == collection_id else client.get_collection(name=name)
+        matrix, records = _read_collection(coll, batch_size)
+        collections.append(
+            {
+                "name": name,
+                "metadata": coll.metadata or {},
+                "count": len(records["ids"]),
+                "dim": int(matrix.shape[1]) if matrix.size else 0,
+            }
+        )
+        payloads.append((matrix, json.dumps(records, separators=(",", ":")).encode()))
+
+    header = {"format": FORMAT_VERSION, "collections": collections}
+    # Offsets depend on the header's own length; widen until it stops growing.
+    header_len = 0
+    while True:
+        offset = _align(len(MAGIC) + _LEN.size + header_len)
+        for entry, (matrix, _) in zip(collections, payloads):
+            entry["vectors_offset"] = offset
+            offset = _align(offset + matrix.nbytes)
+        for entry, (_, records) in zip(collections, payloads):
+            entry["records_offset"] = offset
+            entry["records_length"] = len(records)
+            offset += len(records)
+        encoded = json.dumps(header, separators=(",", ":")).encode()
+        if len(encoded) <= header_len:
+            break
+        header_len = len(encoded)
+    encoded = encoded.ljust(header_len)
+
+    with open(path, "wb") as f:
+        f.write(MAGIC + _LEN.pack(header_len) + encoded)
+        for entry, (matrix, _) in zip(collections, payloads):
+            f.seek(entry["vectors_offset"])
+            f.write(np.ascontiguousarray(matrix).tobytes())
+        for entry, (_, records) in zip(collections, payloads):
+            f.seek(entry["records_offset"])
+            f.write(records)
+    return header
+
+
+def read_header(path: str | Path) -> dict:
+    """Parse and validate a snapshot header."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"not an index snapshot: {path}")
+        (length,) = _LEN.unpack(f.read(_LEN.size))
+        header = json.loads(f.read(length))
+    if header.get("format") != FORMAT_VERSION:
+        raise ValueError(f"unsupported snapshot format {header.get('format')!r} (expected {FORMAT_VERSION})")
+    return header
+
+
+def import_snapshot(
+    path: str | Path,
+    *,
+    client: chromadb.Client,
+    embedding_function: chromadb.api.types.EmbeddingFunction | None = None,
+) -> list[str]:
+    """Restore every collection in the snapshot with bulk upserts; returns the collection names.
+
+    Existing collections of the same names are replaced. Vectors are
+    memory-mapped and written in batches of the client's max batch size.
+    Shards are written before the base collection so its metadata
+    (generation, shard manifest, repo map) only appears once the data it
+    describes is in place. Pass the embedding_function later used for
+    queries so the collections are created with it.
+    """
+    header = read_header(path)
+    kwargs = {"embedding_function": embedding_function} if embedding_function is not None else {}
+    batch_size = client.get_max_batch_size()
+    base, *shards = header["collections"]
+    existing = {c.name for c in client.list_collections()}
+    with open(path, "rb") as f:
+        for entry in [*shards, base]:
+            f.seek(entry["records_offset"])
+            records = json.loads(f.read(entry["records_length"]))
+            # hnsw:* settings (e.g. the distance space) can only be set at creation.
+            hnsw = {k: v for k, v in entry["metadata"].items() if k.startswith("hnsw:")}
+            if entry["name"] in existing:
+                client.delete_collection(entry["name"])
+            coll = client.get_or_create_collection(name=entry["name"], metadata=hnsw or None, **kwargs)
+            if entry["count"]:
+                vectors = np.memmap(
+                    path, dtype=np.float32, mode="r", offset=entry["vectors_offset"], shape=(entry["count"], entry["dim"])
+                )
+                for start in range(0, entry["count"], batch_size):
+                    end = start + batch_size
+                    coll.upsert(
+                        ids=records["ids"][start:end],
+                        embeddings=np.asarray(vectors[start:end]),
+                        documents=records["documents"][start:end],
+                        metadatas=records["metadatas"][start:end],
+                    )
+            metadata = {k: v for k, v in entry["metadata"].items() if not k.startswith("hnsw:")}
+            if metadata:
+                coll.modify(metadata=metadata)
+    return [entry["name"] for entry in header["collections"]]
+
+
+def _main() -> None:
+    """Entrypoint: python -m ingest.snapshot export|import. Vector URL from settings (env)."""
+    parser = argparse.ArgumentParser(prog="python -m ingest.snapshot", description=__doc__.split("\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="write a project's index to a snapshot file")
+    export.add_argument("project_path")
+    export.add_argument("file")
+    restore = sub.add_parser("import", help="load a snapshot file into the vector store")
+    restore.add_argument("file")
+    args = parser.parse_args()
+
+    settings = IngestSettings()
+    client = client_for_url(settings.vector_db_url) if settings.vector_db_url else chromadb.Client()
+    if args.command == "export":
+        header = export_snapshot(collection_id_for(args.project_path), args.file, client=client)
+        total = sum(c["count"] for c in header["collections"])
+        print(f"exported {total} chunks in {len(header['collections'])} collections to {args.file}")
+    else:
+        try:
+            names = import_snapshot(args.file, client=client, embedding_function=_embedding_function_for(None))
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            sys.exit(1)
+        print(f"imported {', '.join(names)}")
+
+
+if __name__ == "__main__":
+    _main()
@@ -2,7 +2,22 @@
 
 from __future__ import annotations
 
+import json
+import uuid
+
+from urllib.parse import urlparse
+
 import chromadb
+import structlog
+from chromadb.errors import NotFoundError
+
+from ingest.chunk import MAX_DIR_DEPTH
+from ingest.query_cache import QueryCache, normalize_query
+from ingest.rerank import DEFAULT_FETCH_K, apply_cutoff, rerank_results
+from ingest.shards import fan_out_query, prune_for_prefix, read_manifest
+
+# Collection metadata key bumped when an ingest completes; part of every cache key.
+GENERATION_KEY = "index_generation"
 
 
 def _get_client(client: chromadb.Client | None) -> chromadb.Client:
@@ -12,6 +27,41 @@ def _get_client(client: chromadb.Client | None) -> chromadb.Client:
     return chromadb.Client()
 
 
+def client_for_url(vector_db_url: str) -> chromadb.Client:
+    """Chroma HttpClient for a VECTOR_DB_URL such as http://chroma:8000."""
+    parsed = urlparse(vector_db_url)
+    return chromadb.HttpClient(host=parsed.hostname or "localhost", port=parsed.port or 8000)
+
+
+def _get_collection(
+    c: chromadb.Client,
+    collection_id: str,
+    embedding_function: chromadb.api.types.EmbeddingFunction | None,
+):
+    kwargs = {"name": collection_id}
+    if embedding_function is not None:
+        kwargs["embedding_function"] = embedding_function
+    return c.get_or_create_collection(**kwargs)
+
+
+def _shard_collections(
+    c: chromadb.Client,
+    names: list[str],
+    embedding_function: chromadb.api.types.EmbeddingFunction | None,
+) -> list:
+    """The shard collections that exist; one not written yet (e.g. by an ingest split across jobs) is skipped."""
+    colls = []
+    for name in names:
+        kwargs = {"name": name}
+        if embedding_function is not None:
+            kwargs["embedding_function"] = embedding_function
+        try:
+            colls.append(c.get_collection(**kwargs))
+        except (NotFoundError, ValueError):  # chromadb 0.5 raises ValueError
+            structlog.get_logger().warning("shard_collection_missing", collection=name)
+    return colls
+
+
 def upsert(
     collection_id: str,
     texts: list[str],
@@ -19,21 +69,284 @@ def upsert(
     *,
     client: chromadb.Client | None = None,
     embedding_function: chromadb.api.types.EmbeddingFunction | None = None,
+    id_prefix: str = "",
 ) -> None:
     """Add document chunks to a Chroma collection (creates collection if needed).
 
     Uses Chroma's default embedding when no embeddings are provided.
     Pass embedding_function to avoid default embedder (e.g. for tests without disk).
+    Chunk ids are f"{id_prefix}chunk_{i}"; shards pass their key so merged results keep unique ids.
     """
-    c = _get_client(client)
-    kwargs = {"name": collection_id}
-    if embedding_function is not None:
-        kwargs["embedding_function"] = embedding_function
-    coll = c.get_or_create_collection(**kwargs)
-    ids = [f"chunk_{i}" for i in range(len(texts))]
+    coll = _get_collection(_get_client(client), collection_id, embedding_function)
+    ids = [f"{id_prefix}chunk_{i}" for i in range(len(texts))]
     coll.add(ids=ids, documents=texts, metadatas=metadatas)
 
 
+def mark_generation(
+    collection_id: str,
+    *,
+    client: chromadb.Client | None = None,
+    generation: str | None = None,
+    extra: dict | None = None,
+) -> str:
+    """Record a new index generation on the collection; returns it.
+
+    Called when an ingest completes so cached query results for older
+    generations stop matching. extra is further metadata written in the
+    same update (e.g. the repo map built for this generation). Other
+    collection metadata is preserved (hnsw:* keys are fixed at creation and
+    cannot be modified).
+    """
+    generation = generation or uuid.uuid4().hex
+    coll = _get_client(client).get_or_create_collection(name=collection_id)
+    kept = {k: v for k, v in (coll.metadata or {}).items() if not k.startswith("hnsw:")}
+    coll.modify(metadata={**kept, **(extra or {}), GENERATION_KEY: generation})
+    return generation
+
+
+def get_generation(coll) -> str:
+    """Index generation recorded on a collection ('' if never marked)."""
+    return str((coll.metadata or {}).get(GENERATION_KEY, ""))
+
+
+def _and(*clauses: dict | None) -> dict | None:
+    present = [c for c in clauses if c]
+    if not present:
+        return None
+    if len(present) == 1:
+        return present[0]
+    return {"$and": present}
+
+
+def _eq_or_in(key: str, value: str | list[str]) -> dict:
+    if isinstance(value, str):
+        return {key: value}
+    return {key: {"$in": list(value)}}
+
+
+def attribute_filter(
+    *,
+    language: str | list[str] | None = None,
+    package: str | list[str] | None = None,
+    kind: str | list[str] | None = None,
+) -> dict | None:
+    """Chroma where clause over chunk attributes recorded at ingest (see chunk.file_attributes).
+
+    Each argument is a single value or a list of accepted values; None means no constraint.
+    """
+    return _and(
+        *(
+            _eq_or_in(key, value)
+            for key, value in (("language", language), ("package", package), ("kind", kind))
+            if value is not None
+        )
+    )
+
+
+def path_filter(path_prefix: str) -> tuple[dict | None, str | None]:
+    """Chroma where clause for a project-relative directory or file path.
+
+    Uses the dir1..dirN prefixes precomputed at ingest, so the filter is an
+    equality match inside the index. For prefixes deeper than MAX_DIR_DEPTH
+    the where clause matches the depth-N ancestor and the full prefix is
+    returned as the second element, to be checked against rel_path on results.
+    """
+    parts = [p for p in path_prefix.strip().strip("/").split("/") if p and p != "."]
+    if not parts:
+        return None, None
+    prefix = "/".join(parts)
+    if len(parts) <= MAX_DIR_DEPTH:
+        return {"$or": [{f"dir{len(parts)}": prefix}, {"rel_path": prefix}]}, None
+    return {f"dir{MAX_DIR_DEPTH}": "/".join(parts[:MAX_DIR_DEPTH])}, prefix
+
+
+def _keep_under_prefix(row: dict, prefix: str) -> dict:
+    """Drop hits of a single-row result whose rel_path is not prefix or under it."""
+    metas = (row.get("metadatas") or [[]])[0] or []
+    keep = [
+        i
+        for i, m in enumerate(metas)
+        if m and (m.get("rel_path") == prefix or str(m.get("rel_path", "")).startswith(prefix + "/"))
+    ]
+    out = dict(row)
+    for key, value in row.items():
+        if key != "included" and value is not None and value[0] is not None:
+            out[key] = [[value[0][i] for i in keep]]
+    return out
+
+
+def _embedding_model_name(embedding_function) -> str:
+    try:
+        return embedding_function.name()
+    except Exception:
+        return type(embedding_function).__name__
+
+
+def _collection_embedding_function(coll) -> chromadb.api.types.EmbeddingFunction | None:
+    """The embedding function persisted in coll's configuration (chromadb >= 1.0), or None if it has none."""
+    configuration = getattr(coll, "configuration", None)
+    return configuration.get("embedding_function") if isinstance(configuration, dict) else None
+
+
+def _query_embeddings(
+    query_texts: list[str],
+    embedding_function: chromadb.api.types.EmbeddingFunction,
+    cache: QueryCache | None,
+) -> list:
+    """Embed query_texts in one embedding_function call, reusing cache.embeddings when given."""
+    # Chroma embeds query_texts with embed_query where the function has one (some models embed queries differently).
+    embed = getattr(embedding_function, "embed_query", embedding_function)
+    if cache is None:
+        return list(embed(query_texts))
+    model = _embedding_model_name(embedding_function)
+    keys = [cache.embedding_key(model, t) for t in query_texts]
+    vectors = [cache.embeddings.get(k) for k in keys]
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        fresh = embed([query_texts[i] for i in missing])
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+            cache.embeddings.set(keys[i], vector)
+    return vectors
+
+
+def _split_rows(result: dict, n_rows: int) -> list[dict]:
+    """Split a multi-query Chroma result into one single-row result per query."""
+    rows: list[dict] = []
+    for i in range(n_rows):
+        row = {}
+        for key, value in result.items():
+            if key == "included" or value is None:
+                row[key] = value
+            else:
+                row[key] = [value[i]]
+        rows.append(row)
+    return rows
+
+
+def query_many(
+    collection_id: str,
+    query_texts: list[str],
+    n_results: int = 5,
+    *,
+    client: chromadb.Client | None = None,
+    embedding_function: chromadb.api.types.EmbeddingFunction | None = None,
+    cache: QueryCache | None = None,
+    mmr_lambda: float | None = None,
+    fetch_k: int | None = None,
+    where: dict | None = None,
+    path_prefix: str | None = None,
+    min_similarity: float | None = None,
+    adaptive_ratio: float | None = None,
+    max_results: int | None = None,
+) -> list[dict]:
+    """Query a collection with several texts in one round trip; returns one result per query.
+
+    Each returned dict has the shape of a single-query Chroma result
+    ('documents' is a list holding one list). Queries that are cache hits, or
+    duplicates (after whitespace normalization) of an earlier query in the
+    batch, are not sent; the rest are embedded in one batch and searched in
+    one collection.query call.
+
+    With cache, results are served from it when (collection, index generation,
+    normalized query, n_results, rerank/filter settings) was seen before, and query
+    embeddings are reused across calls. Queries are embedded with embedding_function,
+    or else with the one persisted in the collection's configuration, once per batch
+    however many shards are searched; without either, Chroma embeds query_texts.
+    Cached result dicts are shared; callers must not mutate them.
+
+    With mmr_lambda, max(fetch_k, n_results) candidates per query are fetched
+    with their embeddings and reranked to n_results by maximal marginal
+    relevance (see ingest.rerank).
+
+    where (Chroma syntax, e.g. from attribute_filter) and path_prefix (a
+    project-relative directory or file, see path_filter) restrict the search
+    inside the index.
+
+    Every result includes 'distances'. min_similarity drops hits below that
+    similarity; adaptive_ratio makes k adaptive by dropping hits scoring below
+    that fraction of the best hit or past a drop-off in the scores (see
+    rerank.apply_cutoff). Adaptive queries fetch max(max_results, n_results)
+    candidates, which is then the upper bound.
+
+    If the collection is a shard manifest (see ingest.shards), the search fans
+    out concurrently to its shards (only the matching one for a dir-sharded
+    path_prefix) and the nearest n_results hits are merged. Shards listed in
+    the manifest but not written yet count as empty (logged as
+    shard_collection_missing).
+    """
+    c = _get_client(client)
+    coll = _get_collection(c, collection_id, embedding_function)
+    strategy, shards = read_manifest(coll)
+    k = max(n_results, max_results or 0) if adaptive_ratio is not None else n_results
+    rerank = None
+    if mmr_lambda is not None:
+        rerank = (mmr_lambda, max(fetch_k or DEFAULT_FETCH_K, k))
+    residual_prefix = None
+    if path_prefix:
+        scope, residual_prefix = path_filter(path_prefix)
+        where = _and(where, scope)
+    # Everything besides the query text and k that changes the result.
+    options = (
+        rerank,
+        json.dumps(where, sort_keys=True) if where else None,
+        residual_prefix,
+        min_similarity,
+        adaptive_ratio,
+        k,
+    )
+    generation = get_generation(coll) if cache is not None else ""
+
+    out: list[dict | None] = [None] * len(query_texts)
+    pending: dict[str, list[int]] = {}  # normalized text -> indices sharing it
+    for i, text in enumerate(query_texts):
+        if cache is not None:
+            hit = cache.results.get(cache.result_key(collection_id, generation, text, n_results, *options))
+            if hit is not None:
+                out[i] = hit
+                continue
+        pending.setdefault(normalize_query(text), []).append(i)
+    if not pending:
+        return out
+
+    texts = [query_texts[indices[0]] for indices in pending.values()]
+    kwargs: dict = {"n_results": k}
+    vectors = None
+    embedder = embedding_function or _collection_embedding_function(coll)
+    if embedder is not None:
+        # Embed once here rather than once per shard / again for reranking.
+        vectors = _query_embeddings(texts, embedder, cache)
+        kwargs["query_embeddings"] = vectors
+    else:
+        kwargs["query_texts"] = texts
+    if where:
+        kwargs["where"] = where
+    if rerank is not None:
+        kwargs["n_results"] = rerank[1]
+        kwargs["include"] = ["documents", "metadatas", "distances", "embeddings"]
+    if shards:
+        names = prune_for_prefix(strategy, shards, path_prefix)
+        shard_colls = _shard_collections(c, names, embedding_function)
+        if shard_colls:
+            result = fan_out_query(shard_colls, **kwargs)
+        else:
+            result = {key: [[] for _ in texts] for key in ("ids", "documents", "metadatas", "distances")}
+    else:
+        result = coll.query(**kwargs)
+    if rerank is not None:
+        result = rerank_results(result, k, rerank[0], query_embeddings=vectors)
+
+    for text, indices, row in zip(texts, pending.values(), _split_rows(result, len(texts))):
+        if residual_prefix is not None:
+            row = _keep_under_prefix(row, residual_prefix)
+        row = apply_cutoff(row, min_similarity=min_similarity, adaptive_ratio=adaptive_ratio)
+        for i in indices:
+            out[i] = row
+        if cache is not None:
+            cache.results.set(cache.result_key(collection_id, generation, text, n_results, *options), row)
+    return out
+
+
 def query(
     collection_id: str,
     query_text: str,
@@ -41,11 +354,31 @@ def query(
     *,
     client: chromadb.Client | None = None,
     embedding_function: chromadb.api.types.EmbeddingFunction | None = None,
+    cache: QueryCache | None = None,
+    mmr_lambda: float | None = None,
+    fetch_k: int | None = None,
+    where: dict | None = None,
+    path_prefix: str | None = None,
+    min_similarity: float | None = None,
+    adaptive_ratio: float | None = None,
+    max_results: int | None = None,
 ) -> dict:
-    """Query a collection by text; returns Chroma result dict with 'documents' (list of lists)."""
-    c = _get_client(client)
-    kwargs = {"name": collection_id}
-    if embedding_function is not None:
-        kwargs["embedding_function"] = embedding_function
-    coll = c.get_or_create_collection(**kwargs)
-    return coll.query(query_texts=[query_text], n_results=n_results)
+    """Query a collection by text; returns Chroma result dict with 'documents' (list of lists).
+
+    Single-query form of query_many (same cache, rerank, filter and cutoff options).
+    """
+    return query_many(
+        collection_id,
+        [query_text],
+        n_results,
+        client=client,
+        embedding_function=embedding_function,
+        cache=cache,
+        mmr_lambda=mmr_lambda,
+        fetch_k=fetch_k,
+        where=where,
+        path_prefix=path_prefix,
+        min_similarity=min_similarity,
+        adaptive_ratio=adaptive_ratio,
+        max_results=max_results,
+    )[0]
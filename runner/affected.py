@@ -0,0 +1,178 @@
+"""Affected-test selection: run only the test modules that import what changed.
+
+The Runner parses every Python file of a project with ast (cached per
+file by mtime and size), builds the module import graph, and walks it
+backwards from the files changed since the last passing affected run to
+the test modules that import them, directly or transitively. Anything the
+graph cannot vouch for falls back to the full suite: no baseline yet, a
+changed conftest.py, a deleted module, or a changed non-Python file
+(data, config, lockfiles).
+"""
+
+from __future__ import annotations
+
+import ast
+import hashlib
+import json
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from runner.result_cache import TreeFingerprinter
+
+# Directories holding installed packages rather than project code.
+ENV_DIRS = frozenset({".venv", "venv", "env", "node_modules", "site-packages", "build", "dist"})
+
+MODE_AFFECTED = "affected"
+MODE_FULL = "full"
+MODE_NONE = "none"
+
+
+def is_test_file(rel: str) -> bool:
+    name = os.path.basename(rel)
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+
+@dataclass
+class Selection:
+    """What an affected run executes: mode is affected (test_files only), full, or none (nothing changed)."""
+
+    mode: str
+    reason: str
+    changed_files: list[str] = field(default_factory=list)
+    test_files: list[str] = field(default_factory=list)
+    # File digests at selection time; recorded as the new baseline once the run passes.
+    snapshot: dict[str, str] = field(default_factory=dict, repr=False)
+
+
+def _module_names(rel: str, package_dirs: set[str]) -> list[str]:
+    """Importable names of a project file: its dotted path, the same under src/, and a bare name for rootdir-style imports."""
+    parts = rel[:-3].split(os.sep)
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    if not parts:
+        return []
+    names = [".".join(parts)]
+    if parts[0] in ("src", "lib") and len(parts) > 1:
+        names.append(".".join(parts[1:]))
+    parent = os.path.dirname(rel)
+    if parent and parent not in package_dirs and rel.endswith(".py") and not rel.endswith("__init__.py"):
+        # pytest's default import mode puts non-package test dirs on sys.path.
+        names.append(parts[-1])
+    return names
+
+
+def _imports(source: str, module: str, is_package: bool) -> set[str]:
+    """Dotted names a module imports, including every parent package and `from x import y` submodule candidates."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return set()
+    found: set[str] = set()
+    package = module.split(".") if is_package else module.split(".")[:-1]
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            targets = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package[: len(package) - node.level + 1] if node.level <= len(package) + 1 else []
+                prefix = ".".join([*base, node.module] if node.module else base)
+            else:
+                prefix = node.module or ""
+            targets = [prefix] + [f"{prefix}.{alias.name}" if prefix else alias.name for alias in node.names]
+        else:
+            continue
+        for target in targets:
+            parts = target.split(".")
+            found.update(".".join(parts[:i]) for i in range(1, len(parts) + 1) if parts[0])
+    return found
+
+
+class AffectedTests:
+    """Import graphs and last-green baselines per project; baselines live in state_dir."""
+
+    def __init__(self, state_dir: str | Path, fingerprinter: TreeFingerprinter) -> None:
+        self.state_dir = Path(state_dir)
+        self.fingerprinter = fingerprinter
+        # absolute path -> (digest, imported names)
+        self._parsed: dict[str, tuple[str, set[str]]] = {}
+        self._lock = threading.Lock()
+
+    def _baseline_path(self, project_path: str) -> Path:
+        digest = hashlib.sha256(os.path.realpath(project_path).encode()).hexdigest()[:32]
+        return self.state_dir / f"baseline-{digest}.json"
+
+    def _load_baseline(self, project_path: str) -> dict[str, str] | None:
+        try:
+            return json.loads(self._baseline_path(project_path).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def record(self, project_path: str, snapshot: dict[str, str]) -> None:
+        """Make snapshot the baseline that later selections diff against (call after a passing run)."""
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        path = self._baseline_path(project_path)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(snapshot))
+        os.replace(tmp, path)
+
+    def _graph(self, root: str, digests: dict[str, str]) -> dict[str, set[str]]:
+        """Reverse import graph over project Python files: file -> files that import it."""
+        py_files = [rel for rel in digests if rel.endswith(".py") and not ENV_DIRS.intersection(rel.split(os.sep))]
+        package_dirs = {os.path.dirname(rel) for rel in py_files if os.path.basename(rel) == "__init__.py"}
+        by_name: dict[str, str] = {}
+        for rel in py_files:
+            for name in _module_names(rel, package_dirs):
+                by_name.setdefault(name, rel)
+        importers: dict[str, set[str]] = {rel: set() for rel in py_files}
+        with self._lock:
+            for rel in py_files:
+                path = os.path.join(root, rel)
+                cached = self._parsed.get(path)
+                if cached is None or cached[0] != digests[rel]:
+                    names = _module_names(rel, package_dirs)
+                    try:
+                        source = Path(path).read_text(encoding="utf-8", errors="replace")
+                    except OSError:
+                        continue
+                    imported = _imports(source, names[0] if names else "", rel.endswith("__init__.py"))
+                    cached = self._parsed[path] = (digests[rel], imported)
+                for name in cached[1]:
+                    target = by_name.get(name)
+                    if target is not None and target != rel:
+                        importers[target].add(rel)
+        return importers
+
+    def select(self, project_path: str) -> Selection:
+        """Test files affected by changes since the last recorded passing run (blocking I/O)."""
+        root = os.path.realpath(project_path)
+        snapshot = self.fingerprinter.digests(root)
+        baseline = self._load_baseline(project_path)
+        if baseline is None:
+            return Selection(MODE_FULL, "no previous passing run to compare against", snapshot=snapshot)
+        changed = sorted(rel for rel in snapshot.keys() | baseline.keys() if snapshot.get(rel) != baseline.get(rel))
+        if not changed:
+            return Selection(MODE_NONE, "no changes since the last passing run", snapshot=snapshot)
+        for rel in changed:
+            if not rel.endswith(".py") or os.path.basename(rel) == "conftest.py":
+                reason = f"{rel} changed and is not covered by the import graph"
+            elif rel not in snapshot:
+                reason = f"{rel} was deleted; its importers are no longer in the graph"
+            else:
+                continue
+            return Selection(MODE_FULL, reason, changed, snapshot=snapshot)
+
+        importers = self._graph(root, snapshot)
+        seen = set(changed)
+        queue = deque(seen)
+        while queue:
+            for importer in importers.get(queue.popleft(), ()):
+                if importer not in seen:
+                    seen.add(importer)
+                    queue.append(importer)
+        tests = sorted(rel for rel in seen if is_test_file(rel))
+        if not tests:
+            return Selection(MODE_NONE, "no test module imports the changed files", changed, snapshot=snapshot)
+        return Selection(MODE_AFFECTED, f"{len(tests)} test modules import the changed files", changed, tests, snapshot)
@@ -1,26 +1,58 @@
-"""FastAPI app for the runner service: POST /execute to run commands in a project."""
+"""FastAPI app for the runner service: POST /execute (or /jobs) to run commands in a project."""
 
+import asyncio
+import json
 import os
-import subprocess
+import shutil
+import tempfile
 import time
 import uuid
-from typing import Any
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Literal
 
 import structlog
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from starlette.requests import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 from pydantic import BaseModel, Field
 
 from prometheus_fastapi_instrumentator import Instrumentator
 
+from runner.affected import MODE_AFFECTED, MODE_NONE, AffectedTests, Selection
+from runner.capture import OutputCapture, SpillStore
 from runner.config import RunnerSettings
+from runner.envcache import EnvBuildError, EnvCache
+from runner.executor import ProcessResult, ResourceLimits, Spawner, observe_usage, run_process, stream_process
+from runner.jobs import RUNNING, Job, JobTable
+from runner.junit import summarize
 from runner.logging_config import configure_logging
+from runner.parallel import DurationStore, is_pytest, run_sharded
+from runner.result_cache import RESULT_CACHE_REQUESTS, ResultCache, TreeFingerprinter, result_key
+from runner.scheduler import INTERACTIVE, QueueFull, Scheduler
+from runner.singleflight import Flight, SingleFlight
+from runner.warm import DEFAULT_PRELOAD, WarmPool
+from runner.workspace import Workspaces
 
 ALLOWED_COMMAND_PREFIXES = ("pytest", "npm", "cargo", "go", "python", "node")
 
 _runner_settings: RunnerSettings | None = None
+_scheduler: Scheduler | None = None
+_spill_store: SpillStore | None = None
+_jobs: JobTable | None = None
+_result_cache: ResultCache | None = None
+_fingerprinter = TreeFingerprinter()
+_flights: SingleFlight | None = None
+_durations: DurationStore | None = None
+_affected: AffectedTests | None = None
+_warm_pool: WarmPool | None = None
+_env_cache: EnvCache | None = None
+_workspaces: Workspaces | None = None
+DEFAULT_STATE_DIR = os.path.join(tempfile.gettempdir(), "code-helper-runner")
+# Upper bound for GET /jobs/{job_id}?wait= (long poll).
+MAX_JOB_WAIT_SECONDS = 30.0
 
 
 def _get_runner_settings() -> RunnerSettings:
@@ -30,6 +62,22 @@ def _get_runner_settings() -> RunnerSettings:
     return _runner_settings
 
 
+def _resource_limits() -> ResourceLimits:
+    """setrlimit caps for executed commands (RUNNER_LIMIT_*)."""
+    s = _get_runner_settings()
+    return ResourceLimits(s.limit_memory_bytes, s.limit_cpu_seconds, s.limit_open_files)
+
+
+def _get_scheduler() -> Scheduler:
+    """Process-wide execution scheduler (RUNNER_MAX_CONCURRENT / RUNNER_MAX_QUEUE / RUNNER_MAX_PER_PROJECT)."""
+    global _scheduler
+    if _scheduler is None:
+        s = _get_runner_settings()
+        weights = {os.path.realpath(path): weight for path, weight in s.project_weights.items()}
+        _scheduler = Scheduler(s.max_concurrent, s.max_queue, max_per_project=s.max_per_project, weights=weights)
+    return _scheduler
+
+
 class ExecuteRequest(BaseModel):
     """Request body for POST /execute."""
 
@@ -38,6 +86,61 @@ class ExecuteRequest(BaseModel):
     cwd: str | None = None
     env: dict[str, str] | None = None
     timeout_seconds: int | None = Field(default=300, ge=1)
+    # pytest only: split the collected tests into this many parallel processes (capped by RUNNER_MAX_SHARDS).
+    shards: int | None = Field(default=None, ge=1)
+    # pytest only: run just the test modules importing files changed since the last passing affected run.
+    affected: bool = False
+    # False always runs the command (e.g. flaky or networked tests): no result cache, coalescing or tree fingerprint.
+    use_cache: bool = True
+    # Run inside virtualenvs / node_modules built once per lockfile hash (see runner.envcache).
+    cached_deps: bool = False
+    # Run in a private clone of the project (see runner.workspace), so concurrent runs cannot clobber each other.
+    isolated: bool = False
+    # Queue class: interactive runs (someone waiting on the result) start before agent runs.
+    priority: Literal["interactive", "agent"] = INTERACTIVE
+
+
+class TestSelection(BaseModel):
+    """Which tests an affected run executed: mode affected, full (fallback) or none; see runner.affected."""
+
+    __test__ = False  # not a pytest test class
+
+    mode: str
+    reason: str
+    changed_files: list[str] = []
+    test_files: list[str] = []
+
+
+class DependencyEnvironment(BaseModel):
+    """A cached dependency environment a run used (cached_deps): reused, or built for it in build_seconds."""
+
+    kind: str  # venv, uv or npm
+    lockfiles: list[str]
+    reused: bool
+    build_seconds: float = 0.0
+
+
+class TestFailureInfo(BaseModel):
+    __test__ = False
+
+    test_id: str
+    outcome: str  # failed or error
+    message: str
+    traceback: str
+
+
+class TestResults(BaseModel):
+    """Parsed JUnit report of a pytest run: counts and the first failures with trimmed tracebacks."""
+
+    __test__ = False
+
+    total: int
+    passed: int
+    failed: int
+    errors: int
+    skipped: int
+    duration_seconds: float
+    failures: list[TestFailureInfo] = []
 
 
 class ExecuteResponse(BaseModel):
@@ -47,6 +150,29 @@ class ExecuteResponse(BaseModel):
     stdout: str
     stderr: str
     duration_seconds: float
+    stdout_bytes: int = 0
+    stderr_bytes: int = 0
+    stdout_truncated: bool = False
+    stderr_truncated: bool = False
+    # Set when truncated output was kept in full (RUNNER_OUTPUT_DIR): GET /outputs/{output_id}/stdout|stderr
+    output_id: str | None = None
+    # True when served from the result cache (same tree, command and env) without running.
+    cached: bool = False
+    # True when an identical run was already in progress and this request shared its result.
+    coalesced: bool = False
+    # Set for affected runs (ExecuteRequest.affected).
+    selection: TestSelection | None = None
+    # Set for pytest runs that produced a JUnit report.
+    tests: TestResults | None = None
+    # Resource usage of the command and the children it waited for (summed over shards; peak of the largest process).
+    cpu_user_seconds: float = 0.0
+    cpu_system_seconds: float = 0.0
+    max_rss_bytes: int = 0
+    # Set for cached_deps runs.
+    environments: list[DependencyEnvironment] = []
+    # Set for isolated runs: files placed in the clone by method (reflink, hardlink, copy, symlink).
+    # Hardlinked files are shared with the project, so modifying one in place changes the original too.
+    workspace: dict[str, int] | None = None
 
 
 configure_logging()
@@ -87,6 +213,7 @@ def http_exception_handler(request: Request, exc: HTTPException) -> JSONResponse
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail},
+        headers=exc.headers,
     )
 
 
@@ -151,46 +278,670 @@ def _validate_command(command: list[str]) -> None:
         )
 
 
-@app.post("/execute", response_model=ExecuteResponse)
-def execute(body: ExecuteRequest) -> ExecuteResponse:
-    """Run a command in the given project path. Returns exit_code, stdout, stderr, duration_seconds."""
+def _get_jobs() -> JobTable:
+    """Process-wide job table (RUNNER_JOB_TTL_SECONDS)."""
+    global _jobs
+    if _jobs is None:
+        _jobs = JobTable(_get_runner_settings().job_ttl_seconds)
+    return _jobs
+
+
+def _get_result_cache() -> ResultCache:
+    """Process-wide result cache (RUNNER_RESULT_CACHE_SIZE / RUNNER_RESULT_CACHE_TTL_SECONDS)."""
+    global _result_cache
+    if _result_cache is None:
+        s = _get_runner_settings()
+        _result_cache = ResultCache(s.result_cache_size, s.result_cache_ttl_seconds)
+    return _result_cache
+
+
+def _get_flights() -> SingleFlight:
+    global _flights
+    if _flights is None:
+        _flights = SingleFlight()
+    return _flights
+
+
+def _get_durations() -> DurationStore:
+    """Historical per-test durations for balancing shards, kept in RUNNER_STATE_DIR."""
+    global _durations
+    if _durations is None:
+        _durations = DurationStore(_get_runner_settings().state_dir or DEFAULT_STATE_DIR)
+    return _durations
+
+
+def _get_affected() -> AffectedTests:
+    """Import graphs and last passing baselines for affected runs (baselines in RUNNER_STATE_DIR)."""
+    global _affected
+    if _affected is None:
+        _affected = AffectedTests(_get_runner_settings().state_dir or DEFAULT_STATE_DIR, _fingerprinter)
+    return _affected
+
+
+def _get_env_cache() -> EnvCache:
+    """Cached dependency environments (RUNNER_ENV_CACHE_DIR, default RUNNER_STATE_DIR/envs)."""
+    global _env_cache
+    if _env_cache is None:
+        s = _get_runner_settings()
+        _env_cache = EnvCache(
+            s.env_cache_dir or os.path.join(s.state_dir or DEFAULT_STATE_DIR, "envs"),
+            s.env_cache_max_bytes,
+            s.env_build_timeout_seconds,
+        )
+    return _env_cache
+
+
+def _get_workspaces() -> Workspaces:
+    """Isolated run workspaces (RUNNER_WORKSPACE_DIR, default ALLOWED_ROOT/.runner-workspaces)."""
+    global _workspaces
+    if _workspaces is None:
+        s = _get_runner_settings()
+        _workspaces = Workspaces(
+            s.workspace_dir or os.path.join(s.allowed_root, ".runner-workspaces"), s.workspace_fallback
+        )
+    return _workspaces
+
+
+def _get_warm_pool() -> WarmPool | None:
+    """Warm Python workers (RUNNER_WARM_POOL), or None when disabled."""
+    global _warm_pool
+    s = _get_runner_settings()
+    if _warm_pool is None and s.warm_pool:
+        preload = DEFAULT_PRELOAD + tuple(m.strip() for m in s.warm_preload.split(",") if m.strip())
+        _warm_pool = WarmPool(
+            os.path.join(s.state_dir or DEFAULT_STATE_DIR, "warm"),
+            _fingerprinter,
+            preload=preload,
+            max_workers=s.warm_max_workers,
+        )
+    return _warm_pool
+
+
+def _spawner(project_path: str) -> Spawner | None:
+    pool = _get_warm_pool()
+    return pool.spawner(project_path) if pool is not None else None
+
+
+def _get_spill_store() -> SpillStore | None:
+    """Store for full outputs of truncated runs; None unless RUNNER_OUTPUT_DIR is set."""
+    global _spill_store
+    s = _get_runner_settings()
+    if _spill_store is None and s.output_dir:
+        _spill_store = SpillStore(s.output_dir, s.output_ttl_seconds)
+    return _spill_store
+
+
+def _prepare(body: ExecuteRequest) -> tuple[str, dict[str, str] | None, int]:
+    """Validate the request; returns (workdir, env, timeout)."""
     _validate_project_path(body.project_path)
     _validate_command(body.command)
-
     workdir = body.cwd if body.cwd is not None else body.project_path
     timeout = body.timeout_seconds if body.timeout_seconds is not None else 300
     env: dict[str, str] | None = None
     if body.env is not None:
         env = {**os.environ, **body.env}
+    return workdir, env, timeout
+
+
+def _project_key(body: ExecuteRequest) -> str:
+    """Scheduler queue of a run: its real project path."""
+    return os.path.realpath(body.project_path)
+
+
+def _queue_full(e: QueueFull) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail={"error": str(e), "code": "queue_full"},
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+def _junit_arg_paths(command: list[str], workdir: str) -> list[str]:
+    """JUnit report paths the command already asks pytest for (--junitxml=PATH / --junit-xml PATH)."""
+    paths = []
+    for i, arg in enumerate(command):
+        for flag in ("--junitxml", "--junit-xml"):
+            if arg.startswith(flag + "="):
+                paths.append(arg.split("=", 1)[1])
+            elif arg == flag and i + 1 < len(command):
+                paths.append(command[i + 1])
+    return [os.path.join(workdir, p) for p in paths]
+
+
+async def _select_tests(body: ExecuteRequest) -> Selection | None:
+    """The test selection of an affected pytest run (see runner.affected); None for other runs."""
+    if body.affected and is_pytest(body.command):
+        return await asyncio.to_thread(_get_affected().select, body.project_path)
+    return None
+
+
+def _selected_command(body: ExecuteRequest, selection: Selection | None, root: str | None) -> list[str]:
+    """body.command, limited to the selected test modules (under root, default the project) for an affected run."""
+    if selection is None or selection.mode != MODE_AFFECTED:
+        return body.command
+    root = root or os.path.realpath(body.project_path)
+    return [*body.command, *(os.path.join(root, rel) for rel in selection.test_files)]
+
+
+def _no_affected_tests(selection: Selection) -> str:
+    return f"No affected tests: {selection.reason}.\n"
+
+
+def _test_selection(selection: Selection) -> TestSelection:
+    return TestSelection(
+        mode=selection.mode,
+        reason=selection.reason,
+        changed_files=selection.changed_files,
+        test_files=selection.test_files,
+    )
+
+
+@asynccontextmanager
+async def _dependencies(body: ExecuteRequest, env: dict[str, str] | None):
+    """(env, used) to run with: as given, or for cached_deps inside the project's cached dependency environments.
+
+    used lists the environments held for the block (see DependencyEnvironment).
+    Raises EnvBuildError when one cannot be built.
+    """
+    if not body.cached_deps:
+        yield env, []
+        return
+    async with _get_env_cache().prepare(body.project_path, env) as prepared:
+        yield {**(env if env is not None else os.environ), **prepared.env}, prepared.used
 
-    start = time.perf_counter()
+
+async def _run_captured(
+    body: ExecuteRequest, workdir: str, env: dict[str, str] | None, timeout: int
+) -> ExecuteResponse:
+    """Run body.command (see _run_in_workspace), with cached_deps inside the project's cached dependency environments.
+
+    A failed environment build is reported as the run's result: its exit
+    code and output, with no command run.
+    """
     try:
-        result = subprocess.run(
-            body.command,
-            cwd=workdir,
-            env=env,
-            capture_output=True,
-            timeout=timeout,
-            text=False,
-        )
-    except subprocess.TimeoutExpired as e:
-        elapsed = time.perf_counter() - start
+        async with _dependencies(body, env) as (env, used):
+            response = await _run_in_workspace(body, workdir, env, timeout)
+    except EnvBuildError as e:
         return ExecuteResponse(
-            exit_code=-1,
-            stdout=e.stdout.decode() if e.stdout else "",
-            stderr=(e.stderr.decode() if e.stderr else "") + " (timeout)",
-            duration_seconds=round(elapsed, 3),
+            exit_code=e.result.exit_code,
+            stdout=e.result.stdout.decode(errors="replace"),
+            stderr=_env_build_stderr(e),
+            duration_seconds=e.result.duration_seconds,
         )
-    elapsed = time.perf_counter() - start
+    response.environments = [DependencyEnvironment(**environment) for environment in used]
+    return response
+
+
+def _env_build_stderr(e: EnvBuildError) -> str:
+    return f"{e}\n" + e.result.stderr.decode(errors="replace")
+
+
+@asynccontextmanager
+async def _workspace(body: ExecuteRequest, workdir: str):
+    """(body, workdir, root, files) to run with: as given, or for isolated runs mapped into a clone removed on exit.
+
+    The working directory and command arguments inside the project are
+    mapped into the clone; the project path itself still keys durations
+    and affected-test baselines. root (the clone) and files (its file
+    counts by clone method) are None when not isolated.
+    """
+    if not body.isolated:
+        yield body, workdir, None, None
+        return
+    workspaces = _get_workspaces()
+    root = os.path.realpath(body.project_path)
+    clone, files = await asyncio.to_thread(workspaces.create, root)
+
+    def in_clone(path: str) -> str:
+        return os.path.join(clone, os.path.relpath(path, root)) if _is_within(path, root) else path
+
+    try:
+        command = [in_clone(arg) if os.path.isabs(arg) else arg for arg in body.command]
+        yield body.model_copy(update={"command": command}), in_clone(os.path.realpath(workdir)), str(clone), files
+    finally:
+        await asyncio.to_thread(workspaces.remove, clone)
 
+
+async def _run_in_workspace(
+    body: ExecuteRequest, workdir: str, env: dict[str, str] | None, timeout: int
+) -> ExecuteResponse:
+    """Run body.command (see _capture_run), for isolated runs in a clone of the project (see _workspace)."""
+    async with _workspace(body, workdir) as (body, workdir, root, files):
+        response = await _capture_run(body, workdir, env, timeout, root=root)
+    response.workspace = files
+    return response
+
+
+def _is_within(path: str, root: str) -> bool:
+    try:
+        return os.path.commonpath([os.path.realpath(path), root]) == root
+    except ValueError:
+        return False
+
+
+async def _capture_run(
+    body: ExecuteRequest, workdir: str, env: dict[str, str] | None, timeout: int, root: str | None = None
+) -> ExecuteResponse:
+    """Run body.command with bounded output capture (spilling full output if configured); call while holding a slot.
+
+    pytest commands with shards > 1 run as parallel shards (see runner.parallel);
+    with affected, only the selected test modules run (see runner.affected) and
+    a passing run becomes the baseline for the next selection.
+    """
+    s = _get_runner_settings()
+    shards = min(body.shards or 1, s.max_shards)
+    selection = await _select_tests(body)
+    if selection is not None and selection.mode == MODE_NONE:
+        return ExecuteResponse(
+            exit_code=0,
+            stdout=_no_affected_tests(selection),
+            stderr="",
+            duration_seconds=0.0,
+            selection=_test_selection(selection),
+        )
+    command = _selected_command(body, selection, root)
+    report = None
+    store = _get_spill_store()
+    output_id, spill = store.open() if store is not None else (None, {})
+    captures = {
+        name: OutputCapture(s.output_head_bytes, s.output_tail_bytes, spill=spill.get(name))
+        for name in ("stdout", "stderr")
+    }
+    # pytest runs report structured results through a JUnit XML file (see runner.junit).
+    junit_dir = tempfile.mkdtemp(prefix="runner-junit-") if is_pytest(command) else None
+    reports: list[str] = []
+    try:
+        if junit_dir is not None and shards > 1:
+            result = await run_sharded(
+                command,
+                cwd=workdir,
+                env=env,
+                timeout=timeout,
+                shards=shards,
+                durations=_get_durations(),
+                project_path=body.project_path,
+                stdout=captures["stdout"],
+                stderr=captures["stderr"],
+                junit_dir=junit_dir,
+                limits=_resource_limits(),
+                spawn=_spawner(body.project_path),
+            )
+        else:
+            if junit_dir is not None:
+                reports = _junit_arg_paths(command, workdir)
+                if not reports:
+                    reports = [os.path.join(junit_dir, "report.xml")]
+                    command = [*command, f"--junitxml={reports[0]}"]
+            result = await run_process(
+                command,
+                cwd=workdir,
+                env=env,
+                timeout=timeout,
+                stdout=captures["stdout"],
+                stderr=captures["stderr"],
+                limits=_resource_limits(),
+                spawn=_spawner(body.project_path),
+            )
+        if junit_dir is not None:
+            reports += sorted(str(p) for p in Path(junit_dir).glob("*.xml") if str(p) not in reports)
+            reports = [r for r in reports if os.path.exists(r)]
+            report = await asyncio.to_thread(summarize, reports) if reports else None
+    finally:
+        for f in spill.values():
+            f.close()
+        if junit_dir is not None:
+            shutil.rmtree(junit_dir, ignore_errors=True)
+    observe_usage(result, captures["stdout"].total_bytes + captures["stderr"].total_bytes)
+    truncated = captures["stdout"].truncated or captures["stderr"].truncated
+    if output_id is not None and not truncated:
+        store.discard(output_id)
+        output_id = None
+
+    if selection is not None and result.exit_code == 0:
+        await asyncio.to_thread(_get_affected().record, body.project_path, selection.snapshot)
+
+    stderr = result.stderr.decode(errors="replace")
+    if result.timed_out:
+        stderr += " (timeout)"
     return ExecuteResponse(
-        exit_code=result.returncode,
-        stdout=result.stdout.decode() if result.stdout else "",
-        stderr=result.stderr.decode() if result.stderr else "",
-        duration_seconds=round(elapsed, 3),
+        exit_code=result.exit_code,
+        stdout=result.stdout.decode(errors="replace"),
+        stderr=stderr,
+        duration_seconds=result.duration_seconds,
+        stdout_bytes=captures["stdout"].total_bytes,
+        stderr_bytes=captures["stderr"].total_bytes,
+        stdout_truncated=captures["stdout"].truncated,
+        stderr_truncated=captures["stderr"].truncated,
+        output_id=output_id,
+        selection=_test_selection(selection) if selection is not None else None,
+        tests=TestResults(**asdict(report)) if report is not None else None,
+        cpu_user_seconds=result.cpu_user_seconds,
+        cpu_system_seconds=result.cpu_system_seconds,
+        max_rss_bytes=result.max_rss_bytes,
     )
 
 
+async def _run_key(body: ExecuteRequest, workdir: str, timeout: int) -> str:
+    """Key identifying a run: project tree fingerprint (computed off the event loop), command, cwd, env, timeout.
+
+    use_cache=false runs are never looked up, stored or coalesced, so they
+    get a unique key instead of fingerprinting the tree.
+    """
+    if not body.use_cache:
+        return f"uncached-{uuid.uuid4().hex}"
+    tree = await asyncio.to_thread(_fingerprinter.fingerprint, body.project_path)
+    return result_key(
+        tree,
+        body.command,
+        workdir,
+        body.env,
+        timeout,
+        affected=body.affected,
+        cached_deps=body.cached_deps,
+        isolated=body.isolated,
+    )
+
+
+async def _cached_result(body: ExecuteRequest, key: str) -> ExecuteResponse | None:
+    if not _get_result_cache().enabled:
+        return None
+    if not body.use_cache:
+        RESULT_CACHE_REQUESTS.labels(outcome="bypass").inc()
+        return None
+    hit = _get_result_cache().get(key)
+    return hit.model_copy(update={"cached": True}) if hit is not None else None
+
+
+async def _store_result(key: str, body: ExecuteRequest, workdir: str, timeout: int, response: ExecuteResponse) -> None:
+    """Cache a finished run, unless it timed out or was killed (negative exit code) or changed the tree itself."""
+    if not _get_result_cache().enabled or not body.use_cache or response.exit_code < 0:
+        return
+    if await _run_key(body, workdir, timeout) == key:
+        _get_result_cache().set(key, response)
+
+
+def _flight_for(
+    key: str, body: ExecuteRequest, workdir: str, env: dict[str, str] | None, timeout: int
+) -> tuple[Flight, bool]:
+    """(flight, joined): the identical run already in flight, or a new one holding a slot or queue place.
+
+    Raises 429 when a new run finds the queue full.
+    """
+    flights = _get_flights()
+    if (flight := flights.get(key)) is not None:
+        return flight, True
+    scheduler = _get_scheduler()
+    try:
+        ticket = scheduler.enqueue(_project_key(body), body.priority)
+    except QueueFull as e:
+        raise _queue_full(e)
+    entered = False
+
+    async def run(flight: Flight) -> ExecuteResponse:
+        nonlocal entered
+        entered = True
+        await scheduler.wait(ticket)
+        flight.mark_running()
+        start = time.perf_counter()
+        try:
+            response = await _run_captured(body, workdir, env, timeout)
+        finally:
+            scheduler.release(time.perf_counter() - start, ticket.project)
+        await _store_result(key, body, workdir, timeout, response)
+        return response
+
+    flight = flights.start(key, run)
+    # Cancelled before run() started: scheduler.wait() never saw the ticket.
+    flight.task.add_done_callback(lambda task: scheduler.abandon(ticket) if task.cancelled() and not entered else None)
+    return flight, False
+
+
+def _coalesced(response: ExecuteResponse, joined: bool) -> ExecuteResponse:
+    return response.model_copy(update={"coalesced": True}) if joined else response
+
+
+@app.post("/execute", response_model=ExecuteResponse)
+async def execute(body: ExecuteRequest) -> ExecuteResponse:
+    """Run a command in the given project path. Returns exit_code, stdout, stderr, duration_seconds.
+
+    stdout/stderr keep the first RUNNER_OUTPUT_HEAD_BYTES and last
+    RUNNER_OUTPUT_TAIL_BYTES; *_bytes and *_truncated report what was
+    dropped. Runs wait for a free slot (RUNNER_MAX_CONCURRENT); when RUNNER_MAX_QUEUE
+    runs are already waiting the request is rejected with 429 and Retry-After.
+    For long runs prefer POST /jobs, which does not hold the connection open.
+    Unless use_cache is false, a run whose project tree, command, cwd, env
+    and timeout match an earlier one returns that result with cached=true;
+    one matching a run still in progress waits for it (coalesced=true).
+    """
+    workdir, env, timeout = _prepare(body)
+    key = await _run_key(body, workdir, timeout)
+    if (cached := await _cached_result(body, key)) is not None:
+        return cached
+    flight, joined = _flight_for(key, body, workdir, env, timeout)
+    return _coalesced(await flight.wait(), joined)
+
+
+class JobResponse(BaseModel):
+    """Response body for /jobs: status is queued, running, completed, failed or cancelled."""
+
+    job_id: str
+    status: str
+    created_at: float
+    finished_at: float | None = None
+    result: ExecuteResponse | None = None
+    error: str | None = None
+
+
+def _job_response(job: Job) -> JobResponse:
+    return JobResponse(
+        job_id=job.id,
+        status=job.status,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        result=job.result,
+        error=job.error,
+    )
+
+
+def _get_job(job_id: str) -> Job:
+    job = _get_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def create_job(body: ExecuteRequest) -> JobResponse:
+    """Start a command as a background job; poll GET /jobs/{job_id} for its result.
+
+    Validation (400) and a full queue (429 with Retry-After) are reported
+    here, as for POST /execute; the job then waits for a slot like any run.
+    A result cache hit (see POST /execute) comes back already completed; a
+    job matching a run in progress shares it, and is cancelled without
+    stopping the run while other requests still wait on it.
+    """
+    workdir, env, timeout = _prepare(body)
+    key = await _run_key(body, workdir, timeout)
+    if (cached := await _cached_result(body, key)) is not None:
+
+        async def hit(job: Job) -> ExecuteResponse:
+            return cached
+
+        return _job_response(await _get_jobs().wait(_get_jobs().start(hit), MAX_JOB_WAIT_SECONDS))
+
+    flight, joined = _flight_for(key, body, workdir, env, timeout)
+
+    async def run(job: Job) -> ExecuteResponse:
+        return _coalesced(await flight.wait(on_running=lambda: setattr(job, "status", RUNNING)), joined)
+
+    job = _get_jobs().start(run)
+    # Let run() join the flight so a cancel from now on reaches the command.
+    await asyncio.sleep(0)
+    return _job_response(job)
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=MAX_JOB_WAIT_SECONDS)) -> JobResponse:
+    """Status and, once completed, the result of a job; wait > 0 long-polls until it finishes."""
+    job = _get_job(job_id)
+    await _get_jobs().wait(job, wait)
+    return _job_response(job)
+
+
+@app.delete("/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str) -> JobResponse:
+    """Cancel a queued or running job, killing its process group; returns the final status."""
+    _get_job(job_id)
+    return _job_response(await _get_jobs().cancel(job_id))
+
+
+@app.get("/outputs/{output_id}/{stream}")
+def get_output(output_id: str, stream: str) -> FileResponse:
+    """Full stdout or stderr of a truncated run, while it is kept (RUNNER_OUTPUT_TTL_SECONDS)."""
+    store = _get_spill_store()
+    path = store.path(output_id, stream) if store is not None else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="output not found")
+    return FileResponse(path, media_type="text/plain; charset=utf-8")
+
+
+def _exit_record(result: ProcessResult) -> dict:
+    return {
+        "type": "exit",
+        "exit_code": result.exit_code,
+        "duration_seconds": result.duration_seconds,
+        "timed_out": result.timed_out,
+        "cpu_user_seconds": result.cpu_user_seconds,
+        "cpu_system_seconds": result.cpu_system_seconds,
+        "max_rss_bytes": result.max_rss_bytes,
+    }
+
+
+async def _replay(response: ExecuteResponse):
+    """NDJSON events of /execute/stream for a result that is not run again (a cache hit)."""
+    yield json.dumps({"type": "start", "queued_seconds": 0.0}) + "\n"
+    for stream in ("stdout", "stderr"):
+        for line in getattr(response, stream).splitlines(keepends=True):
+            yield json.dumps({"type": stream, "data": line}) + "\n"
+    record = {
+        "type": "exit",
+        "exit_code": response.exit_code,
+        "duration_seconds": response.duration_seconds,
+        "timed_out": False,  # timed-out runs are never cached
+        "cpu_user_seconds": response.cpu_user_seconds,
+        "cpu_system_seconds": response.cpu_system_seconds,
+        "max_rss_bytes": response.max_rss_bytes,
+        "cached": True,
+    }
+    if response.selection is not None:
+        record["selection"] = response.selection.model_dump()
+    if response.environments:
+        record["environments"] = [environment.model_dump() for environment in response.environments]
+    if response.workspace is not None:
+        record["workspace"] = response.workspace
+    yield json.dumps(record) + "\n"
+
+
+@app.post("/execute/stream")
+async def execute_stream(body: ExecuteRequest) -> StreamingResponse:
+    """Run a command like POST /execute, streaming NDJSON events while it runs.
+
+    {"type": "start", "queued_seconds"} once a slot is acquired, one
+    {"type": "stdout"|"stderr", "data": "<line>"} per output line, then
+    {"type": "exit", "exit_code", "duration_seconds", "timed_out",
+    "cpu_user_seconds", "cpu_system_seconds", "max_rss_bytes"}. Validation
+    errors (400) and a full queue (429) are reported before streaming starts;
+    shards > 1 is rejected with 400 (use POST /execute or /jobs). Unless
+    use_cache is false, a result cache hit is replayed as the same events
+    with "cached": true in the exit event; streamed runs are not themselves
+    cached, and are never coalesced with other runs.
+    isolated runs stream from a clone of the project ("workspace" file counts
+    in the exit event) and cached_deps runs
+    inside the cached dependency environments (listed as "environments" in
+    the exit event), as for POST /execute; a failed environment build
+    streams its stderr and exit code instead. affected runs stream only the
+    selected tests ("selection" in the exit event; none selected streams a
+    note and exit code 0), and a passing one becomes the next baseline.
+    """
+    workdir, env, timeout = _prepare(body)
+    if body.shards is not None and body.shards > 1:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "shards > 1 cannot be streamed; use POST /execute or /jobs", "code": "invalid_input"},
+        )
+    if _get_result_cache().enabled and body.use_cache:
+        if (cached := await _cached_result(body, await _run_key(body, workdir, timeout))) is not None:
+            return StreamingResponse(_replay(cached), media_type="application/x-ndjson")
+    scheduler = _get_scheduler()
+    try:
+        waited = await scheduler.acquire(_project_key(body), body.priority)
+    except QueueFull as e:
+        raise _queue_full(e)
+
+    async def events():
+        start = time.perf_counter()
+        output_bytes = 0
+        try:
+            yield json.dumps({"type": "start", "queued_seconds": round(waited, 3)}) + "\n"
+            try:
+                async with (
+                    _dependencies(body, env) as (run_env, used),
+                    _workspace(body, workdir) as (run_body, run_workdir, root, files),
+                ):
+                    selection = await _select_tests(run_body)
+                    if selection is not None and selection.mode == MODE_NONE:
+                        yield json.dumps({"type": "stdout", "data": _no_affected_tests(selection)}) + "\n"
+                        result = ProcessResult(exit_code=0, stdout=b"", stderr=b"", duration_seconds=0.0)
+                        record = {**_exit_record(result), "selection": _test_selection(selection).model_dump()}
+                        if files is not None:
+                            record["workspace"] = files
+                        yield json.dumps(record) + "\n"
+                        return
+                    async for event in stream_process(
+                        _selected_command(run_body, selection, root),
+                        cwd=run_workdir,
+                        env=run_env,
+                        timeout=timeout,
+                        limits=_resource_limits(),
+                        spawn=_spawner(body.project_path),
+                    ):
+                        if isinstance(event, ProcessResult):
+                            observe_usage(event, output_bytes)
+                            if selection is not None and event.exit_code == 0:
+                                await asyncio.to_thread(_get_affected().record, body.project_path, selection.snapshot)
+                            record = _exit_record(event)
+                            if selection is not None:
+                                record["selection"] = _test_selection(selection).model_dump()
+                            if body.cached_deps:
+                                record["environments"] = used
+                            if files is not None:
+                                record["workspace"] = files
+                        else:
+                            output_bytes += len(event[1])
+                            record = {"type": event[0], "data": event[1].decode(errors="replace")}
+                        yield json.dumps(record) + "\n"
+            except EnvBuildError as e:
+                # As for POST /execute: the failed build is the run's result.
+                if e.result.stdout:
+                    yield json.dumps({"type": "stdout", "data": e.result.stdout.decode(errors="replace")}) + "\n"
+                yield json.dumps({"type": "stderr", "data": _env_build_stderr(e)}) + "\n"
+                yield json.dumps(_exit_record(e.result)) + "\n"
+        finally:
+            scheduler.release(time.perf_counter() - start, _project_key(body))
+
+    # Start the generator here so its finally (which frees the slot) runs even
+    # if the client disconnects before the response body is iterated.
+    stream = events()
+    first = await anext(stream)
+
+    async def body_iterator():
+        yield first
+        async for line in stream:
+            yield line
+
+    return StreamingResponse(body_iterator(), media_type="application/x-ndjson")
+
+
 Instrumentator(
     excluded_handlers=["/metrics"],
     should_ignore_untemplated=True,
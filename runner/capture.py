@@ -0,0 +1,105 @@
+"""Bounded capture of command output: the first head_bytes and a ring buffer of the last tail_bytes.
+
+Memory per stream is at most head_bytes + tail_bytes (plus one chunk)
+however much a command prints. With a spill directory, the full output is
+also written to a file that can be fetched by output ID while it is kept.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import BinaryIO
+
+STREAMS = ("stdout", "stderr")
+_OUTPUT_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class OutputCapture:
+    """Keeps the head and tail of a byte stream; head_bytes=None keeps everything."""
+
+    def __init__(self, head_bytes: int | None = None, tail_bytes: int = 0, spill: BinaryIO | None = None) -> None:
+        self.head_bytes = head_bytes
+        self.tail_bytes = max(0, tail_bytes)
+        self.total_bytes = 0
+        self._head = bytearray()
+        self._tail: deque[bytes] = deque()
+        self._tail_size = 0
+        self._spill = spill
+
+    @property
+    def truncated(self) -> bool:
+        return self.head_bytes is not None and self.total_bytes > self.head_bytes + self.tail_bytes
+
+    def write(self, data: bytes) -> None:
+        self.total_bytes += len(data)
+        if self._spill is not None:
+            self._spill.write(data)
+        if self.head_bytes is None:
+            self._head.extend(data)
+            return
+        room = self.head_bytes - len(self._head)
+        if room > 0:
+            self._head.extend(data[:room])
+            data = data[room:]
+        if not data or not self.tail_bytes:
+            return
+        self._tail.append(data)
+        self._tail_size += len(data)
+        while self._tail_size - len(self._tail[0]) >= self.tail_bytes:
+            self._tail_size -= len(self._tail.popleft())
+
+    def getvalue(self) -> bytes:
+        """Head, then (if anything was dropped) an omission marker, then the tail."""
+        tail = b"".join(self._tail)[-self.tail_bytes :] if self.tail_bytes else b""
+        if not self.truncated:
+            return bytes(self._head) + tail
+        omitted = self.total_bytes - len(self._head) - len(tail)
+        return bytes(self._head) + f"\n... [{omitted} bytes omitted] ...\n".encode() + tail
+
+
+class SpillStore:
+    """Directory of full command outputs named <output_id>.<stream>, removed after ttl_seconds."""
+
+    def __init__(self, directory: str | Path, ttl_seconds: float = 3600) -> None:
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+
+    def open(self) -> tuple[str, dict[str, BinaryIO]]:
+        """New output ID and one writable file per stream."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.cleanup()
+        output_id = uuid.uuid4().hex
+        return output_id, {s: open(self.directory / f"{output_id}.{s}", "wb") for s in STREAMS}
+
+    def discard(self, output_id: str) -> None:
+        for s in STREAMS:
+            (self.directory / f"{output_id}.{s}").unlink(missing_ok=True)
+
+    def path(self, output_id: str, stream: str) -> Path | None:
+        """Path of a kept output, or None if the ID or stream is invalid or expired."""
+        if stream not in STREAMS or not _OUTPUT_ID_RE.match(output_id):
+            return None
+        path = self.directory / f"{output_id}.{stream}"
+        return path if path.is_file() else None
+
+    def cleanup(self) -> int:
+        """Delete outputs older than ttl_seconds; returns the number of files removed."""
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
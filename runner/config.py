@@ -1,5 +1,8 @@
 """Centralized configuration for the Runner service (pydantic-settings)."""
 
+import os
+from typing import Literal
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -10,3 +13,29 @@ class RunnerSettings(BaseSettings):
     model_config = SettingsConfigDict(env_ignore_empty=True)
 
     allowed_root: str = Field("/tmp", validation_alias="ALLOWED_ROOT")
+    max_concurrent: int = Field(8, ge=1, validation_alias="RUNNER_MAX_CONCURRENT")
+    max_queue: int = Field(32, ge=0, validation_alias="RUNNER_MAX_QUEUE")
+    # 0 lets one project use every slot; fair-share weights by project path (JSON object, default weight 1).
+    max_per_project: int = Field(0, ge=0, validation_alias="RUNNER_MAX_PER_PROJECT")
+    project_weights: dict[str, float] = Field(default_factory=dict, validation_alias="RUNNER_PROJECT_WEIGHTS")
+    output_head_bytes: int = Field(64 * 1024, ge=0, validation_alias="RUNNER_OUTPUT_HEAD_BYTES")
+    output_tail_bytes: int = Field(64 * 1024, ge=0, validation_alias="RUNNER_OUTPUT_TAIL_BYTES")
+    output_dir: str = Field("", validation_alias="RUNNER_OUTPUT_DIR")
+    output_ttl_seconds: float = Field(3600.0, gt=0, validation_alias="RUNNER_OUTPUT_TTL_SECONDS")
+    job_ttl_seconds: float = Field(3600.0, gt=0, validation_alias="RUNNER_JOB_TTL_SECONDS")
+    result_cache_size: int = Field(256, ge=0, validation_alias="RUNNER_RESULT_CACHE_SIZE")
+    result_cache_ttl_seconds: float = Field(600.0, gt=0, validation_alias="RUNNER_RESULT_CACHE_TTL_SECONDS")
+    max_shards: int = Field(os.cpu_count() or 1, ge=1, validation_alias="RUNNER_MAX_SHARDS")
+    state_dir: str = Field("", validation_alias="RUNNER_STATE_DIR")
+    warm_pool: bool = Field(False, validation_alias="RUNNER_WARM_POOL")
+    warm_preload: str = Field("", validation_alias="RUNNER_WARM_PRELOAD")
+    warm_max_workers: int = Field(4, ge=1, validation_alias="RUNNER_WARM_MAX_WORKERS")
+    env_cache_dir: str = Field("", validation_alias="RUNNER_ENV_CACHE_DIR")
+    env_cache_max_bytes: int = Field(10 * 1024**3, ge=0, validation_alias="RUNNER_ENV_CACHE_MAX_BYTES")
+    env_build_timeout_seconds: float = Field(900.0, gt=0, validation_alias="RUNNER_ENV_BUILD_TIMEOUT_SECONDS")
+    workspace_dir: str = Field("", validation_alias="RUNNER_WORKSPACE_DIR")
+    workspace_fallback: Literal["hardlink", "copy"] = Field("hardlink", validation_alias="RUNNER_WORKSPACE_FALLBACK")
+    # setrlimit caps for each command and its children; 0 leaves the limit unset.
+    limit_memory_bytes: int = Field(0, ge=0, validation_alias="RUNNER_LIMIT_MEMORY_BYTES")
+    limit_cpu_seconds: int = Field(0, ge=0, validation_alias="RUNNER_LIMIT_CPU_SECONDS")
+    limit_open_files: int = Field(0, ge=0, validation_alias="RUNNER_LIMIT_OPEN_FILES")
@@ -0,0 +1,269 @@
+"""Cached dependency environments: virtualenvs and node_modules built once per lockfile.
+
+Runs that start by installing dependencies (pip install -r, npm ci) pay for
+it every time. With cached_deps, the Runner looks for lockfiles in the
+project root and prepares one environment per project and lockfile hash:
+
+- uv.lock: a virtualenv built with `uv sync --frozen --no-install-project`
+- requirements*.txt: a virtualenv built with `pip install -r ...`
+- package-lock.json: node_modules built with `npm ci`
+
+A run uses them through its environment (VIRTUAL_ENV, PATH, NODE_PATH) and
+a node_modules symlink in the project. Each entry is built at most once:
+an asyncio lock per entry serializes the Runner's own requests and an
+flock on the entry's lock file covers other Runner processes, which also
+hold it shared while they run so eviction never removes an environment
+in use. The least recently used entries are evicted once the cache grows
+beyond its quota.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator
+
+from prometheus_client import Counter, Gauge
+
+from runner.capture import OutputCapture
+from runner.executor import ProcessResult, run_process
+
+ENV_CACHE_REQUESTS = Counter(
+    "runner_env_cache_requests_total",
+    "Dependency environments prepared for runs, by kind (venv/uv/npm) and outcome (hit/built/failed).",
+    ["kind", "outcome"],
+)
+ENV_CACHE_BYTES = Gauge("runner_env_cache_bytes", "Disk used by cached dependency environments.")
+ENV_CACHE_EVICTIONS = Counter("runner_env_cache_evictions_total", "Cached dependency environments evicted.")
+
+READY = ".runner-env.json"
+KIND_UV = "uv"
+KIND_VENV = "venv"
+KIND_NPM = "npm"
+# Build output kept for the error report (head, tail).
+BUILD_OUTPUT_HEAD_BYTES = 16 * 1024
+BUILD_OUTPUT_TAIL_BYTES = 48 * 1024
+
+
+class EnvBuildError(Exception):
+    """Building an environment failed; result is the failed build command."""
+
+    def __init__(self, spec: EnvSpec, result: ProcessResult) -> None:
+        super().__init__(f"building the {spec.kind} environment from {', '.join(spec.lockfiles)} failed")
+        self.spec = spec
+        self.result = result
+
+
+@dataclass
+class EnvSpec:
+    """One environment a project needs: its kind, the lockfiles it is built from and their combined hash."""
+
+    kind: str
+    lockfiles: list[str]
+    key: str
+
+
+@dataclass
+class PreparedEnv:
+    """Environment overrides for a run and what was used (reused, or built in build_seconds)."""
+
+    env: dict[str, str] = field(default_factory=dict)
+    used: list[dict] = field(default_factory=list)
+
+
+def _hash_files(root: str, names: list[str], *extra: str) -> str:
+    h = hashlib.sha256()
+    for part in extra:
+        h.update(part.encode() + b"\0")
+    for name in names:
+        h.update(name.encode() + b"\0")
+        with open(os.path.join(root, name), "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def detect(project_path: str, env: dict[str, str] | None = None) -> list[EnvSpec]:
+    """Environments the project root's lockfiles call for, whose build tool is on PATH (at most one Python env)."""
+    root = os.path.realpath(project_path)
+    path = (env if env is not None else os.environ).get("PATH")
+    specs = []
+    requirements = sorted(os.path.basename(p) for p in glob.glob(os.path.join(glob.escape(root), "requirements*.txt")))
+    if os.path.isfile(os.path.join(root, "uv.lock")) and shutil.which("uv", path=path):
+        names = ["uv.lock"] + (["pyproject.toml"] if os.path.isfile(os.path.join(root, "pyproject.toml")) else [])
+        specs.append(EnvSpec(KIND_UV, names, _hash_files(root, names, KIND_UV, root)))
+    elif requirements:
+        python = shutil.which("python3", path=path) or "python3"
+        specs.append(EnvSpec(KIND_VENV, requirements, _hash_files(root, requirements, KIND_VENV, root, python)))
+    if os.path.isfile(os.path.join(root, "package-lock.json")) and shutil.which("npm", path=path):
+        names = ["package.json", "package-lock.json"]
+        if os.path.isfile(os.path.join(root, "package.json")):
+            specs.append(EnvSpec(KIND_NPM, names, _hash_files(root, names, KIND_NPM, root)))
+    return specs
+
+
+def _disk_usage(path: Path) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_blocks * 512
+            except OSError:
+                pass
+    return total
+
+
+class EnvCache:
+    """Dependency environments under directory, evicted least recently used first beyond max_bytes."""
+
+    def __init__(self, directory: str | Path, max_bytes: int, build_timeout: float) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.build_timeout = build_timeout
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def _entry(self, spec: EnvSpec) -> Path:
+        return self.directory / f"{spec.kind}-{spec.key[:32]}"
+
+    @asynccontextmanager
+    async def prepare(self, project_path: str, env: dict[str, str] | None) -> AsyncIterator[PreparedEnv]:
+        """Build (or reuse) the project's environments and hold them for the duration of the block.
+
+        Raises EnvBuildError when a build fails.
+        """
+        root = os.path.realpath(project_path)
+        specs = await asyncio.to_thread(detect, root, env)
+        prepared = PreparedEnv()
+        held: list[int] = []
+        try:
+            for spec in specs:
+                entry = self._entry(spec)
+                started = time.perf_counter()
+                built = await self._ensure(spec, entry, root, env, held)
+                prepared.used.append(
+                    {
+                        "kind": spec.kind,
+                        "lockfiles": spec.lockfiles,
+                        "reused": not built,
+                        "build_seconds": round(time.perf_counter() - started, 3) if built else 0.0,
+                    }
+                )
+                await asyncio.to_thread(self._inject, spec, entry, root, env, prepared.env)
+            yield prepared
+        finally:
+            for fd in held:
+                os.close(fd)  # releases the shared lock
+
+    async def _ensure(
+        self, spec: EnvSpec, entry: Path, root: str, env: dict[str, str] | None, held: list[int]
+    ) -> bool:
+        """Make entry ready and append a shared-locked fd for it to held; True if it was built now."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock = self._locks.setdefault(entry.name, asyncio.Lock())
+        fd = os.open(f"{entry}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        built = False
+        try:
+            async with lock:
+                # Shared before looking, so the entry cannot be evicted between the check and the run.
+                await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_SH)
+                if not (entry / READY).exists():
+                    await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+                    if not (entry / READY).exists():  # another Runner process may have built it meanwhile
+                        await self._build(spec, entry, root, env)
+                        built = True
+                    await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_SH)
+        except BaseException:
+            os.close(fd)
+            raise
+        held.append(fd)
+        os.utime(entry / READY)  # last use, for LRU eviction
+        ENV_CACHE_REQUESTS.labels(kind=spec.kind, outcome="built" if built else "hit").inc()
+        if built:
+            await asyncio.to_thread(self.evict)
+        return built
+
+    async def _build(self, spec: EnvSpec, entry: Path, root: str, env: dict[str, str] | None) -> None:
+        """Build entry from scratch (caller holds its exclusive lock) and mark it ready."""
+        await asyncio.to_thread(shutil.rmtree, entry, True)
+        entry.mkdir(parents=True)
+        base = dict(env if env is not None else os.environ)
+        if spec.kind == KIND_UV:
+            steps = [(["uv", "sync", "--frozen", "--no-install-project"], root, {**base, "UV_PROJECT_ENVIRONMENT": str(entry)})]
+        elif spec.kind == KIND_VENV:
+            python = shutil.which("python3", path=base.get("PATH")) or "python3"
+            install = [str(entry / "bin" / "python"), "-m", "pip", "install", "--disable-pip-version-check"]
+            for name in spec.lockfiles:
+                install += ["-r", name]
+            base.pop("VIRTUAL_ENV", None)
+            steps = [([python, "-m", "venv", str(entry)], root, base), (install, root, base)]
+        else:
+            for name in (*spec.lockfiles, ".npmrc"):
+                if os.path.isfile(os.path.join(root, name)):
+                    shutil.copy2(os.path.join(root, name), entry / name)
+            steps = [(["npm", "ci", "--no-audit", "--no-fund"], str(entry), base)]
+        for command, cwd, step_env in steps:
+            result = await run_process(
+                command,
+                cwd=cwd,
+                env=step_env,
+                timeout=self.build_timeout,
+                stdout=OutputCapture(BUILD_OUTPUT_HEAD_BYTES, BUILD_OUTPUT_TAIL_BYTES),
+                stderr=OutputCapture(BUILD_OUTPUT_HEAD_BYTES, BUILD_OUTPUT_TAIL_BYTES),
+            )
+            if result.exit_code != 0:
+                ENV_CACHE_REQUESTS.labels(kind=spec.kind, outcome="failed").inc()
+                await asyncio.to_thread(shutil.rmtree, entry, True)
+                raise EnvBuildError(spec, result)
+        size = await asyncio.to_thread(_disk_usage, entry)
+        (entry / READY).write_text(json.dumps({"kind": spec.kind, "lockfiles": spec.lockfiles, "bytes": size}))
+
+    def _inject(self, spec: EnvSpec, entry: Path, root: str, env: dict[str, str] | None, out: dict[str, str]) -> None:
+        """Point a run at entry: env overrides in out, and for npm a project node_modules symlink."""
+        path = out.get("PATH") or (env if env is not None else os.environ).get("PATH", "")
+        if spec.kind == KIND_NPM:
+            modules = entry / "node_modules"
+            out["NODE_PATH"] = str(modules)
+            out["PATH"] = f"{modules / '.bin'}{os.pathsep}{path}"
+            link = os.path.join(root, "node_modules")
+            # Never replace a node_modules the project installed itself.
+            if not os.path.lexists(link) or (os.path.islink(link) and os.readlink(link) != str(modules)):
+                tmp = f"{link}.runner-{os.getpid()}"
+                os.symlink(modules, tmp)
+                os.replace(tmp, link)
+        else:
+            out["VIRTUAL_ENV"] = str(entry)
+            out["PATH"] = f"{entry / 'bin'}{os.pathsep}{path}"
+
+    def evict(self) -> None:
+        """Remove least recently used entries not in use until the cache fits max_bytes (blocking I/O)."""
+        entries = []
+        for ready in self.directory.glob(f"*/{READY}"):
+            try:
+                entries.append((ready.stat().st_mtime, json.loads(ready.read_text())["bytes"], ready.parent))
+            except (OSError, ValueError, KeyError):
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            fd = os.open(f"{entry}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue  # in use by a run
+            try:
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                ENV_CACHE_EVICTIONS.inc()
+            finally:
+                os.close(fd)
+        ENV_CACHE_BYTES.set(total)
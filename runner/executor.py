@@ -0,0 +1,321 @@
+"""Run a command as a subprocess with a timeout.
+
+Each command gets its own session (process group) so that a timeout kills
+everything it started (e.g. pytest workers), not just the direct child,
+and optional setrlimit caps (ResourceLimits). The Runner reaps each
+command with wait4() to record its CPU time and peak memory.
+stream_process() yields output line by line while the command runs;
+run_process() collects it. Either way, whatever was printed before a
+timeout is kept.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import resource
+import signal
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import IO, AsyncIterator, Awaitable, Callable
+
+from prometheus_client import Histogram
+
+from runner.capture import OutputCapture
+
+EXECUTION_CPU_SECONDS = Histogram(
+    "runner_execution_cpu_seconds",
+    "CPU time (user + system) of finished Runner executions.",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+EXECUTION_MAX_RSS_BYTES = Histogram(
+    "runner_execution_max_rss_bytes",
+    "Peak resident memory of finished Runner executions.",
+    buckets=tuple(2**n * 1024 * 1024 for n in range(4, 14)),  # 16 MiB .. 8 GiB
+)
+EXECUTION_OUTPUT_BYTES = Histogram(
+    "runner_execution_output_bytes",
+    "Bytes written to stdout and stderr by finished Runner executions.",
+    buckets=tuple(4**n * 1024 for n in range(0, 9)),  # 1 KiB .. 64 MiB
+)
+
+# How long to keep reading pipes after the process group was killed.
+KILL_GRACE_SECONDS = 2.0
+READ_CHUNK = 64 * 1024
+# Lines buffered between the pipes and the consumer; a slow consumer (e.g. a
+# streaming client) then slows the command down instead of growing memory.
+QUEUE_LINES = 1024
+
+
+@dataclass
+class ProcessResult:
+    """Outcome of one run; exit_code is -1 when the run timed out.
+
+    Resource usage comes from wait4() and covers the command and the
+    descendants it waited for.
+    """
+
+    exit_code: int
+    stdout: bytes
+    stderr: bytes
+    duration_seconds: float
+    timed_out: bool = False
+    cpu_user_seconds: float = 0.0
+    cpu_system_seconds: float = 0.0
+    max_rss_bytes: int = 0
+
+
+@dataclass
+class ResourceLimits:
+    """setrlimit caps applied to the command (and inherited by its children); 0 leaves a limit unset."""
+
+    memory_bytes: int = 0  # RLIMIT_AS (address space)
+    cpu_seconds: int = 0  # RLIMIT_CPU, per process
+    open_files: int = 0  # RLIMIT_NOFILE
+
+    def soft_limits(self) -> list[tuple[int, int]]:
+        """(RLIMIT_*, soft value) pairs to set, each capped at this process's (inherited) hard limit."""
+        limits = []
+        for limit, value in (
+            (resource.RLIMIT_AS, self.memory_bytes),
+            (resource.RLIMIT_CPU, self.cpu_seconds),
+            (resource.RLIMIT_NOFILE, self.open_files),
+        ):
+            if value > 0:
+                _, hard = resource.getrlimit(limit)
+                if hard != resource.RLIM_INFINITY:
+                    value = min(value, hard)
+                limits.append((limit, value))
+        return limits
+
+    def wrap(self, command: list[str]) -> list[str]:
+        """command run through `sh -c 'ulimit ...; exec "$@"'`, so the limits hold from its first instruction.
+
+        Setting them in the child between fork and exec (preexec_fn) is unsafe
+        in the threaded Runner, and prlimit() after the spawn would leave the
+        command briefly unlimited.
+        """
+        flags = {resource.RLIMIT_AS: "-v", resource.RLIMIT_CPU: "-t", resource.RLIMIT_NOFILE: "-n"}
+        steps = []
+        for limit, value in self.soft_limits():
+            steps.append(f"ulimit -S {flags[limit]} {value // 1024 if limit == resource.RLIMIT_AS else value}")
+        if not steps:
+            return command
+        return ["/bin/sh", "-c", " && ".join(steps) + ' && exec "$@"', "sh", *command]
+
+    @property
+    def active(self) -> bool:
+        return self.memory_bytes > 0 or self.cpu_seconds > 0 or self.open_files > 0
+
+
+def observe_usage(result: ProcessResult, output_bytes: int) -> None:
+    """Record a finished execution's CPU time, peak memory and output size in the Prometheus histograms."""
+    EXECUTION_CPU_SECONDS.observe(result.cpu_user_seconds + result.cpu_system_seconds)
+    EXECUTION_MAX_RSS_BYTES.observe(result.max_rss_bytes)
+    EXECUTION_OUTPUT_BYTES.observe(output_bytes)
+
+
+# ("stdout" | "stderr", one line including its newline; the last may lack it)
+OutputEvent = tuple[str, bytes]
+
+
+def _kill_group(pid: int) -> None:
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+# (exit_code, cpu_user_seconds, cpu_system_seconds, max_rss_bytes) of a reaped command
+Exit = tuple[int, float, float, int]
+
+
+@dataclass
+class Spawned:
+    """A started command: its pid (also its process group id), the read ends of its output pipes and its Exit."""
+
+    pid: int
+    stdout: IO[bytes]
+    stderr: IO[bytes]
+    exited: asyncio.Future
+
+
+# Starts a command (command, cwd, env, limits); subprocess_spawner by default, see also runner.warm.
+Spawner = Callable[[list[str], str | None, dict[str, str] | None, ResourceLimits | None], Awaitable[Spawned]]
+
+
+def _wait4(pid: int) -> asyncio.Future:
+    """Future Exit of os.wait4(pid), waited in a dedicated thread so runs never queue behind a shared executor.
+
+    The Runner reaps its commands itself rather than through asyncio's child
+    watcher: only wait4 reports the resource usage of one specific child.
+    """
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+
+    def wait() -> None:
+        try:
+            _, status, usage = os.wait4(pid, 0)
+            # ru_maxrss is in kilobytes on Linux
+            outcome = (os.waitstatus_to_exitcode(status), usage.ru_utime, usage.ru_stime, usage.ru_maxrss * 1024)
+        except ChildProcessError as e:
+            outcome = e
+        loop.call_soon_threadsafe(_settle, fut, outcome)
+
+    threading.Thread(target=wait, name=f"wait4-{pid}", daemon=True).start()
+    return fut
+
+
+def _settle(fut: asyncio.Future, outcome) -> None:
+    if fut.done():
+        return
+    if isinstance(outcome, BaseException):
+        fut.set_exception(outcome)
+    else:
+        fut.set_result(outcome)
+
+
+async def _pump(name: str, stream: asyncio.StreamReader, queue: asyncio.Queue) -> None:
+    """Put complete lines of stream on queue (over-long lines in READ_CHUNK pieces), then None."""
+    pending = b""
+    try:
+        while chunk := await stream.read(READ_CHUNK):
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                await queue.put((name, line + b"\n"))
+            while len(pending) >= READ_CHUNK:
+                await queue.put((name, pending[:READ_CHUNK]))
+                pending = pending[READ_CHUNK:]
+        if pending:
+            await queue.put((name, pending))
+    except OSError:
+        pass
+    await queue.put(None)
+
+
+async def _reader(pipe) -> tuple[asyncio.StreamReader, asyncio.BaseTransport]:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=READ_CHUNK * 2)
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    return reader, transport
+
+
+async def subprocess_spawner(
+    command: list[str], cwd: str | None, env: dict[str, str] | None, limits: ResourceLimits | None
+) -> Spawned:
+    """Start command as a new session, under limits (see ResourceLimits.wrap)."""
+    proc = subprocess.Popen(
+        limits.wrap(command) if limits is not None else command,
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    exited = _wait4(proc.pid)
+
+    def reaped(fut: asyncio.Future) -> None:
+        if not fut.cancelled() and fut.exception() is None:
+            proc.returncode = fut.result()[0]  # keeps Popen from waiting again
+
+    exited.add_done_callback(reaped)
+    return Spawned(proc.pid, proc.stdout, proc.stderr, exited)
+
+
+async def stream_process(
+    command: list[str],
+    *,
+    cwd: str | None = None,
+    env: dict[str, str] | None = None,
+    timeout: float = 300,
+    limits: ResourceLimits | None = None,
+    spawn: Spawner | None = None,
+) -> AsyncIterator[OutputEvent | ProcessResult]:
+    """Run command, yielding OutputEvents as lines arrive and finally a ProcessResult (without output).
+
+    The process group is killed after timeout seconds, or if the consumer
+    stops iterating (e.g. the HTTP client disconnected).
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    proc = await (spawn or subprocess_spawner)(command, cwd, env, limits)
+    exited = proc.exited
+    transports = []
+    queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_LINES)
+    readers = []
+    for name, pipe in (("stdout", proc.stdout), ("stderr", proc.stderr)):
+        reader, transport = await _reader(pipe)
+        transports.append(transport)
+        readers.append(asyncio.create_task(_pump(name, reader, queue)))
+    deadline = loop.time() + timeout
+    timed_out = False
+    open_streams = len(readers)
+    try:
+        while open_streams:
+            try:
+                item = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                if timed_out:
+                    break  # a grandchild escaped the group and still holds the pipes open
+                timed_out = True
+                _kill_group(proc.pid)
+                deadline = loop.time() + KILL_GRACE_SECONDS
+                continue
+            if item is None:
+                open_streams -= 1
+                continue
+            yield item
+        if not timed_out:
+            try:
+                await asyncio.wait_for(asyncio.shield(exited), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                timed_out = True
+                _kill_group(proc.pid)
+        exit_code, cpu_user, cpu_system, max_rss = await exited
+    finally:
+        if not exited.done():
+            _kill_group(proc.pid)
+        for reader in readers:
+            reader.cancel()
+        for transport in transports:
+            transport.close()
+    yield ProcessResult(
+        exit_code=-1 if timed_out else exit_code,
+        stdout=b"",
+        stderr=b"",
+        duration_seconds=round(time.perf_counter() - start, 3),
+        timed_out=timed_out,
+        cpu_user_seconds=round(cpu_user, 3),
+        cpu_system_seconds=round(cpu_system, 3),
+        max_rss_bytes=max_rss,
+    )
+
+
+async def run_process(
+    command: list[str],
+    *,
+    cwd: str | None = None,
+    env: dict[str, str] | None = None,
+    timeout: float = 300,
+    stdout: OutputCapture | None = None,
+    stderr: OutputCapture | None = None,
+    limits: ResourceLimits | None = None,
+    spawn: Spawner | None = None,
+) -> ProcessResult:
+    """Run command and collect its output; kills its process group after timeout seconds.
+
+    Output goes into the given captures (see runner.capture; unbounded by
+    default) and the result carries their getvalue().
+    """
+    captures = {"stdout": stdout or OutputCapture(), "stderr": stderr or OutputCapture()}
+    async for event in stream_process(command, cwd=cwd, env=env, timeout=timeout, limits=limits, spawn=spawn):
+        if isinstance(event, ProcessResult):
+            event.stdout = captures["stdout"].getvalue()
+            event.stderr = captures["stderr"].getvalue()
+            return event
+        captures[event[0]].write(event[1])
+    raise RuntimeError("stream_process ended without a result")
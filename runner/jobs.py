@@ -0,0 +1,97 @@
+"""In-memory table of asynchronous Runner jobs (POST/GET/DELETE /jobs).
+
+A job is an asyncio task running one command. Clients poll its status
+instead of holding a connection open for the whole run, so a retried
+request can no longer start the same suite twice. Finished jobs are
+dropped ttl_seconds after they end; the table does not survive a restart.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+@dataclass
+class Job:
+    """One submitted command; result is set once status is completed."""
+
+    id: str
+    status: str = QUEUED
+    result: Any = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+    task: asyncio.Task | None = field(default=None, repr=False)
+
+
+class JobTable:
+    """Jobs by ID. start() must be called from the event loop that runs them."""
+
+    def __init__(self, ttl_seconds: float = 3600) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._jobs: dict[str, Job] = {}
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def start(self, run: Callable[[Job], Awaitable[Any]]) -> Job:
+        """Create a job and start run(job) in a task; run may set job.status to running."""
+        self.cleanup()
+        job = Job(id=uuid.uuid4().hex)
+        job.task = asyncio.create_task(self._run(job, run))
+        # Also covers a task cancelled before it started, when _run never executes.
+        job.task.add_done_callback(lambda task: self._finished(job, task))
+        self._jobs[job.id] = job
+        return job
+
+    async def _run(self, job: Job, run: Callable[[Job], Awaitable[Any]]) -> None:
+        try:
+            job.result = await run(job)
+            job.status = COMPLETED
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e) or type(e).__name__
+
+    @staticmethod
+    def _finished(job: Job, task: asyncio.Task) -> None:
+        if task.cancelled():
+            job.status = CANCELLED
+        job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Job | None:
+        self.cleanup()
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """Wait up to timeout seconds for job to finish (long poll); the job keeps running either way."""
+        if job.task is not None and not job.task.done() and timeout > 0:
+            await asyncio.wait({job.task}, timeout=timeout)
+        return job
+
+    async def cancel(self, job_id: str) -> Job | None:
+        """Cancel a queued or running job and wait for it to stop; finished jobs are returned as they are."""
+        job = self._jobs.get(job_id)
+        if job is None or job.task is None or job.task.done():
+            return job
+        job.task.cancel()
+        await asyncio.wait({job.task})
+        return job
+
+    def cleanup(self) -> int:
+        """Forget jobs that finished more than ttl_seconds ago; returns how many were dropped."""
+        cutoff = time.time() - self.ttl_seconds
+        expired = [j.id for j in self._jobs.values() if j.finished_at is not None and j.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
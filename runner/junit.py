@@ -0,0 +1,134 @@
+"""Streaming reader for JUnit XML reports (as written by pytest --junitxml) and compact test reports.
+
+summarize() turns one or more reports into counts, failing test IDs and
+trimmed tracebacks for the failures only, which is what an agent needs in
+its context instead of the raw test output.
+"""
+
+from __future__ import annotations
+
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator
+
+# Failures listed in full; the rest are only counted.
+MAX_FAILURES = 20
+# Lines and characters kept from each failure's traceback.
+TRACEBACK_LINES = 12
+TRACEBACK_CHARS = 1500
+
+
+@dataclass
+class TestCase:
+    """One <testcase>; outcome is passed, failed, error or skipped."""
+
+    __test__ = False  # not a pytest test class
+
+    classname: str
+    name: str
+    seconds: float
+    outcome: str = "passed"
+    message: str = ""
+    details: str = ""
+
+    @property
+    def test_id(self) -> str:
+        return f"{self.classname}::{self.name}" if self.classname else self.name
+
+
+@dataclass
+class TestFailure:
+    __test__ = False
+
+    test_id: str
+    outcome: str
+    message: str
+    traceback: str
+
+
+@dataclass
+class TestReport:
+    """Counts over all test cases plus the first MAX_FAILURES failures and errors."""
+
+    __test__ = False
+
+    total: int = 0
+    passed: int = 0
+    failed: int = 0
+    errors: int = 0
+    skipped: int = 0
+    duration_seconds: float = 0.0
+    failures: list[TestFailure] = field(default_factory=list)
+
+
+def junit_key(nodeid: str) -> str:
+    """The "classname::name" a pytest node ID gets in JUnit XML (mirrors pytest's mangle_test_address)."""
+    path, bracket, params = nodeid.partition("[")
+    names = path.split("::")
+    names[0] = re.sub(r"\.py$", "", names[0].replace("/", "."))
+    names[-1] += bracket + params
+    return ".".join(names[:-1]) + "::" + names[-1]
+
+
+def iter_testcases(source: str | Path) -> Iterator[TestCase]:
+    """Yield each test case in the report, clearing parsed elements so memory stays flat."""
+    for _, elem in ET.iterparse(source, events=("end",)):
+        if elem.tag != "testcase":
+            continue
+        outcome, message, details = "passed", "", ""
+        for child in elem:
+            if child.tag in ("failure", "error", "skipped"):
+                outcome = "failed" if child.tag == "failure" else child.tag
+                message = child.get("message", "")
+                details = child.text or ""
+                break
+        yield TestCase(
+            classname=elem.get("classname", ""),
+            name=elem.get("name", ""),
+            seconds=float(elem.get("time") or 0.0),
+            outcome=outcome,
+            message=message,
+            details=details,
+        )
+        elem.clear()
+
+
+def trim_traceback(details: str) -> str:
+    """The informative part of a pytest failure: its "E " lines and final location, else the last lines."""
+    lines = details.rstrip().splitlines()
+    kept = [line for line in lines if line.startswith("E ")]
+    if kept and lines and not lines[-1].startswith("E "):
+        kept.append(lines[-1])
+    kept = (kept or lines)[-TRACEBACK_LINES:]
+    text = "\n".join(kept)
+    return text if len(text) <= TRACEBACK_CHARS else "..." + text[-TRACEBACK_CHARS:]
+
+
+def summarize(sources: Iterable[str | Path]) -> TestReport:
+    """Merge JUnit reports into one TestReport; unreadable or truncated reports are skipped."""
+    report = TestReport()
+    for source in sources:
+        try:
+            for case in iter_testcases(source):
+                report.total += 1
+                report.duration_seconds += case.seconds
+                if case.outcome == "passed":
+                    report.passed += 1
+                    continue
+                if case.outcome == "skipped":
+                    report.skipped += 1
+                    continue
+                if case.outcome == "failed":
+                    report.failed += 1
+                else:
+                    report.errors += 1
+                if len(report.failures) < MAX_FAILURES:
+                    report.failures.append(
+                        TestFailure(case.test_id, case.outcome, case.message[:300], trim_traceback(case.details))
+                    )
+        except (OSError, ET.ParseError):
+            continue
+    report.duration_seconds = round(report.duration_seconds, 3)
+    return report
@@ -0,0 +1,211 @@
+"""Parallel sharded pytest runs without pytest-xdist.
+
+The Runner collects the test IDs the command selects, splits them into
+shards balanced by historical per-test durations (longest first onto the
+least loaded shard), runs one pytest process per shard concurrently and
+merges their exit codes and output. Test selection is done by a small
+plugin (pytest_plugins/runner_shard.py) put on PYTHONPATH, so the target
+project needs nothing installed. Durations are read back from each shard's
+JUnit XML and kept per project in the Runner's state directory.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import heapq
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from xml.etree.ElementTree import ParseError
+
+from runner.capture import OutputCapture
+from runner.executor import ProcessResult, ResourceLimits, Spawner, run_process
+from runner.junit import iter_testcases, junit_key
+
+PLUGIN_DIR = str(Path(__file__).parent / "pytest_plugins")
+PLUGIN = "runner_shard"
+# Assumed duration of a test never seen before when no history exists yet.
+DEFAULT_TEST_SECONDS = 0.5
+# Weight of the newest run in a test's remembered duration.
+DURATION_ALPHA = 0.5
+# pytest exit code for "no tests collected".
+NO_TESTS = 5
+
+
+def is_pytest(command: list[str]) -> bool:
+    """True for `pytest ...` and `python -m pytest ...`."""
+    exe = os.path.basename(command[0]).lower()
+    if exe.startswith("pytest"):
+        return True
+    return exe.startswith("python") and command[1:3] == ["-m", "pytest"]
+
+
+class DurationStore:
+    """Per-test durations (seconds, keyed by JUnit "classname::name") per project, one JSON file each."""
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def _path(self, project_path: str) -> Path:
+        digest = hashlib.sha256(os.path.realpath(project_path).encode()).hexdigest()[:32]
+        return self.directory / f"durations-{digest}.json"
+
+    def load(self, project_path: str) -> dict[str, float]:
+        try:
+            return json.loads(self._path(project_path).read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def update(self, project_path: str, durations: dict[str, float]) -> None:
+        """Blend new durations into the stored ones (EWMA) and write the file atomically."""
+        if not durations:
+            return
+        stored = self.load(project_path)
+        for key, seconds in durations.items():
+            old = stored.get(key)
+            stored[key] = seconds if old is None else old + DURATION_ALPHA * (seconds - old)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(project_path)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(stored))
+        os.replace(tmp, path)
+
+
+def balance(test_ids: list[str], durations: dict[str, float], shards: int) -> list[list[str]]:
+    """Split test_ids into at most `shards` non-empty groups of similar total duration (LPT)."""
+    known = [durations[junit_key(t)] for t in test_ids if junit_key(t) in durations]
+    default = sum(known) / len(known) if known else DEFAULT_TEST_SECONDS
+    weighted = sorted(test_ids, key=lambda t: durations.get(junit_key(t), default), reverse=True)
+    heap = [(0.0, i) for i in range(max(1, min(shards, len(test_ids))))]
+    groups: list[list[str]] = [[] for _ in heap]
+    for test_id in weighted:
+        total, i = heapq.heappop(heap)
+        groups[i].append(test_id)
+        heapq.heappush(heap, (total + durations.get(junit_key(test_id), default), i))
+    # Keep each shard in collection order so module/class fixtures are set up once per shard.
+    order = {t: n for n, t in enumerate(test_ids)}
+    return [sorted(g, key=order.__getitem__) for g in groups if g]
+
+
+def merge_exit_codes(codes: list[int]) -> int:
+    """One exit code for all shards: a timeout (-1) or the worst failure wins; "no tests" only if every shard had none."""
+    if -1 in codes:
+        return -1
+    failures = [c for c in codes if c not in (0, NO_TESTS)]
+    if failures:
+        return max(failures)
+    return 0 if 0 in codes else NO_TESTS
+
+
+def _shard_env(env: dict[str, str] | None, **extra: str) -> dict[str, str]:
+    base = dict(env if env is not None else os.environ)
+    pythonpath = base.get("PYTHONPATH")
+    base["PYTHONPATH"] = PLUGIN_DIR + (os.pathsep + pythonpath if pythonpath else "")
+    return {**base, **extra}
+
+
+async def run_sharded(
+    command: list[str],
+    *,
+    cwd: str,
+    env: dict[str, str] | None,
+    timeout: float,
+    shards: int,
+    durations: DurationStore,
+    project_path: str,
+    stdout: OutputCapture,
+    stderr: OutputCapture,
+    junit_dir: str,
+    limits: ResourceLimits | None = None,
+    spawn: Spawner | None = None,
+) -> ProcessResult:
+    """Run a pytest command as up to `shards` concurrent processes; falls back to one run if collection fails.
+
+    Shard output is written to stdout/stderr one shard after another, each
+    under a "[shard i/n]" header, and the result carries their getvalue().
+    Each process writes a JUnit report into junit_dir. CPU time is summed
+    over all processes (collection included); max_rss_bytes is the largest
+    single process.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="runner-shards-") as tmp:
+        collect_file = os.path.join(tmp, "collected.txt")
+        collected = await run_process(
+            [*command, "--collect-only", "-q", "-p", PLUGIN],
+            cwd=cwd,
+            env=_shard_env(env, RUNNER_COLLECT_FILE=collect_file),
+            timeout=timeout,
+            limits=limits,
+            spawn=spawn,
+        )
+        test_ids = Path(collect_file).read_text().splitlines() if os.path.exists(collect_file) else []
+        if collected.exit_code != 0 or len(test_ids) < 2:
+            # Collection errors, no tests or a single test: a plain run reports it best.
+            return await run_process(
+                [*command, f"--junitxml={os.path.join(junit_dir, 'report.xml')}"],
+                cwd=cwd,
+                env=env,
+                timeout=max(deadline - loop.time(), 1),
+                stdout=stdout,
+                stderr=stderr,
+                limits=limits,
+                spawn=spawn,
+            )
+
+        groups = balance(test_ids, durations.load(project_path), shards)
+        captures = [
+            (OutputCapture(stdout.head_bytes, stdout.tail_bytes), OutputCapture(stderr.head_bytes, stderr.tail_bytes))
+            for _ in groups
+        ]
+        runs = []
+        for i, group in enumerate(groups):
+            shard_file = os.path.join(tmp, f"shard-{i}.txt")
+            Path(shard_file).write_text("\n".join(group) + "\n")
+            runs.append(
+                run_process(
+                    [*command, "-p", PLUGIN, f"--junitxml={os.path.join(junit_dir, f'shard-{i}.xml')}"],
+                    cwd=cwd,
+                    env=_shard_env(env, RUNNER_SHARD_FILE=shard_file),
+                    timeout=max(deadline - loop.time(), 1),
+                    stdout=captures[i][0],
+                    stderr=captures[i][1],
+                    limits=limits,
+                    spawn=spawn,
+                )
+            )
+        results = await asyncio.gather(*runs)
+
+        seen: dict[str, float] = {}
+        for i in range(len(groups)):
+            report = os.path.join(junit_dir, f"shard-{i}.xml")
+            if os.path.exists(report):
+                try:
+                    for case in iter_testcases(report):
+                        seen[f"{case.classname}::{case.name}"] = case.seconds
+                except ParseError:
+                    pass  # a truncated report from a killed shard only loses its timings
+        durations.update(project_path, seen)
+
+    for i, result in enumerate(results):
+        header = f"[shard {i + 1}/{len(groups)}: {len(groups[i])} tests, exit {result.exit_code}]\n".encode()
+        stdout.write(header)
+        stdout.write(result.stdout)
+        if result.stderr:
+            stderr.write(header)
+            stderr.write(result.stderr)
+    exit_code = merge_exit_codes([r.exit_code for r in results])
+    return ProcessResult(
+        exit_code=exit_code,
+        stdout=stdout.getvalue(),
+        stderr=stderr.getvalue(),
+        duration_seconds=round(time.perf_counter() - start, 3),
+        timed_out=any(r.timed_out for r in results),
+        cpu_user_seconds=round(sum(r.cpu_user_seconds for r in [collected, *results]), 3),
+        cpu_system_seconds=round(sum(r.cpu_system_seconds for r in [collected, *results]), 3),
+        max_rss_bytes=max(r.max_rss_bytes for r in [collected, *results]),
+    )
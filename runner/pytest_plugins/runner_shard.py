@@ -0,0 +1,27 @@
+"""pytest plugin the Runner injects (-p runner_shard, via PYTHONPATH) for sharded runs.
+
+Kept dependency-free so it loads in any project's pytest. With
+RUNNER_COLLECT_FILE set it writes the selected test node IDs (after -k/-m
+filtering) to that file; with RUNNER_SHARD_FILE set it deselects every test
+not listed in that file.
+"""
+
+import os
+
+import pytest
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_collection_modifyitems(config, items):
+    collect_file = os.environ.get("RUNNER_COLLECT_FILE")
+    if collect_file:
+        with open(collect_file, "w", encoding="utf-8") as f:
+            f.writelines(item.nodeid + "\n" for item in items)
+    shard_file = os.environ.get("RUNNER_SHARD_FILE")
+    if shard_file:
+        with open(shard_file, encoding="utf-8") as f:
+            wanted = set(f.read().splitlines())
+        deselected = [item for item in items if item.nodeid not in wanted]
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = [item for item in items if item.nodeid in wanted]
@@ -0,0 +1,157 @@
+"""Cache of command results keyed by a fingerprint of the project tree, the command and its env.
+
+An agent often re-runs the same test command on code it has not touched;
+such runs are answered from the cache instead of paying for the suite
+again. The tree fingerprint is content based, but stays cheap: a file is
+only re-hashed when its mtime or size changed since the previous walk
+(like git's index), and large files are fingerprinted by size and mtime.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from prometheus_client import Counter, Gauge
+
+from runner.workspace import CACHE_DIRS, SHARED_DIRS
+
+RESULT_CACHE_REQUESTS = Counter(
+    "runner_result_cache_requests_total",
+    "Runner result cache lookups by outcome (hit/miss/bypass).",
+    ["outcome"],
+)
+RESULT_CACHE_ENTRIES = Gauge("runner_result_cache_entries", "Results currently held by the Runner result cache.")
+
+# Directories that runs write into themselves (VCS internals, tool caches,
+# build output) or that hold installed dependencies; including them would
+# make every run invalidate the next and hash whole dependency trees.
+# Installed dependencies are still covered through their lockfiles.
+IGNORED_DIRS = CACHE_DIRS | SHARED_DIRS | {".git", ".hg", ".svn", "htmlcov", "build", "dist"}
+IGNORED_FILE_PREFIXES = (".coverage",)
+# Files larger than this are fingerprinted by (size, mtime) rather than content.
+MAX_HASH_BYTES = 1024 * 1024
+
+
+class TreeFingerprinter:
+    """Fingerprints directory trees, remembering per-file hashes between walks.
+
+    Hashes are kept per walked root and only for the files its latest walk
+    saw, so deleted files do not pile up. Walks hash without holding the
+    lock; concurrent walks of one root may both hash a changed file.
+    """
+
+    def __init__(self) -> None:
+        # root -> path -> (mtime_ns, size, digest)
+        self._roots: dict[str, dict[str, tuple[int, int, str]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _file_digest(path: str, st: os.stat_result, known: tuple[int, int, str] | None) -> str:
+        if known is not None and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+            return known[2]
+        if st.st_size > MAX_HASH_BYTES:
+            return f"stat:{st.st_size}:{st.st_mtime_ns}"
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def digests(self, root: str) -> dict[str, str]:
+        """Content digest of every file under root by relative path (blocking I/O); ignored dirs are skipped."""
+        root = os.path.realpath(root)
+        with self._lock:
+            previous = self._roots.get(root, {})
+        seen: dict[str, tuple[int, int, str]] = {}
+        out: dict[str, str] = {}
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if d not in IGNORED_DIRS)
+            for name in sorted(filenames):
+                if name.startswith(IGNORED_FILE_PREFIXES):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                    if os.path.isfile(path):
+                        digest = self._file_digest(path, st, previous.get(path))
+                        seen[path] = (st.st_mtime_ns, st.st_size, digest)
+                    else:
+                        digest = "special"
+                except OSError:
+                    continue  # vanished or unreadable mid-walk
+                out[os.path.relpath(path, root)] = f"{st.st_mode & 0o111}:{digest}"
+        with self._lock:
+            self._roots[root] = seen
+        return out
+
+    def fingerprint(self, root: str) -> str:
+        """SHA-256 over every file's relative path, mode and content digest under root (blocking I/O)."""
+        h = hashlib.sha256()
+        for rel, digest in self.digests(root).items():
+            h.update(f"{rel}\0{digest}\n".encode())
+        return h.hexdigest()
+
+    def forget(self, root: str) -> None:
+        """Drop remembered hashes of root and of roots under it (e.g. after the project was deleted)."""
+        root = os.path.realpath(root)
+        prefix = os.path.join(root, "")
+        with self._lock:
+            for walked in [r for r in self._roots if r == root or r.startswith(prefix)]:
+                del self._roots[walked]
+
+
+def result_key(
+    tree: str, command: list[str], cwd: str, env: dict[str, str] | None, timeout: int, **options: object
+) -> str:
+    """Cache key for one run: tree fingerprint, command, working directory, env overrides, timeout and run options."""
+    payload = {"tree": tree, "command": command, "cwd": cwd, "env": env or {}, "timeout": timeout, **options}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """Thread-safe LRU of run results that also expire after ttl_seconds; maxsize <= 0 disables it."""
+
+    def __init__(self, maxsize: int, ttl_seconds: float, *, clock: Callable[[], float] = time.monotonic) -> None:
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def get(self, key: str) -> Any | None:
+        """The cached result or None on miss/expiry; counts the lookup."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                del self._data[key]
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+            RESULT_CACHE_ENTRIES.set(len(self._data))
+        RESULT_CACHE_REQUESTS.labels(outcome="miss" if entry is None else "hit").inc()
+        return None if entry is None else entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            RESULT_CACHE_ENTRIES.set(len(self._data))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            RESULT_CACHE_ENTRIES.set(0)
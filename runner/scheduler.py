@@ -0,0 +1,246 @@
+"""Fair bounded-concurrency scheduler for Runner executions.
+
+At most max_concurrent runs execute at once; up to max_queue more wait.
+Beyond that, acquire() raises QueueFull with a Retry-After estimate so
+callers can back off instead of piling onto the server.
+
+Waiting runs are ordered by priority class first: interactive runs (a
+person waiting on POST /run) go before agent runs (RunnerTool calls made
+by the crew). Within a class, projects share slots by weighted fair
+queuing: each project accumulates virtual time, the run time it consumed
+divided by its weight, and the next slot goes to the waiting project with
+the least (FIFO within a project). A project that was idle starts level
+with the busiest waiting ones rather than with credit saved up. With
+max_per_project set, no project runs more than that many at once, however
+idle the rest of the Runner is.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from itertools import count
+
+from prometheus_client import Counter, Gauge, Histogram
+
+QUEUE_DEPTH = Gauge("runner_queue_depth", "Executions waiting for a slot.")
+RUNNING = Gauge("runner_running_executions", "Executions currently running.")
+QUEUE_WAIT = Histogram(
+    "runner_queue_wait_seconds",
+    "Time executions waited for a slot.",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+REJECTED = Counter("runner_rejected_total", "Executions rejected because the queue was full.")
+PROJECT_QUEUE_DEPTH = Gauge("runner_project_queue_depth", "Executions waiting for a slot, by project.", ["project"])
+PROJECT_RUNNING = Gauge("runner_project_running_executions", "Executions currently running, by project.", ["project"])
+PROJECT_QUEUE_WAIT = Histogram(
+    "runner_project_queue_wait_seconds",
+    "Time executions waited for a slot, by project and priority class.",
+    ["project", "priority"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+# Assumed run length until the first run completes (for Retry-After and fair-share charging).
+DEFAULT_RUN_SECONDS = 10.0
+# Weight of the newest run in the average run length.
+EWMA_ALPHA = 0.2
+
+INTERACTIVE = "interactive"
+AGENT = "agent"
+# Highest first.
+PRIORITIES = (INTERACTIVE, AGENT)
+
+
+class QueueFull(Exception):
+    """Raised by Scheduler.acquire when max_queue runs are already waiting."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"runner queue is full; retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass(eq=False)
+class Ticket:
+    """A place in the queue (or a slot already held) from Scheduler.enqueue."""
+
+    project: str
+    priority: str
+    future: asyncio.Future
+    seq: int
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+@dataclass(eq=False)
+class _Project:
+    weight: float
+    running: int = 0
+    vtime: float = 0.0
+    avg_run_seconds: float = DEFAULT_RUN_SECONDS
+    waiters: dict[str, deque[Ticket]] = field(default_factory=lambda: {p: deque() for p in PRIORITIES})
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self.waiters.values())
+
+
+class Scheduler:
+    """Fair slot scheduler. Waiters are plain futures on the caller's loop, so no loop is captured.
+
+    project names the queue a run waits in (any string, e.g. the project
+    path; "" by default); weights maps projects to their fair-share weight
+    (default 1). max_per_project <= 0 means no per-project limit.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queue: int,
+        *,
+        max_per_project: int = 0,
+        weights: dict[str, float] | None = None,
+    ) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.max_per_project = max_per_project if max_per_project > 0 else self.max_concurrent
+        self.weights = weights or {}
+        self.running = 0
+        self.queued = 0
+        self._projects: dict[str, _Project] = {}
+        self._seq = count()
+        self._avg_run_seconds = DEFAULT_RUN_SECONDS
+
+    def retry_after(self) -> int:
+        """Seconds until a queued run would likely start: queue length times average run length per slot."""
+        return max(1, math.ceil((self.queued + 1) * self._avg_run_seconds / self.max_concurrent))
+
+    def _project(self, name: str) -> _Project:
+        project = self._projects.get(name)
+        if project is None:
+            project = self._projects[name] = _Project(weight=max(self.weights.get(name, 1.0), 1e-3))
+            # Start level with the projects already competing, not with credit saved while idle.
+            active = [p.vtime for p in self._projects.values() if p is not project]
+            project.vtime = min(active) if active else 0.0
+        return project
+
+    def _update_gauges(self, name: str) -> None:
+        QUEUE_DEPTH.set(self.queued)
+        RUNNING.set(self.running)
+        project = self._projects.get(name)
+        if project is not None and (project.running or project.queued):
+            PROJECT_QUEUE_DEPTH.labels(project=name).set(project.queued)
+            PROJECT_RUNNING.labels(project=name).set(project.running)
+            return
+        self._projects.pop(name, None)  # idle: forget it, and its label series
+        for gauge in (PROJECT_QUEUE_DEPTH, PROJECT_RUNNING):
+            try:
+                gauge.remove(name)
+            except KeyError:
+                pass
+
+    def _grant(self, ticket: Ticket, project: _Project) -> None:
+        self.running += 1
+        project.running += 1
+        # Charge the expected run time now; release() corrects it with the actual time.
+        project.vtime += project.avg_run_seconds / project.weight
+        ticket.future.set_result(None)
+        waited = time.perf_counter() - ticket.enqueued_at
+        QUEUE_WAIT.observe(waited)
+        PROJECT_QUEUE_WAIT.labels(project=ticket.project, priority=ticket.priority).observe(waited)
+
+    def _next(self) -> tuple[Ticket, _Project] | None:
+        """The next waiter to run: highest priority class, then least virtual time among projects under their limit."""
+        for priority in PRIORITIES:
+            best = None
+            for project in self._projects.values():
+                queue = project.waiters[priority]
+                if queue and project.running < self.max_per_project:
+                    head = queue[0]
+                    if best is None or (project.vtime, head.seq) < (best[1].vtime, best[0].seq):
+                        best = (head, project)
+            if best is not None:
+                best[1].waiters[priority].popleft()
+                self.queued -= 1
+                return best
+        return None
+
+    def _dispatch(self) -> None:
+        while self.running < self.max_concurrent:
+            picked = self._next()
+            if picked is None:
+                return
+            self._grant(*picked)
+            self._update_gauges(picked[0].project)
+
+    def enqueue(self, project: str = "", priority: str = INTERACTIVE) -> Ticket:
+        """Take a slot now (the ticket's future is already done) or a place in the queue.
+
+        Synchronous, so a caller can reject with QueueFull before doing anything
+        else; must be called from the event loop.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"unknown priority class {priority!r}")
+        state = self._project(project)
+        ticket = Ticket(project, priority, asyncio.get_running_loop().create_future(), next(self._seq))
+        if self.running < self.max_concurrent and state.running < self.max_per_project:
+            self._grant(ticket, state)
+        else:
+            if self.queued >= self.max_queue:
+                REJECTED.inc()
+                self._update_gauges(project)
+                raise QueueFull(self.retry_after())
+            state.waiters[priority].append(ticket)
+            self.queued += 1
+        self._update_gauges(project)
+        return ticket
+
+    async def wait(self, ticket: Ticket) -> float:
+        """Wait until an enqueue() ticket holds a slot; returns the seconds waited."""
+        try:
+            await asyncio.shield(ticket.future)
+        except asyncio.CancelledError:
+            self.abandon(ticket)
+            raise
+        return time.perf_counter() - ticket.enqueued_at
+
+    def abandon(self, ticket: Ticket) -> None:
+        """Give back a ticket that will not run: frees its slot if it got one, else leaves the queue."""
+        if ticket.future.done():
+            if not ticket.future.cancelled():
+                self.release(project=ticket.project)
+            return
+        ticket.future.cancel()
+        project = self._projects.get(ticket.project)
+        if project is not None and ticket in project.waiters[ticket.priority]:
+            project.waiters[ticket.priority].remove(ticket)
+            self.queued -= 1
+            self._update_gauges(ticket.project)
+
+    async def acquire(self, project: str = "", priority: str = INTERACTIVE) -> float:
+        """Wait for a slot; returns the seconds waited. Raises QueueFull if the queue is full."""
+        return await self.wait(self.enqueue(project, priority))
+
+    def release(self, run_seconds: float | None = None, project: str = "") -> None:
+        """Free a slot of project (handing it to the next waiter); run_seconds feeds estimates and fair shares."""
+        state = self._project(project)
+        self.running -= 1
+        state.running -= 1
+        if run_seconds is not None:
+            self._avg_run_seconds += EWMA_ALPHA * (run_seconds - self._avg_run_seconds)
+            state.vtime += (run_seconds - state.avg_run_seconds) / state.weight
+            state.avg_run_seconds += EWMA_ALPHA * (run_seconds - state.avg_run_seconds)
+        self._update_gauges(project)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, project: str = "", priority: str = INTERACTIVE):
+        """async with scheduler.slot(): ... runs while holding a slot."""
+        await self.acquire(project, priority)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start, project)
@@ -0,0 +1,85 @@
+"""Single-flight execution: concurrent identical requests share one run.
+
+Manager delegation and client retries often send the Runner the same run
+several times at once. The first request starts a Flight (a task running
+the command); later identical requests join it and receive the same
+result instead of spawning competing processes. The run is cancelled only
+when every request waiting on it has gone away.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from prometheus_client import Counter
+
+COALESCED = Counter(
+    "runner_coalesced_requests_total",
+    "Executions that joined an identical in-flight run instead of starting their own.",
+)
+
+
+class Flight:
+    """One shared run. The creator calls mark_running() once the command actually starts."""
+
+    def __init__(self) -> None:
+        self.task: asyncio.Task | None = None
+        self.running = False
+        self._waiters = 0
+        self._on_running: list[Callable[[], None]] = []
+
+    def mark_running(self) -> None:
+        self.running = True
+        callbacks, self._on_running = self._on_running, []
+        for callback in callbacks:
+            callback()
+
+    async def wait(self, on_running: Callable[[], None] | None = None) -> Any:
+        """Result of the run; on_running is called when (or if already) it started.
+
+        Cancelling one waiter does not affect the others; the run itself is
+        cancelled when its last waiter is.
+        """
+        if on_running is not None:
+            if self.running:
+                on_running()
+            else:
+                self._on_running.append(on_running)
+        self._waiters += 1
+        try:
+            return await asyncio.shield(self.task)
+        finally:
+            self._waiters -= 1
+            if self._waiters == 0 and not self.task.done():
+                self.task.cancel()
+
+
+class SingleFlight:
+    """In-flight runs by key. Must be used from a single event loop."""
+
+    def __init__(self) -> None:
+        self._flights: dict[str, Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def get(self, key: str) -> Flight | None:
+        """The in-flight run for key, counting the caller as coalesced; None if there is none."""
+        flight = self._flights.get(key)
+        if flight is not None:
+            COALESCED.inc()
+        return flight
+
+    def start(self, key: str, run: Callable[[Flight], Awaitable[Any]]) -> Flight:
+        """Start run(flight) as the in-flight run for key; it is forgotten as soon as it finishes."""
+        flight = Flight()
+        flight.task = asyncio.create_task(run(flight))
+        self._flights[key] = flight
+
+        def forget(_: asyncio.Task) -> None:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+        flight.task.add_done_callback(forget)
+        return flight
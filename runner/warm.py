@@ -0,0 +1,277 @@
+"""Warm pool: run python and pytest commands as forks of a pre-imported worker.
+
+Much of a short test run is interpreter startup and importing pytest and
+the project's dependencies. With the warm pool enabled, the Runner keeps
+one worker process (runner/warm_worker.py) per project environment: the
+project's interpreter and PYTHON* environment, started in the project
+directory with pytest and RUNNER_WARM_PRELOAD imported. Each
+eligible command runs in a fresh fork of that worker, so runs stay
+isolated from each other while skipping the startup. A worker is replaced
+when the project's files change (tree fingerprint), so nothing imported
+from the project outlives an edit. Commands the worker cannot run exactly
+like the interpreter would (interpreter flags, non-Python executables, a
+pytest launcher without a readable shebang) start cold as before.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import socket
+import subprocess
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from prometheus_client import Counter
+
+from runner.executor import Exit, ResourceLimits, Spawned, Spawner, subprocess_spawner
+from runner.result_cache import TreeFingerprinter
+
+WARM_EXECUTIONS = Counter(
+    "runner_warm_pool_executions_total",
+    "Executions started by the warm pool, by outcome (warm: forked from a worker; cold: not eligible or worker failed).",
+    ["outcome"],
+)
+WARM_WORKERS_STARTED = Counter(
+    "runner_warm_workers_started_total", "Warm pool workers started (first use or after project files changed)."
+)
+
+WORKER = str(Path(__file__).with_name("warm_worker.py"))
+DEFAULT_PRELOAD = ("pytest",)
+READY_TIMEOUT_SECONDS = 60.0
+
+
+@dataclass
+class WarmCommand:
+    """How a worker fork runs a command: mode is module (-m), code (-c) or script."""
+
+    interpreter: str
+    mode: str
+    target: str
+    argv: list[str]
+    # sys.path[0] when it differs from what `python` + mode would set (console scripts)
+    path0: str | None = None
+
+
+def _shebang_python(script: str, path: str | None) -> str | None:
+    """Interpreter named by a console script's #! line (direct or via env)."""
+    try:
+        with open(script, "rb") as f:
+            line = f.readline(4096).decode(errors="replace").strip()
+    except OSError:
+        return None
+    if not line.startswith("#!"):
+        return None
+    parts = line[2:].split()
+    if parts and os.path.basename(parts[0]) == "env" and len(parts) == 2:
+        return shutil.which(parts[1], path=path)
+    if len(parts) == 1 and os.path.basename(parts[0]).startswith("python"):
+        return parts[0]
+    return None
+
+
+def warm_command(command: list[str], env: dict[str, str] | None) -> WarmCommand | None:
+    """How to run command in a warm worker; None when it has to start cold."""
+    path = (env if env is not None else os.environ).get("PATH")
+    exe = os.path.basename(command[0]).lower()
+    if exe.startswith("pytest"):
+        script = shutil.which(command[0], path=path)
+        interpreter = _shebang_python(script, path) if script else None
+        if interpreter is None:
+            return None
+        return WarmCommand(interpreter, "module", "pytest", [script, *command[1:]], os.path.dirname(script))
+    if not exe.startswith("python") or len(command) < 2:
+        return None
+    interpreter = shutil.which(command[0], path=path)
+    if interpreter is None:
+        return None
+    if command[1] in ("-m", "-c") and len(command) > 2:
+        if command[1] == "-m":
+            return WarmCommand(interpreter, "module", command[2], [command[2], *command[3:]])
+        return WarmCommand(interpreter, "code", command[2], ["-c", *command[3:]])
+    if command[1].startswith("-"):
+        return None  # interpreter options (-u, -X, -O, ...) apply at startup
+    return WarmCommand(interpreter, "script", command[1], command[1:])
+
+
+class _Worker:
+    def __init__(self, proc: subprocess.Popen, socket_path: str, fingerprint: str) -> None:
+        self.proc = proc
+        self.socket_path = socket_path
+        self.fingerprint = fingerprint
+
+    def retire(self) -> None:
+        """Stop accepting runs; the worker exits once its in-flight runs are done."""
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+
+        def reap() -> None:
+            self.proc.wait()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+        threading.Thread(target=reap, name=f"warm-reap-{self.proc.pid}", daemon=True).start()
+
+
+class WarmPool:
+    """Warm workers by project environment, at most max_workers (least recently used retired first)."""
+
+    def __init__(
+        self,
+        directory: str | Path,
+        fingerprinter: TreeFingerprinter,
+        *,
+        preload: tuple[str, ...] = DEFAULT_PRELOAD,
+        max_workers: int = 4,
+    ) -> None:
+        self.directory = Path(directory)
+        self.fingerprinter = fingerprinter
+        self.preload = preload
+        self.max_workers = max_workers
+        self._workers: OrderedDict[str, _Worker] = OrderedDict()
+        self._starting: dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._workers)
+
+    def spawner(self, project_path: str) -> Spawner:
+        """A Spawner for commands in project_path: warm when eligible, otherwise a plain subprocess."""
+
+        async def spawn(
+            command: list[str], cwd: str | None, env: dict[str, str] | None, limits: ResourceLimits | None
+        ) -> Spawned:
+            warm = warm_command(command, env)
+            if warm is not None:
+                env = dict(env if env is not None else os.environ)
+                try:
+                    worker = await self._worker(project_path, warm.interpreter, env)
+                    spawned = await self._fork(worker, warm, cwd or project_path, env, limits)
+                    WARM_EXECUTIONS.labels(outcome="warm").inc()
+                    return spawned
+                except (OSError, ValueError, KeyError, asyncio.TimeoutError):
+                    pass  # e.g. the worker died or failed to start; the run itself still happens, cold
+            WARM_EXECUTIONS.labels(outcome="cold").inc()
+            return await subprocess_spawner(command, cwd, env, limits)
+
+        return spawn
+
+    async def _worker(self, project_path: str, interpreter: str, env: dict[str, str]) -> _Worker:
+        root = os.path.realpath(project_path)
+        # Forks get the run's whole environment; only what shapes interpreter startup
+        # (PYTHONPATH, PYTHONHASHSEED, ...) needs a worker of its own.
+        startup = {k: v for k, v in env.items() if k.startswith("PYTHON")}
+        key = hashlib.sha256(json.dumps([root, interpreter, startup], sort_keys=True).encode()).hexdigest()
+        fingerprint = await asyncio.to_thread(self.fingerprinter.fingerprint, root)
+        worker = self._workers.get(key)
+        if worker is not None and (worker.fingerprint != fingerprint or worker.proc.poll() is not None):
+            del self._workers[key]
+            worker.retire()
+            worker = None
+        if worker is not None:
+            self._workers.move_to_end(key)
+            return worker
+        task = self._starting.get(key)
+        if task is None:
+            task = self._starting[key] = asyncio.create_task(self._start(root, interpreter, env, fingerprint))
+            task.add_done_callback(lambda _: self._starting.pop(key, None))
+        worker = await asyncio.shield(task)
+        if self._workers.get(key) is not worker:
+            self._workers[key] = worker
+            while len(self._workers) > self.max_workers:
+                _, oldest = self._workers.popitem(last=False)
+                oldest.retire()
+        return worker
+
+    async def _start(self, root: str, interpreter: str, env: dict[str, str], fingerprint: str) -> _Worker:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        socket_path = str(self.directory / f"{uuid.uuid4().hex[:16]}.sock")
+        proc = subprocess.Popen(
+            [interpreter, WORKER, socket_path, *self.preload],
+            cwd=root,
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        worker = _Worker(proc, socket_path, fingerprint)
+
+        def ready() -> bool:
+            # Preloaded modules may print while importing; the worker announces itself last.
+            return any(line == b"ready\n" for line in iter(proc.stdout.readline, b""))
+
+        try:
+            if not await asyncio.wait_for(asyncio.to_thread(ready), READY_TIMEOUT_SECONDS):
+                raise OSError(f"warm worker for {root} exited during startup")
+        except BaseException:
+            proc.kill()
+            worker.retire()
+            raise
+        WARM_WORKERS_STARTED.inc()
+        return worker
+
+    async def _fork(
+        self, worker: _Worker, warm: WarmCommand, cwd: str, env: dict[str, str], limits: ResourceLimits | None
+    ) -> Spawned:
+        loop = asyncio.get_running_loop()
+        request = {
+            "mode": warm.mode,
+            "target": warm.target,
+            "argv": warm.argv,
+            "path0": warm.path0,
+            "cwd": os.path.abspath(cwd),
+            "env": env,
+            "limits": asdict(limits) if limits is not None else None,
+        }
+        payload = json.dumps(request).encode() + b"\n"
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.setblocking(False)
+            await loop.sock_connect(sock, worker.socket_path)
+            sent = socket.send_fds(sock, [payload], [out_w, err_w])
+            await loop.sock_sendall(sock, payload[sent:])
+            reader, writer = await asyncio.open_unix_connection(sock=sock)
+            pid = json.loads(await reader.readline())["pid"]
+        except BaseException:
+            sock.close()
+            os.close(out_r)
+            os.close(err_r)
+            raise
+        finally:
+            os.close(out_w)
+            os.close(err_w)
+
+        async def exited() -> Exit:
+            try:
+                line = await reader.readline()
+            finally:
+                writer.close()
+            if not line:
+                raise ChildProcessError(f"warm worker lost track of process {pid}")
+            status = json.loads(line)
+            return (
+                status["exit_code"],
+                status["cpu_user_seconds"],
+                status["cpu_system_seconds"],
+                status["max_rss_bytes"],
+            )
+
+        return Spawned(pid, open(out_r, "rb", buffering=0), open(err_r, "rb", buffering=0), asyncio.ensure_future(exited()))
+
+    def close(self) -> None:
+        """Retire every worker (e.g. on shutdown)."""
+        for worker in self._workers.values():
+            worker.retire()
+        self._workers.clear()
@@ -0,0 +1,223 @@
+"""Warm Python worker ("zygote") for the Runner's warm pool; see runner.warm.
+
+Run as `python warm_worker.py SOCKET_PATH [MODULE ...]` with the project's
+interpreter, directory and environment. It imports the given modules once,
+prints "ready", then serves one JSON request per connection on a Unix
+socket: the request carries the command and, as SCM_RIGHTS, the write ends
+of its stdout and stderr pipes. For each request the worker forks a child
+that runs the command in-process, replies {"pid": ...} and, once the child
+exited, {"exit_code", "cpu_user_seconds", "cpu_system_seconds",
+"max_rss_bytes"}. The worker exits when its stdin is closed and its last
+child is done.
+
+Standalone on purpose: it runs under the project's Python, which need not
+have the Runner's packages installed.
+"""
+
+import builtins
+import json
+import os
+import resource
+import runpy
+import selectors
+import signal
+import socket
+import sys
+import traceback
+import types
+
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+LIMITS = {
+    "memory_bytes": resource.RLIMIT_AS,
+    "cpu_seconds": resource.RLIMIT_CPU,
+    "open_files": resource.RLIMIT_NOFILE,
+}
+
+
+def _read_request(conn):
+    data, fds, _, _ = socket.recv_fds(conn, 64 * 1024, 2)
+    while not data.endswith(b"\n") and len(data) < MAX_REQUEST_BYTES:
+        chunk = conn.recv(64 * 1024)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data), fds
+
+
+def _send(conn, message):
+    try:
+        conn.sendall(json.dumps(message).encode() + b"\n")
+    except OSError:
+        pass  # the Runner gave up on this run
+
+
+def _apply_limits(limits):
+    for name, value in (limits or {}).items():
+        if value and name in LIMITS:
+            _, hard = resource.getrlimit(LIMITS[name])
+            if hard != resource.RLIM_INFINITY:
+                value = min(value, hard)
+            resource.setrlimit(LIMITS[name], (value, hard))
+
+
+def _run(request):
+    """Run the command in this (forked) process; returns its exit code."""
+    sys.argv = request["argv"]
+    # sys.path[0] as the interpreter would set it: the cwd for -m, "" for -c, the script's directory
+    if request.get("path0") is not None:
+        sys.path[0] = request["path0"]
+    elif request["mode"] == "module":
+        sys.path[0] = os.getcwd()
+    elif request["mode"] == "code":
+        sys.path[0] = ""
+    else:
+        sys.path[0] = os.path.dirname(os.path.abspath(request["target"]))
+    try:
+        if request["mode"] == "module":
+            runpy.run_module(request["target"], run_name="__main__", alter_sys=True)
+        elif request["mode"] == "code":
+            main = types.ModuleType("__main__")
+            main.__builtins__ = builtins
+            sys.modules["__main__"] = main
+            exec(compile(request["target"], "<string>", "exec"), main.__dict__)
+        else:
+            runpy.run_path(request["target"], run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+def _child(request, fds, closing, closing_fds):
+    """Become the command: own process group, limits, stdio, cwd and env; never returns."""
+    code = 1
+    try:
+        os.setpgid(0, 0)  # its own process group, so the Runner can kill everything it starts
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        for f in closing:
+            f.close()
+        for fd in closing_fds:
+            os.close(fd)
+        _apply_limits(request.get("limits"))
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(fds[0], 1)
+        os.dup2(fds[1], 2)
+        for fd in (devnull, *fds):
+            os.close(fd)
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        code = _run(request)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code & 0xFF)
+
+
+def _warm_pytest():
+    """Run pytest once over an empty directory so its plugins are imported (and assertion-rewritten) here.
+
+    Forks then find them in sys.modules, loaded by pytest's rewrite hook, so
+    pytest neither re-imports them nor warns that they were imported early.
+    """
+    import contextlib
+    import io
+    import tempfile
+
+    import pytest
+
+    with tempfile.TemporaryDirectory() as empty, contextlib.redirect_stdout(io.StringIO()):
+        pytest.main(["--collect-only", "-q", "-p", "no:cacheprovider", f"--rootdir={empty}", empty])
+
+
+def main():
+    path, preload = sys.argv[1], sys.argv[2:]
+    sys.path[0] = os.getcwd()  # the project, not this file's directory
+    for name in preload:
+        try:
+            __import__(name)
+        except Exception:
+            pass  # a module the project does not have only costs the warm-up
+    if "pytest" in sys.modules:
+        try:
+            _warm_pytest()
+        except Exception:
+            pass
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(64)
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    signal.signal(signal.SIGCHLD, lambda *_: None)
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ, "accept")
+    selector.register(wakeup_r, selectors.EVENT_READ, "reap")
+    selector.register(sys.stdin, selectors.EVENT_READ, "stdin")
+    children = {}  # pid -> connection
+    sys.stdout.write("ready\n")
+    sys.stdout.flush()
+    stopping = False
+    while not stopping or children:
+        for key, _ in selector.select():
+            if key.data == "stdin":
+                if not os.read(sys.stdin.fileno(), 4096):
+                    stopping = True
+                    selector.unregister(sys.stdin)
+                    selector.unregister(listener)
+                    listener.close()
+            elif key.data == "reap":
+                os.read(wakeup_r, 4096)
+                while children:
+                    pid, status, usage = os.wait4(-1, os.WNOHANG)
+                    if pid == 0:
+                        break
+                    conn = children.pop(pid, None)
+                    if conn is not None:
+                        _send(
+                            conn,
+                            {
+                                "exit_code": os.waitstatus_to_exitcode(status),
+                                "cpu_user_seconds": usage.ru_utime,
+                                "cpu_system_seconds": usage.ru_stime,
+                                "max_rss_bytes": usage.ru_maxrss * 1024,
+                            },
+                        )
+                        conn.close()
+            elif not stopping:
+                conn, _ = listener.accept()
+                try:
+                    request, fds = _read_request(conn)
+                except (OSError, ValueError):
+                    conn.close()
+                    continue
+                sys.stdout.flush()
+                sys.stderr.flush()
+                pid = os.fork()
+                if pid == 0:
+                    _child(request, fds, [listener, selector, conn, *children.values()], [wakeup_r, wakeup_w])
+                try:
+                    os.setpgid(pid, pid)  # also done by the child; whichever runs first wins
+                except OSError:
+                    pass
+                for fd in fds:
+                    os.close(fd)
+                children[pid] = conn
+                _send(conn, {"pid": pid})
+
+
+if __name__ == "__main__":
+    main()
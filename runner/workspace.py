@@ -0,0 +1,195 @@
+"""Isolated per-execution workspaces: cheap clones of a project tree.
+
+Concurrent runs in one project directory share its caches and artifacts
+(.pytest_cache, build/, coverage files) and clobber each other. An
+isolated run gets its own clone of the project instead, removed when the
+run ends. Files are cloned copy-on-write (FICLONE reflinks, on btrfs, XFS
+and similar) where the filesystem supports it; elsewhere they are
+hardlinked, or copied if RUNNER_WORKSPACE_FALLBACK=copy. Tool caches are
+left out and environment directories (node_modules, virtualenvs) are
+symlinked rather than cloned.
+
+Hardlinks are only as isolated as the commands are polite: files that are
+created, replaced (write-and-rename) or deleted stay private to the
+clone, but a file modified in place changes the original as well.
+"""
+
+from __future__ import annotations
+
+import errno
+import fcntl
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import structlog
+from prometheus_client import Counter, Histogram
+
+WORKSPACE_FILES = Counter(
+    "runner_workspace_files_total", "Files placed into isolated workspaces, by method.", ["method"]
+)
+WORKSPACE_CLONE_SECONDS = Histogram(
+    "runner_workspace_clone_seconds",
+    "Time to clone a project into an isolated workspace.",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+FICLONE = getattr(fcntl, "FICLONE", 0x40049409)
+# Tool caches each run should start without.
+CACHE_DIRS = frozenset({"__pycache__", ".pytest_cache", ".mypy_cache", ".ruff_cache", ".hypothesis"})
+# Installed environments: shared read-mostly, so linked rather than cloned file by file.
+SHARED_DIRS = frozenset({"node_modules", ".venv", "venv", ".tox", ".nox"})
+FALLBACK_HARDLINK = "hardlink"
+FALLBACK_COPY = "copy"
+# Workspaces left behind (e.g. by a crashed Runner) are removed after this long.
+STALE_SECONDS = 24 * 3600
+
+_NO_REFLINK = (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EXDEV, errno.ENOSYS, errno.EBADF)
+_NO_HARDLINK = (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EACCES)
+
+
+def _reflink(src: str, dst: str) -> None:
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    shutil.copystat(src, dst)
+
+
+def _link_target(path: str, src_root: str) -> str:
+    """Symlink target for the clone: relative targets that leave the tree become absolute."""
+    target = os.readlink(path)
+    if os.path.isabs(target):
+        return target
+    resolved = os.path.realpath(os.path.join(os.path.dirname(path), target))
+    return target if os.path.commonpath([resolved, src_root]) == src_root else resolved
+
+
+def clone_tree(src: str, dst: str, *, fallback: str = FALLBACK_HARDLINK, skip: tuple[str, ...] = ()) -> dict[str, int]:
+    """Clone the tree at src into the new directory dst; returns file counts by method (blocking I/O).
+
+    skip lists real paths of directories to leave out (e.g. the workspace directory itself).
+    """
+    src = os.path.realpath(src)
+    counts = {"reflink": 0, "hardlink": 0, "copy": 0, "symlink": 0}
+    try_reflink = True
+    os.makedirs(dst)
+    shutil.copymode(src, dst)
+    for dirpath, dirnames, filenames in os.walk(src):
+        target_dir = os.path.join(dst, os.path.relpath(dirpath, src))
+        kept = []
+        for name in dirnames:
+            path = os.path.join(dirpath, name)
+            if name in CACHE_DIRS or os.path.realpath(path) in skip:
+                continue
+            if os.path.islink(path):
+                os.symlink(_link_target(path, src), os.path.join(target_dir, name))
+            elif name in SHARED_DIRS:
+                os.symlink(path, os.path.join(target_dir, name))
+            else:
+                os.mkdir(os.path.join(target_dir, name))
+                shutil.copymode(path, os.path.join(target_dir, name))
+                kept.append(name)
+                continue
+            counts["symlink"] += 1
+        dirnames[:] = kept
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            target = os.path.join(target_dir, name)
+            if os.path.islink(path):
+                os.symlink(_link_target(path, src), target)
+                counts["symlink"] += 1
+                continue
+            if not os.path.isfile(path):
+                continue  # sockets, FIFOs
+            if try_reflink:
+                try:
+                    _reflink(path, target)
+                    counts["reflink"] += 1
+                    continue
+                except OSError as e:
+                    if e.errno not in _NO_REFLINK:
+                        raise
+                    try_reflink = False  # the filesystem cannot; stop asking for every file
+                    os.unlink(target)
+            if fallback == FALLBACK_HARDLINK:
+                try:
+                    os.link(path, target)
+                    counts["hardlink"] += 1
+                    continue
+                except OSError as e:
+                    if e.errno not in _NO_HARDLINK:
+                        raise
+            shutil.copy2(path, target)
+            counts["copy"] += 1
+    for method, n in counts.items():
+        WORKSPACE_FILES.labels(method=method).inc(n)
+    return counts
+
+
+class Workspaces:
+    """Isolated clones of projects under directory, one <id>/<project name> per run."""
+
+    def __init__(self, directory: str | Path, fallback: str = FALLBACK_HARDLINK) -> None:
+        self.directory = Path(directory)
+        self.fallback = fallback
+        self._active: set[str] = set()
+        self._lock = threading.Lock()
+        self._warned_hardlink = False
+
+    def create(self, project_path: str) -> tuple[Path, dict[str, int]]:
+        """Clone project_path into a new workspace; returns the clone's root and file counts by method (blocking I/O).
+
+        The first clone that falls back to hardlinks logs a warning, since
+        such runs are only partly isolated (see the module docstring).
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.cleanup()
+        workspace_id = uuid.uuid4().hex
+        with self._lock:
+            self._active.add(workspace_id)
+        root = os.path.realpath(project_path)
+        clone = self.directory / workspace_id / os.path.basename(root)
+        start = time.perf_counter()
+        try:
+            counts = clone_tree(root, str(clone), fallback=self.fallback, skip=(os.path.realpath(self.directory),))
+        except BaseException:
+            self.remove(clone)
+            raise
+        WORKSPACE_CLONE_SECONDS.observe(time.perf_counter() - start)
+        if counts["hardlink"] and not self._warned_hardlink:
+            self._warned_hardlink = True
+            structlog.get_logger().warning(
+                "workspace_hardlinked",
+                directory=str(self.directory),
+                detail="no reflink support; files modified in place by isolated runs also change the project",
+            )
+        return clone, counts
+
+    def remove(self, clone: Path) -> None:
+        """Delete a workspace created by create() (blocking I/O)."""
+        workspace = Path(clone).parent
+        shutil.rmtree(workspace, ignore_errors=True)
+        with self._lock:
+            self._active.discard(workspace.name)
+
+    def cleanup(self) -> int:
+        """Delete workspaces older than STALE_SECONDS that no run of this Runner uses; returns how many."""
+        cutoff = time.time() - STALE_SECONDS
+        removed = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            with self._lock:
+                if entry.name in self._active:
+                    continue
+            try:
+                if entry.is_dir(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
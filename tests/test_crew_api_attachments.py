@@ -0,0 +1,65 @@
+"""Tests for crew_api.attachments: large attachments become relevant excerpts, cached by content hash."""
+
+import math
+
+import chromadb
+from chromadb.api.types import EmbeddingFunction, Documents, Embeddings
+
+from crew_api.attachments import AttachmentIndex, content_hash
+
+
+class KeywordEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Embeds by (normalized) keyword counts and records how many texts it embedded."""
+
+    def __init__(self) -> None:
+        self.embedded = 0
+
+    def name(self) -> str:
+        return "keyword"
+
+    def __call__(self, input: Documents) -> Embeddings:
+        self.embedded += len(input)
+        vectors = [[float(d.count("alpha")), float(d.count("beta")), 1.0] for d in input]
+        return [[x / math.sqrt(sum(v * v for v in vec)) for x in vec] for vec in vectors]
+
+
+def _log(first: str, second: str) -> str:
+    lines = [f"{first} line {i} of the pasted log" for i in range(40)]
+    lines += [f"{second} line {i} of the pasted log" for i in range(40)]
+    return "\n".join(lines)
+
+
+def test_large_attachment_is_replaced_by_relevant_excerpt_and_reused():
+    """Only chunks near the message make the excerpt; a repeated paste is not embedded again."""
+    ef = KeywordEmbeddingFunction()
+    index = AttachmentIndex(
+        client=chromadb.EphemeralClient(), embedding_function=ef, threshold_chars=500, token_budget=260
+    )
+    text = _log("alpha", "beta")
+
+    first = index.prepare([{"name": "big.log", "content": text}, "short note"], "why does beta fail?")
+    embedded_after_first = ef.embedded
+    second = index.prepare([text], "beta again")
+
+    excerpt = first[0]["excerpt"]
+    assert excerpt.startswith("### big.log:41-80\nbeta line 0")
+    assert "alpha" not in excerpt
+    assert first[0]["original_chars"] == len(text)
+    assert first[1] == "short note"
+    assert second[0]["content_hash"] == first[0]["content_hash"]
+    assert ef.embedded == embedded_after_first + 1  # only the query text
+
+
+def test_attachment_index_evicts_least_recently_used_collections():
+    """Beyond maxsize, the oldest attachment's collection is deleted."""
+    client = chromadb.EphemeralClient()
+    index = AttachmentIndex(
+        client=client, embedding_function=KeywordEmbeddingFunction(), threshold_chars=500, maxsize=1
+    )
+    old, new = _log("alpha", "gamma"), _log("beta", "delta")
+    index.prepare([old], "alpha")
+    index.prepare([new], "beta")
+
+    names = {c.name for c in client.list_collections()}
+    assert f"attachment_{content_hash(old)[:40]}" not in names
+    assert f"attachment_{content_hash(new)[:40]}" in names
@@ -4,8 +4,13 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 import httpx
+import chromadb
 
 from crew_api.app import app
+from crew_api.chat import handle_chat
+from ingest.repo_map import repo_map_metadata
+from ingest.run import collection_id_for
+from ingest.vector_store import mark_generation
 
 
 @pytest.mark.asyncio
@@ -31,3 +36,24 @@ async def test_post_chat_returns_200_with_response_string():
     assert "response" in data
     assert isinstance(data["response"], str)
     assert data["response"] == "Here is the explanation."
+
+
+def test_handle_chat_passes_stored_repo_map_to_crew_inputs(tmp_path):
+    """With a project_path and vector client, the project's repo map is in the kickoff inputs."""
+    project = tmp_path / "chat_repo_map_project"
+    project.mkdir()
+    client = chromadb.EphemeralClient()
+    mark_generation(
+        collection_id_for(project),
+        client=client,
+        generation="g1",
+        extra=repo_map_metadata("## Layout\nsrc/ (3 files)", "g1"),
+    )
+    mock_crew = MagicMock()
+    mock_crew.kickoff.return_value = MagicMock(raw="ok")
+
+    with patch("crew_api.chat.create_crew", return_value=mock_crew):
+        handle_chat("where is the entry point?", project_path=str(project), vector_client=client)
+
+    inputs = mock_crew.kickoff.call_args.kwargs["inputs"]
+    assert inputs["repo_map"] == "## Layout\nsrc/ (3 files)"
@@ -1,24 +1,24 @@
 """Tests for the crew API POST /run endpoint (Runner integration)."""
 
+import json
+
 import pytest
 import httpx
+from crew_api import runner_client
 from crew_api.app import app
 from crew_api.config import CrewApiSettings
 
 
 def _make_mock_runner_transport(exit_code: int = 0, stdout: str = "", stderr: str = "", duration_seconds: float = 1.0):
-    """Build a MockTransport that responds to POST /execute with the given Runner payload."""
+    """Build a MockTransport for the Runner jobs API: POST /jobs queues a job, GET /jobs/{id} returns its result."""
+    result = {"exit_code": exit_code, "stdout": stdout, "stderr": stderr, "duration_seconds": duration_seconds}
 
     def handler(request: httpx.Request) -> httpx.Response:
-        if request.url.path == "/execute" and request.method == "POST":
+        if request.url.path == "/jobs" and request.method == "POST":
+            return httpx.Response(202, json={"job_id": "job1", "status": "queued", "created_at": 0.0})
+        if request.url.path == "/jobs/job1" and request.method == "GET":
             return httpx.Response(
-                200,
-                json={
-                    "exit_code": exit_code,
-                    "stdout": stdout,
-                    "stderr": stderr,
-                    "duration_seconds": duration_seconds,
-                },
+                200, json={"job_id": "job1", "status": "completed", "created_at": 0.0, "result": result}
             )
         return httpx.Response(404, json={"detail": "not found"})
 
@@ -57,3 +57,96 @@ async def test_post_run_run_tests_returns_200_with_success_exit_code_summary():
     assert "stderr" in data
     assert "duration_seconds" in data
     assert data["duration_seconds"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_post_run_stream_relays_runner_events_and_adds_summary():
+    """POST /run/stream forwards the run flags, relays Runner NDJSON events and adds success and summary to exit."""
+    submitted = []
+    runner_events = [
+        {"type": "start", "queued_seconds": 0.0},
+        {"type": "stdout", "data": "test_a.py .\n"},
+        {"type": "stdout", "data": "1 passed in 0.01s\n"},
+        {"type": "exit", "exit_code": 0, "duration_seconds": 0.2, "timed_out": False},
+    ]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/execute/stream" and request.method == "POST":
+            submitted.append(json.loads(request.content))
+            body = "".join(json.dumps(e) + "\n" for e in runner_events)
+            return httpx.Response(200, text=body, headers={"content-type": "application/x-ndjson"})
+        return httpx.Response(404, json={"detail": "not found"})
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        await client.get("/health")
+        app.state.settings = CrewApiSettings(runner_url="http://runner:8080")
+        app.state.runner_transport = httpx.MockTransport(handler)
+        response = await client.post(
+            "/run/stream",
+            json={"project_path": "/tmp/proj", "action": "run_tests", "cached_deps": True, "isolated": True},
+        )
+        sharded = await client.post(
+            "/run/stream", json={"project_path": "/tmp/proj", "action": "run_tests", "shards": 2}
+        )
+
+    assert response.status_code == 200
+    assert submitted[0]["cached_deps"] is True and submitted[0]["isolated"] is True
+    assert "affected" not in submitted[0]
+    assert sharded.status_code == 400 and len(submitted) == 1
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[:3] == runner_events[:3]
+    assert events[-1]["exit_code"] == 0
+    assert events[-1]["success"] is True
+    assert events[-1]["summary"] == "1 passed in 0.01s"
+
+
+@pytest.mark.asyncio
+async def test_post_run_affected_tests_asks_runner_for_affected_selection():
+    """POST /run with action run_affected_tests submits pytest with affected=true and returns the selection."""
+    submitted = []
+    selection = {"mode": "affected", "reason": "1 test modules import the changed files", "test_files": ["tests/test_a.py"]}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/jobs" and request.method == "POST":
+            submitted.append(json.loads(request.content))
+            return httpx.Response(202, json={"job_id": "job1", "status": "queued", "created_at": 0.0})
+        if request.url.path == "/jobs/job1":
+            result = {"exit_code": 0, "stdout": "1 passed", "stderr": "", "duration_seconds": 0.1, "selection": selection}
+            return httpx.Response(200, json={"job_id": "job1", "status": "completed", "created_at": 0.0, "result": result})
+        return httpx.Response(404, json={"detail": "not found"})
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        await client.get("/health")
+        app.state.settings = CrewApiSettings(runner_url="http://runner:8080")
+        app.state.runner_transport = httpx.MockTransport(handler)
+        response = await client.post("/run", json={"project_path": "/tmp/proj", "action": "run_affected_tests"})
+
+    assert submitted[0]["command"] == ["pytest"]
+    assert submitted[0]["affected"] is True
+    assert response.json()["selection"] == selection
+
+
+@pytest.mark.asyncio
+async def test_execute_stream_retries_connect_errors_but_not_timeouts():
+    """A stream that may have started the command (read timeout) is not sent again; a refused connection is."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if len(calls) == 1:
+            raise httpx.ConnectError("refused", request=request)
+        if len(calls) == 2:
+            return httpx.Response(200, text=json.dumps({"type": "exit", "exit_code": 0}) + "\n")
+        raise httpx.ReadTimeout("no first event", request=request)
+
+    def stream():
+        return runner_client.execute_stream(
+            "/tmp/proj", ["pytest"], runner_url="http://runner:8080", transport=httpx.MockTransport(handler)
+        )
+
+    assert [e async for e in stream()] == [{"type": "exit", "exit_code": 0}]
+    with pytest.raises(httpx.ReadTimeout):
+        [e async for e in stream()]
+    assert len(calls) == 3
@@ -2,7 +2,7 @@
 
 import pytest
 
-from ingest.chunk import chunk_file, chunk_directory
+from ingest.chunk import chunk_file, chunk_directory, file_attributes
 
 
 def test_chunk_file_returns_chunks_with_path_metadata(tmp_path):
@@ -62,3 +62,29 @@ def test_chunk_directory_returns_chunks_with_path_metadata(tmp_path):
         c[0] if isinstance(c, tuple) else c["text"] for c in chunks
     )
     assert "x = 1" in all_text or "foo" in all_text
+
+
+def test_file_attributes_classify_language_package_kind_and_dir_prefixes():
+    """file_attributes derives filterable metadata from a project-relative path."""
+    attrs = file_attributes("runner/sub/app.py")
+    assert attrs["rel_path"] == "runner/sub/app.py"
+    assert attrs["language"] == "python"
+    assert attrs["package"] == "runner"
+    assert attrs["kind"] == "source"
+    assert attrs["dir1"] == "runner" and attrs["dir2"] == "runner/sub"
+    assert "dir3" not in attrs
+    assert file_attributes("tests/test_runner.py")["kind"] == "test"
+    assert file_attributes("docs/CONFIG.md")["kind"] == "doc"
+    assert file_attributes("setup.py")["package"] == ""
+
+
+def test_chunk_directory_records_relative_path_attributes(tmp_path):
+    """chunk_directory adds rel_path, package and kind relative to the walked root."""
+    (tmp_path / "runner").mkdir()
+    (tmp_path / "runner" / "app.py").write_text("x = 1\n")
+    chunks = chunk_directory(tmp_path)
+    assert len(chunks) == 1
+    meta = chunks[0][1]
+    assert meta["rel_path"] == "runner/app.py"
+    assert meta["package"] == "runner"
+    assert meta["kind"] == "source"
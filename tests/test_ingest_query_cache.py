@@ -0,0 +1,127 @@
+"""Tests for ingest.query_cache and cached vector_store.query."""
+
+import pytest
+import chromadb
+from chromadb.api.types import EmbeddingFunction, Documents, Embeddings
+from chromadb.utils.embedding_functions import register_embedding_function
+
+from ingest.query_cache import LRUTTLCache, QueryCache
+from ingest.vector_store import _collection_embedding_function, mark_generation, query, upsert
+
+
+class CountingEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Deterministic 384-dim embedder that counts how many texts it embedded."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def name(self) -> str:
+        return "counting"
+
+    def __call__(self, input: Documents) -> Embeddings:
+        self.calls += len(input)
+        return [[hash(d) % 1000 / 1000.0] * 384 for d in input]
+
+
+@register_embedding_function
+class PersistedEmbeddingFunction(CountingEmbeddingFunction):
+    """Counting embedder Chroma stores in the collection configuration (calls counted on the class)."""
+
+    calls = 0
+
+    def __init__(self) -> None:
+        pass
+
+    @staticmethod
+    def name() -> str:
+        return "test-persisted-counting"
+
+    def __call__(self, input: Documents) -> Embeddings:
+        PersistedEmbeddingFunction.calls += len(input)
+        return [[hash(d) % 1000 / 1000.0] * 384 for d in input]
+
+    def get_config(self) -> dict:
+        return {}
+
+    @staticmethod
+    def build_from_config(config: dict) -> "PersistedEmbeddingFunction":
+        return PersistedEmbeddingFunction()
+
+
+@pytest.fixture
+def chroma_client():
+    """In-memory Chroma client for tests."""
+    return chromadb.EphemeralClient()
+
+
+def test_lru_ttl_cache_evicts_lru_and_expires_entries():
+    """Least recently used entry is evicted at maxsize; entries expire after ttl."""
+    now = [0.0]
+    cache = LRUTTLCache(2, ttl_seconds=10.0, name="test", clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # a is now most recent
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    now[0] = 11.0
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 2
+    assert stats["hit_rate"] == 0.5
+
+
+def test_cached_query_reuses_results_and_embeddings(chroma_client):
+    """Repeated (whitespace-variant) queries hit the result cache; embeddings are computed once."""
+    collection_id = "test_cache_reuse"
+    ef = CountingEmbeddingFunction()
+    upsert(collection_id, ["alpha chunk", "beta chunk"], client=chroma_client, embedding_function=ef)
+    cache = QueryCache()
+    ef.calls = 0
+
+    first = query(collection_id, "find alpha", n_results=2, client=chroma_client, embedding_function=ef, cache=cache)
+    second = query(collection_id, "  find   alpha ", n_results=2, client=chroma_client, embedding_function=ef, cache=cache)
+    query(collection_id, "find alpha", n_results=1, client=chroma_client, embedding_function=ef, cache=cache)
+
+    assert second is first
+    assert ef.calls == 1  # k=1 missed the result cache but reused the embedding
+    assert cache.stats()["result"]["hits"] == 1
+    assert cache.stats()["embedding"]["hits"] == 1
+
+
+def test_cached_query_without_embedding_function_embeds_with_the_collections_own(chroma_client):
+    """Callers that pass no embedding_function (RAGTool) still get query embeddings cached.
+
+    Collections without a persisted embedding function (older chromadb) are queried by text.
+    """
+    collection_id = "test_cache_collection_ef"
+    ef = PersistedEmbeddingFunction()
+    upsert(collection_id, ["alpha chunk", "beta chunk"], client=chroma_client, embedding_function=ef)
+    cache = QueryCache()
+    PersistedEmbeddingFunction.calls = 0
+
+    first = query(collection_id, "find alpha", n_results=2, client=chroma_client, cache=cache)
+    query(collection_id, "find alpha", n_results=1, client=chroma_client, cache=cache)
+
+    assert len(first["ids"][0]) == 2
+    assert PersistedEmbeddingFunction.calls == 1
+    assert cache.stats()["embedding"]["hits"] == 1
+    assert _collection_embedding_function(object()) is None
+
+
+def test_new_index_generation_invalidates_cached_results(chroma_client):
+    """After ingest marks a new generation, the same query goes back to Chroma."""
+    collection_id = "test_cache_generation"
+    ef = CountingEmbeddingFunction()
+    upsert(collection_id, ["old chunk"], client=chroma_client, embedding_function=ef)
+    mark_generation(collection_id, client=chroma_client)
+    cache = QueryCache()
+
+    before = query(collection_id, "chunk", n_results=5, client=chroma_client, embedding_function=ef, cache=cache)
+    chroma_client.get_collection(collection_id).add(ids=["new"], documents=["new chunk"], embeddings=[[0.5] * 384])
+    mark_generation(collection_id, client=chroma_client)
+    after = query(collection_id, "chunk", n_results=5, client=chroma_client, embedding_function=ef, cache=cache)
+
+    assert before["documents"][0] == ["old chunk"]
+    assert "new chunk" in after["documents"][0]
+    assert cache.invalidate_collection(collection_id) == 2
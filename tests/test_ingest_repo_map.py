@@ -0,0 +1,63 @@
+"""Tests for ingest.repo_map: map built at ingest and stored per index generation."""
+
+import pytest
+import chromadb
+
+from ingest.repo_map import build_repo_map, get_repo_map
+from ingest.run import run_ingest
+from ingest.vector_store import mark_generation
+
+
+def _mock_embed(texts: list[str]) -> list[list[float]]:
+    return [[0.1] * 384 for _ in texts]
+
+
+@pytest.fixture
+def chroma_client():
+    """In-memory Chroma client for tests."""
+    return chromadb.EphemeralClient()
+
+
+@pytest.fixture
+def project(tmp_path):
+    """Package with a widely imported module, a CLI entry point, private helpers and tests."""
+    files = {
+        "pkg/__init__.py": "",
+        "pkg/core.py": "class Engine:\n    pass\n\ndef run():\n    pass\n\ndef _helper():\n    pass\n",
+        "pkg/cli.py": "from .core import run\n\nif __name__ == '__main__':\n    run()\n",
+        "pkg/util.py": "from pkg.core import Engine\n\ndef make():\n    return Engine()\n",
+        "tests/test_core.py": "def test_run():\n    pass\n",
+        ".venv/lib/site.py": "def hidden():\n    pass\n",
+        "pyproject.toml": '[project]\nname = "pkg"\n[project.scripts]\npkg = "pkg.cli:main"\n',
+    }
+    for rel, text in files.items():
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text(text)
+    return tmp_path
+
+
+def test_build_repo_map_lists_layout_entry_points_and_ranked_public_symbols(project):
+    """Most-imported modules come first with public symbols only; hidden dirs and tests are left out."""
+    repo_map = build_repo_map(project)
+
+    assert "pkg/ (4 files)" in repo_map
+    assert "pkg -> pkg.cli:main" in repo_map
+    assert "python -m pkg.cli" in repo_map
+    key_modules = repo_map.split("## Key modules\n")[1].splitlines()
+    assert key_modules[0] == "pkg/core.py: class Engine, run()"
+    assert "_helper" not in repo_map
+    assert ".venv" not in repo_map and "hidden" not in repo_map
+    assert "test_run" not in repo_map
+    assert len(build_repo_map(project, token_budget=20)) <= 20 * 4
+
+
+def test_run_ingest_stores_repo_map_for_current_generation_only(project, chroma_client):
+    """get_repo_map returns the map written with the generation, and None once a newer generation lacks one."""
+    collection_id = "test_repo_map_coll"
+    run_ingest(project, collection_id, client=chroma_client, embed_func=_mock_embed)
+
+    assert get_repo_map(collection_id, client=chroma_client) == build_repo_map(project)
+    assert get_repo_map("test_repo_map_missing", client=chroma_client) is None
+
+    mark_generation(collection_id, client=chroma_client)
+    assert get_repo_map(collection_id, client=chroma_client) is None
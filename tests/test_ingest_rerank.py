@@ -0,0 +1,110 @@
+"""Tests for ingest.rerank: MMR diversity reranking, score cutoffs and their vector_store.query stages."""
+
+import numpy as np
+import pytest
+import chromadb
+from chromadb.api.types import EmbeddingFunction, Documents, Embeddings
+
+from ingest.rerank import apply_cutoff, mmr
+from ingest.vector_store import query, upsert
+
+_VECTORS = {
+    "query": [1.0, 0.0, 0.0],
+    "dup one": [0.99, 0.14, 0.0],
+    "dup two": [0.99, 0.14, 0.01],
+    "dup three": [0.98, 0.2, 0.0],
+    "different": [0.7, 0.0, 0.71],
+}
+
+
+class TableEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Embeds from a fixed table so similarities are known."""
+
+    def __init__(self) -> None:
+        pass
+
+    def name(self) -> str:
+        return "table"
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return [_VECTORS[d] for d in input]
+
+
+@pytest.fixture
+def chroma_client():
+    """In-memory Chroma client for tests."""
+    return chromadb.EphemeralClient()
+
+
+def test_mmr_prefers_diverse_candidate_over_near_duplicate():
+    """With equal-ish relevance, the second pick is the dissimilar candidate, not the duplicate."""
+    emb = np.array([[1.0, 0.0], [0.999, 0.04], [0.6, 0.8]])
+    relevance = np.array([0.95, 0.94, 0.80])
+    assert mmr(relevance, emb, k=2, lambda_mult=0.5) == [0, 2]
+    assert mmr(relevance, emb, k=2, lambda_mult=1.0) == [0, 1]
+    assert mmr(relevance, emb, k=10) == [0, 2, 1]
+
+
+def test_query_with_mmr_lambda_overfetches_and_diversifies(chroma_client):
+    """query(mmr_lambda=...) returns n_results hits that skip near-duplicate windows."""
+    collection_id = "test_rerank_mmr"
+    ef = TableEmbeddingFunction()
+    upsert(collection_id, ["dup one", "dup two", "dup three", "different"], client=chroma_client, embedding_function=ef)
+
+    plain = query(collection_id, "query", n_results=2, client=chroma_client, embedding_function=ef)
+    diverse = query(
+        collection_id,
+        "query",
+        n_results=2,
+        client=chroma_client,
+        embedding_function=ef,
+        mmr_lambda=0.5,
+        fetch_k=4,
+    )
+
+    assert "different" not in plain["documents"][0]
+    assert diverse["documents"][0][1] == "different"
+    assert len(diverse["ids"][0]) == 2
+    assert diverse["embeddings"] is None
+
+
+def test_apply_cutoff_keeps_hits_near_the_best_and_never_empties():
+    """Hits below the absolute or relative threshold are dropped; the best hit always survives."""
+    row = {"ids": [["a", "b", "c"]], "documents": [["A", "B", "C"]], "distances": [[0.2, 0.3, 1.2]]}
+    # similarities: 0.9, 0.85, 0.4
+    assert apply_cutoff(row, adaptive_ratio=0.9)["ids"] == [["a", "b"]]
+    assert apply_cutoff(row, min_similarity=0.88)["documents"] == [["A"]]
+    assert apply_cutoff(row, min_similarity=0.95)["ids"] == [["a"]]
+    assert apply_cutoff(row) is row
+
+    # similarities: 0.9, 0.89, 0.88, 0.6, 0.59 -- all above half the best, but with a drop-off after three
+    dropping = {"ids": [list("abcde")], "distances": [[0.2, 0.22, 0.24, 0.8, 0.82]]}
+    assert apply_cutoff(dropping, adaptive_ratio=0.5)["ids"] == [["a", "b", "c"]]
+
+
+def test_query_adaptive_ratio_sizes_results_by_score(chroma_client):
+    """With adaptive_ratio the distant hit is dropped, and up to max_results close hits are returned."""
+    collection_id = "test_rerank_adaptive"
+    ef = TableEmbeddingFunction()
+    upsert(collection_id, ["dup one", "dup three", "different"], client=chroma_client, embedding_function=ef)
+
+    plain = query(collection_id, "query", n_results=3, client=chroma_client, embedding_function=ef)
+    adaptive = query(
+        collection_id, "query", n_results=3, client=chroma_client, embedding_function=ef, adaptive_ratio=0.9
+    )
+
+    assert len(plain["ids"][0]) == 3
+    assert adaptive["documents"][0] == ["dup one", "dup three"]
+    assert len(adaptive["distances"][0]) == 2
+
+    upsert("test_rerank_adaptive_broad", list(_VECTORS)[1:], client=chroma_client, embedding_function=ef)
+    broad = query(
+        "test_rerank_adaptive_broad",
+        "query",
+        n_results=1,
+        client=chroma_client,
+        embedding_function=ef,
+        adaptive_ratio=0.9,
+        max_results=4,
+    )
+    assert sorted(broad["documents"][0]) == ["dup one", "dup three", "dup two"]
@@ -2,9 +2,13 @@
 
 import pytest
 import chromadb
+from structlog.testing import capture_logs
 
 from ingest.chunk import chunk_directory
-from ingest.run import run_ingest
+from ingest.embed import DEFAULT_BASE_URL
+from ingest.run import _embedding_function_for, run_ingest
+from ingest.shards import group_by_shard, read_manifest, shard_collection_name
+from ingest.vector_store import query
 
 
 def _mock_embed(texts: list[str]) -> list[list[float]]:
@@ -43,3 +47,70 @@ def test_run_ingest_indexes_chunks_into_vector_store(sample_project, chroma_clie
 
     coll = chroma_client.get_collection(name=collection_id)
     assert coll.count() == expected_count
+
+
+def _distinct_embed(texts: list[str]) -> list[list[float]]:
+    """Mock embed with per-text vectors so distances differ."""
+    return [[(hash(t) % 997) / 997.0] + [0.1] * 383 for t in texts]
+
+
+@pytest.fixture
+def multi_package_project(tmp_path):
+    """Project with two top-level packages and a root-level file."""
+    for rel in ("runner/app.py", "runner/config.py", "crew_api/app.py", "setup.py"):
+        f = tmp_path / rel
+        f.parent.mkdir(parents=True, exist_ok=True)
+        f.write_text(f"# {rel}\nvalue = 1\n")
+    return tmp_path
+
+
+def test_run_ingest_shard_by_dir_writes_shards_and_queries_fan_out(multi_package_project, chroma_client):
+    """shard_by='dir' writes one collection per top-level dir; queries merge shards and prune by path_prefix."""
+    collection_id = "test_sharded_dir"
+    run_ingest(multi_package_project, collection_id, client=chroma_client, embed_func=_distinct_embed, shard_by="dir")
+
+    strategy, shards = read_manifest(chroma_client.get_collection(collection_id))
+    assert strategy == "dir"
+    assert sorted(shards) == ["crew_api", "root", "runner"]
+    assert chroma_client.get_collection(shards["runner"]).count() == 2
+    assert chroma_client.get_collection(collection_id).count() == 0
+
+    ef = _embedding_function_for(_distinct_embed, DEFAULT_BASE_URL)
+    everything = query(collection_id, "value", n_results=10, client=chroma_client, embedding_function=ef)
+    distances = everything["distances"][0]
+    assert len(everything["ids"][0]) == len(set(everything["ids"][0])) == 4
+    assert distances == sorted(distances)
+
+    scoped = query(collection_id, "value", n_results=10, client=chroma_client, embedding_function=ef, path_prefix="runner/")
+    assert sorted(m["rel_path"] for m in scoped["metadatas"][0]) == ["runner/app.py", "runner/config.py"]
+
+
+def test_run_ingest_hash_shards_can_be_written_independently(multi_package_project, chroma_client):
+    """only_shards writes a subset; the manifest still lists every shard of the plan."""
+    collection_id = "test_sharded_hash"
+    groups = group_by_shard(chunk_directory(multi_package_project), "hash", 4)
+    first = sorted(groups)[0]
+    run_ingest(
+        multi_package_project,
+        collection_id,
+        client=chroma_client,
+        embed_func=_mock_embed,
+        shard_by="hash",
+        num_shards=4,
+        only_shards={first},
+    )
+
+    _, shards = read_manifest(chroma_client.get_collection(collection_id))
+    assert sorted(shards) == sorted(groups)
+    written = {c.name for c in chroma_client.list_collections()}
+    assert shard_collection_name(collection_id, first) in written
+    for key in set(groups) - {first}:
+        assert shard_collection_name(collection_id, key) not in written
+
+    # Queried before the other jobs ran: unwritten shards are empty, and are not created by the query.
+    ef = _embedding_function_for(_mock_embed, DEFAULT_BASE_URL)
+    with capture_logs() as logs:
+        result = query(collection_id, "value", n_results=10, client=chroma_client, embedding_function=ef)
+    assert len(result["ids"][0]) == len(groups[first])
+    assert {c.name for c in chroma_client.list_collections()} == written
+    assert sum(e["event"] == "shard_collection_missing" for e in logs) == len(groups) - 1
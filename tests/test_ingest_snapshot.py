@@ -0,0 +1,63 @@
+"""Tests for ingest.snapshot: export a project index to one file and restore it without re-embedding."""
+
+import pytest
+import chromadb
+
+from ingest.embed import DEFAULT_BASE_URL
+from ingest.run import _embedding_function_for, run_ingest
+from ingest.snapshot import ALIGNMENT, export_snapshot, import_snapshot, read_header
+from ingest.vector_store import GENERATION_KEY, query
+
+
+def _distinct_embed(texts: list[str]) -> list[list[float]]:
+    return [[(hash(t) % 997) / 997.0] + [0.1] * 15 for t in texts]
+
+
+def _failing_embed(texts: list[str]) -> list[list[float]]:
+    raise AssertionError("import must not re-embed documents")
+
+
+@pytest.fixture
+def chroma_client():
+    """In-memory Chroma client for tests."""
+    return chromadb.EphemeralClient()
+
+
+@pytest.fixture
+def sharded_index(tmp_path, chroma_client):
+    """A dir-sharded project index; returns its collection id."""
+    project = tmp_path / "project"
+    for rel in ("runner/app.py", "crew_api/app.py", "setup.py"):
+        f = project / rel
+        f.parent.mkdir(parents=True, exist_ok=True)
+        f.write_text(f"# {rel}\nvalue = 1\n")
+    collection_id = "test_snapshot_coll"
+    run_ingest(project, collection_id, client=chroma_client, embed_func=_distinct_embed, shard_by="dir")
+    return collection_id
+
+
+def test_snapshot_round_trip_restores_shards_generation_and_results(sharded_index, chroma_client, tmp_path):
+    """After deleting the index, import restores identical query results using only stored vectors."""
+    ef = _embedding_function_for(_distinct_embed, DEFAULT_BASE_URL)
+    before = query(sharded_index, "value", n_results=10, client=chroma_client, embedding_function=ef)
+    generation = chroma_client.get_collection(sharded_index).metadata[GENERATION_KEY]
+    path = tmp_path / "index.snap"
+
+    header = export_snapshot(sharded_index, path, client=chroma_client)
+    for entry in header["collections"]:
+        chroma_client.delete_collection(entry["name"])
+    names = import_snapshot(path, client=chroma_client, embedding_function=_embedding_function_for(_failing_embed))
+
+    assert names[0] == sharded_index and len(names) == 4
+    assert all(entry["vectors_offset"] % ALIGNMENT == 0 for entry in read_header(path)["collections"])
+    assert chroma_client.get_collection(sharded_index).metadata[GENERATION_KEY] == generation
+    after = query(sharded_index, "value", n_results=10, client=chroma_client, embedding_function=ef)
+    assert after["ids"] == before["ids"]
+    assert after["documents"] == before["documents"]
+
+
+def test_import_rejects_files_that_are_not_snapshots(tmp_path, chroma_client):
+    bogus = tmp_path / "bogus.snap"
+    bogus.write_bytes(b"not a snapshot at all")
+    with pytest.raises(ValueError, match="not an index snapshot"):
+        import_snapshot(bogus, client=chroma_client)
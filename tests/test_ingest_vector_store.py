@@ -4,7 +4,8 @@ import pytest
 import chromadb
 from chromadb.api.types import EmbeddingFunction, Documents, Embeddings
 
-from ingest.vector_store import upsert, query
+from ingest.chunk import chunk_directory
+from ingest.vector_store import attribute_filter, upsert, query, query_many
 
 
 class FakeEmbeddingFunction(EmbeddingFunction[Documents]):
@@ -86,3 +87,60 @@ def test_upsert_without_metadatas_and_query_by_content(chroma_client, fake_embed
     all_text = " ".join(t for t in flat if t)
     assert "Hello world" in all_text
     assert "Goodbye world" in all_text
+
+
+def test_query_many_embeds_in_one_batch_and_groups_results_per_query(chroma_client):
+    """query_many sends all queries in one call and returns one single-row result per query."""
+    calls: list[list[str]] = []
+
+    class RecordingEmbeddingFunction(FakeEmbeddingFunction):
+        def __call__(self, input: Documents) -> Embeddings:
+            calls.append(list(input))
+            return super().__call__(input)
+
+    ef = RecordingEmbeddingFunction()
+    collection_id = "test_query_many"
+    upsert(collection_id, ["one", "two", "three"], client=chroma_client, embedding_function=ef)
+    calls.clear()
+
+    results = query_many(
+        collection_id,
+        ["first question", "second question", "first  question"],
+        n_results=2,
+        client=chroma_client,
+        embedding_function=ef,
+    )
+
+    assert calls == [["first question", "second question"]]
+    assert len(results) == 3
+    for r in results:
+        assert len(r["documents"]) == 1
+        assert len(r["documents"][0]) == 2
+    assert results[2] is results[0]
+
+
+def test_query_with_path_prefix_and_attribute_filters_stays_in_scope(chroma_client, fake_embedding, tmp_path):
+    """path_prefix and attribute filters are applied inside the index; hits come only from the scope."""
+    for rel in ("runner/app.py", "runner/deep/a/b/c/mod.py", "crew_api/app.py", "tests/test_runner.py"):
+        f = tmp_path / rel
+        f.parent.mkdir(parents=True, exist_ok=True)
+        f.write_text(f"# {rel}\nvalue = 1\n")
+    chunks = chunk_directory(tmp_path)
+    collection_id = "test_scoped_query"
+    upsert(
+        collection_id,
+        [t for t, _ in chunks],
+        metadatas=[m for _, m in chunks],
+        client=chroma_client,
+        embedding_function=fake_embedding,
+    )
+
+    def rel_paths(**kwargs):
+        r = query(collection_id, "value", n_results=10, client=chroma_client, embedding_function=fake_embedding, **kwargs)
+        return sorted(m["rel_path"] for m in r["metadatas"][0])
+
+    assert rel_paths(path_prefix="runner/") == ["runner/app.py", "runner/deep/a/b/c/mod.py"]
+    assert rel_paths(path_prefix="runner/app.py") == ["runner/app.py"]
+    assert rel_paths(path_prefix="runner/deep/a/b/c") == ["runner/deep/a/b/c/mod.py"]
+    assert rel_paths(where=attribute_filter(kind="test")) == ["tests/test_runner.py"]
+    assert rel_paths(where=attribute_filter(package=["crew_api", "tests"], kind="source")) == ["crew_api/app.py"]
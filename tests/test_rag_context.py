@@ -0,0 +1,58 @@
+"""Tests for RAG context assembly: merge adjacent chunks, drop duplicates, pack to a token budget."""
+
+from crew_api.crew.tools.context import (
+    ContextChunk,
+    assemble_context,
+    chunks_from_results,
+    estimate_tokens,
+    merge_adjacent,
+)
+
+
+def _lines(start: int, end: int) -> str:
+    return "\n".join(f"line {i}" for i in range(start, end + 1))
+
+
+def test_merge_adjacent_merges_overlapping_and_touching_windows_by_path():
+    """Overlapping and adjacent ranges of one file become one chunk; other files stay separate."""
+    chunks = [
+        ContextChunk(_lines(5, 10), rank=1, path="a.py", start_line=5, end_line=10),
+        ContextChunk(_lines(1, 6), rank=0, path="a.py", start_line=1, end_line=6),
+        ContextChunk(_lines(11, 12), rank=3, path="a.py", start_line=11, end_line=12),
+        ContextChunk(_lines(1, 3), rank=2, path="b.py", start_line=1, end_line=3),
+    ]
+    merged = merge_adjacent(chunks)
+    assert [(c.path, c.start_line, c.end_line, c.rank) for c in merged] == [
+        ("a.py", 1, 12, 0),
+        ("b.py", 1, 3, 2),
+    ]
+    assert merged[0].text == _lines(1, 12)
+
+
+def test_assemble_context_drops_duplicates_and_respects_token_budget():
+    """Near-identical chunks from different files appear once; output stays within the budget."""
+    body = _lines(1, 40)
+    chunks = [
+        ContextChunk(body, rank=0, path="a.py", start_line=1, end_line=40),
+        ContextChunk(body, rank=1, path="copy/a.py", start_line=1, end_line=40),
+        ContextChunk(_lines(100, 400), rank=2, path="c.py", start_line=100, end_line=400),
+    ]
+    context = assemble_context(chunks, token_budget=300)
+    assert context.startswith("### a.py:1-40\n")
+    assert "copy/a.py" not in context
+    assert "### c.py:100-400" in context
+    assert context.endswith("...")
+    assert estimate_tokens(context) <= 300
+
+
+def test_chunks_from_results_reads_paths_and_line_ranges():
+    """Chroma result rows become ContextChunks with rank, path and line metadata."""
+    results = {
+        "documents": [["first", None, "third"]],
+        "metadatas": [[{"path": "x.py", "start_line": 1, "end_line": 2}, None, {}]],
+    }
+    chunks = chunks_from_results(results)
+    assert [(c.text, c.rank, c.path, c.start_line) for c in chunks] == [
+        ("first", 0, "x.py", 1),
+        ("third", 2, None, None),
+    ]
@@ -57,3 +57,41 @@ def test_rag_tool_returns_top_k_chunks_from_chroma(chroma_client, fake_embedding
     assert isinstance(result, str)
     assert "Chroma" in result
     assert "vector database" in result or "RAG" in result or "embedding" in result
+
+
+def test_rag_tool_merges_adjacent_windows_under_source_header(chroma_client, fake_embedding):
+    """Adjacent windows of one file come back as one section headed by path and merged line range."""
+    collection_id = "test_rag_context_merge"
+    upsert(
+        collection_id,
+        ["def a():\n    pass", "def b():\n    pass"],
+        metadatas=[
+            {"path": "pkg/mod.py", "start_line": 1, "end_line": 2},
+            {"path": "pkg/mod.py", "start_line": 3, "end_line": 4},
+        ],
+        client=chroma_client,
+        embedding_function=fake_embedding,
+    )
+
+    tool = RAGTool(client=chroma_client, embedding_function=fake_embedding, use_cache=False)
+    result = tool.run(query="functions", collection_id=collection_id)
+
+    assert result == "### pkg/mod.py:1-4\ndef a():\n    pass\ndef b():\n    pass"
+
+
+def test_rag_tool_accepts_query_list_and_deduplicates_across_result_sets(chroma_client, fake_embedding):
+    """A list of queries returns each matching chunk once, even when several queries hit it."""
+    collection_id = "test_rag_multi_query"
+    upsert(
+        collection_id,
+        ["alpha handler code", "beta parser code"],
+        metadatas=[{"path": "a.py"}, {"path": "b.py"}],
+        client=chroma_client,
+        embedding_function=fake_embedding,
+    )
+
+    tool = RAGTool(client=chroma_client, embedding_function=fake_embedding, use_cache=False)
+    result = tool.run(query=["how does alpha work", "where is beta"], collection_id=collection_id)
+
+    assert result.count("### a.py") == 1
+    assert result.count("### b.py") == 1
@@ -1,5 +1,6 @@
 """Tests for the runner service POST /execute endpoint."""
 
+import json
 import os
 
 import pytest
@@ -73,3 +74,24 @@ async def test_post_execute_rejects_command_not_in_allowlist():
     data = response.json()
     assert data.get("code") == "invalid_input"
     assert "error" in data
+
+
+@pytest.mark.asyncio
+async def test_post_execute_stream_emits_ndjson_lines_then_exit_record():
+    """POST /execute/stream returns NDJSON: start, one event per output line, then the exit record."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.post(
+            "/execute/stream",
+            json={
+                "project_path": "/tmp",
+                "command": ["python3", "-c", "import sys; print('one'); print('two'); print('err', file=sys.stderr)"],
+            },
+        )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0]["type"] == "start"
+    assert [e["data"] for e in events if e["type"] == "stdout"] == ["one\n", "two\n"]
+    assert [e["data"] for e in events if e["type"] == "stderr"] == ["err\n"]
+    assert events[-1] == {**events[-1], "type": "exit", "exit_code": 0, "timed_out": False}
@@ -0,0 +1,93 @@
+"""Tests for runner.affected: selecting the test modules that import changed files."""
+
+import json
+import os
+
+import pytest
+import httpx
+
+import runner.app as runner_app
+from runner.affected import AffectedTests
+from runner.result_cache import ResultCache, TreeFingerprinter
+
+
+@pytest.fixture(autouse=True)
+def fresh_runner_state(monkeypatch, tmp_path):
+    monkeypatch.setitem(os.environ, "ALLOWED_ROOT", "/tmp")
+    monkeypatch.setattr(runner_app, "_result_cache", ResultCache(0, 60))
+    monkeypatch.setattr(runner_app, "_affected", AffectedTests(tmp_path / "state", TreeFingerprinter()))
+
+
+def _project(root):
+    (root / "pkg").mkdir(parents=True)
+    (root / "pkg" / "__init__.py").write_text("")
+    (root / "pkg" / "core.py").write_text("VALUE = 1\n")
+    (root / "pkg" / "util.py").write_text("from .core import VALUE\n\ndef double():\n    return VALUE * 2\n")
+    (root / "pkg" / "other.py").write_text("NAME = 'other'\n")
+    (root / "tests").mkdir()
+    (root / "tests" / "test_util.py").write_text("from pkg import util\n\ndef test_double():\n    assert util.double() == 2\n")
+    (root / "tests" / "test_other.py").write_text("import pkg.other\n\ndef test_name():\n    assert pkg.other.NAME\n")
+
+
+def test_select_follows_imports_transitively_and_falls_back_to_full(tmp_path):
+    """A change reaches tests through relative and absolute imports; non-Python changes run everything."""
+    project = tmp_path / "proj"
+    _project(project)
+    selector = AffectedTests(tmp_path / "state", TreeFingerprinter())
+
+    first = selector.select(str(project))
+    assert first.mode == "full"
+    selector.record(str(project), first.snapshot)
+    assert selector.select(str(project)).mode == "none"
+
+    (project / "pkg" / "core.py").write_text("VALUE = 2\n")
+    selection = selector.select(str(project))
+    assert selection.mode == "affected"
+    assert selection.changed_files == [os.path.join("pkg", "core.py")]
+    assert selection.test_files == [os.path.join("tests", "test_util.py")]
+
+    (project / "setup.cfg").write_text("[metadata]\n")
+    assert selector.select(str(project)).mode == "full"
+
+
+@pytest.mark.asyncio
+async def test_execute_affected_runs_only_selected_tests_after_a_passing_baseline(tmp_path):
+    """The first affected run is a full run; after editing pkg/other.py only test_other.py runs."""
+    project = tmp_path / "proj"
+    _project(project)
+    body = {"project_path": str(project), "command": ["python3", "-m", "pytest", "-q"], "affected": True}
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        first = (await client.post("/execute", json=body)).json()
+        (project / "pkg" / "other.py").write_text("NAME = 'changed'\n")
+        second = (await client.post("/execute", json=body)).json()
+        third = (await client.post("/execute", json=body)).json()
+
+    assert first["selection"]["mode"] == "full" and "2 passed" in first["stdout"]
+    assert second["selection"]["mode"] == "affected"
+    assert second["selection"]["test_files"] == [os.path.join("tests", "test_other.py")]
+    assert "1 passed" in second["stdout"]
+    assert third["selection"]["mode"] == "none" and third["exit_code"] == 0
+
+
+@pytest.mark.asyncio
+async def test_execute_stream_affected_selects_tests_and_records_the_baseline(tmp_path):
+    """Streamed affected runs run only the selected tests, record a passing baseline and skip when nothing changed."""
+    project = tmp_path / "proj"
+    _project(project)
+    body = {"project_path": str(project), "command": ["python3", "-m", "pytest", "-q"], "affected": True}
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        runs = []
+        for edit in ("", "NAME = 'changed'\n", None):
+            if edit:
+                (project / "pkg" / "other.py").write_text(edit)
+            response = await client.post("/execute/stream", json=body)
+            runs.append([json.loads(line) for line in response.text.splitlines()])
+
+    stdout = ["".join(e["data"] for e in events if e["type"] == "stdout") for events in runs]
+    assert runs[0][-1]["selection"]["mode"] == "full" and "2 passed" in stdout[0]
+    assert runs[1][-1]["selection"]["test_files"] == [os.path.join("tests", "test_other.py")]
+    assert "1 passed" in stdout[1]
+    assert runs[2][-1]["selection"]["mode"] == "none" and runs[2][-1]["exit_code"] == 0
+    assert stdout[2].startswith("No affected tests")
@@ -0,0 +1,63 @@
+"""Tests for runner.capture: bounded head/tail output capture and spilled full output."""
+
+import os
+
+import pytest
+import httpx
+
+import runner.app as runner_app
+from runner.capture import OutputCapture, SpillStore
+from runner.config import RunnerSettings
+
+
+@pytest.fixture(autouse=True)
+def set_allowed_root(monkeypatch):
+    monkeypatch.setitem(os.environ, "ALLOWED_ROOT", "/tmp")
+
+
+def test_output_capture_keeps_head_and_tail_and_counts_bytes():
+    """Beyond head + tail bytes the middle is dropped and marked; small output is kept whole."""
+    capture = OutputCapture(head_bytes=4, tail_bytes=4)
+    for chunk in (b"ab", b"cdef", b"ghij", b"klmn"):
+        capture.write(chunk)
+    assert capture.total_bytes == 14
+    assert capture.truncated
+    assert capture.getvalue() == b"abcd\n... [6 bytes omitted] ...\nklmn"
+
+    small = OutputCapture(head_bytes=4, tail_bytes=4)
+    small.write(b"abcdefgh")
+    assert not small.truncated
+    assert small.getvalue() == b"abcdefgh"
+
+
+@pytest.mark.asyncio
+async def test_execute_truncates_output_and_serves_full_output_by_id(monkeypatch, tmp_path):
+    """POST /execute reports truncation and an output_id; GET /outputs returns the full stream."""
+    monkeypatch.setenv("RUNNER_OUTPUT_HEAD_BYTES", "10")
+    monkeypatch.setenv("RUNNER_OUTPUT_TAIL_BYTES", "10")
+    monkeypatch.setenv("RUNNER_OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(runner_app, "_runner_settings", RunnerSettings())
+    monkeypatch.setattr(runner_app, "_spill_store", SpillStore(tmp_path))
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.post(
+            "/execute",
+            json={"project_path": "/tmp", "command": ["python3", "-c", "print('x' * 100)"]},
+        )
+        data = response.json()
+        assert data["stdout_bytes"] == 101
+        assert data["stdout_truncated"] and not data["stderr_truncated"]
+        assert data["stdout"].startswith("x" * 10) and "[81 bytes omitted]" in data["stdout"]
+        assert data["output_id"]
+
+        full = await client.get(f"/outputs/{data['output_id']}/stdout")
+        assert full.status_code == 200
+        assert full.text == "x" * 100 + "\n"
+        assert (await client.get(f"/outputs/{data['output_id']}/secrets")).status_code == 404
+
+        small = await client.post(
+            "/execute", json={"project_path": "/tmp", "command": ["python3", "-c", "print('ok')"]}
+        )
+    assert small.json()["output_id"] is None
+    assert not small.json()["stdout_truncated"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f"{data['output_id']}.stderr", f"{data['output_id']}.stdout"]
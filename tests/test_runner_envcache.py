@@ -0,0 +1,90 @@
+"""Tests for runner.envcache: dependency environments built once per lockfile, LRU-evicted under a quota."""
+
+import asyncio
+import fcntl
+import json
+import os
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+import runner.app as runner_app
+from runner.config import RunnerSettings
+from runner.envcache import READY, EnvCache, detect
+from runner.executor import run_process
+
+
+def _count(**labels: str) -> float:
+    return REGISTRY.get_sample_value("runner_env_cache_requests_total", labels) or 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_runs_build_one_virtualenv_and_reuse_it(tmp_path):
+    """Racing runs share one build; the run's env resolves python to the venv; a lockfile change means a new env."""
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "requirements.txt").write_text("# no dependencies\n")
+    cache = EnvCache(tmp_path / "envs", max_bytes=10 * 1024**3, build_timeout=120)
+    built = _count(kind="venv", outcome="built")
+
+    async def run() -> tuple[list[dict], str]:
+        async with cache.prepare(str(project), None) as prepared:
+            env = {**os.environ, **prepared.env}
+            result = await run_process(["python3", "-c", "import sys; print(sys.prefix)"], env=env, timeout=30)
+            return prepared.used, result.stdout.decode().strip()
+
+    (used_a, prefix_a), (used_b, prefix_b) = await asyncio.gather(run(), run())
+    assert _count(kind="venv", outcome="built") == built + 1
+    assert sorted([used_a[0]["reused"], used_b[0]["reused"]]) == [False, True]
+    assert prefix_a == prefix_b and prefix_a.startswith(str(tmp_path / "envs" / "venv-"))
+    assert (tmp_path / "envs" / os.path.basename(prefix_a) / READY).exists()
+
+    first_key = detect(str(project))[0].key
+    (project / "requirements-dev.txt").write_text("# still nothing\n")
+    spec = detect(str(project))[0]
+    assert spec.lockfiles == ["requirements-dev.txt", "requirements.txt"] and spec.key != first_key
+
+
+def test_evict_removes_least_recently_used_entries_not_in_use(tmp_path):
+    """Beyond the quota the oldest entries go, except those a run holds a shared lock on."""
+    cache = EnvCache(tmp_path, max_bytes=250, build_timeout=1)
+    for age, name in enumerate(["venv-new", "npm-mid", "venv-old"]):
+        (tmp_path / name).mkdir()
+        ready = tmp_path / name / READY
+        ready.write_text(json.dumps({"kind": "venv", "lockfiles": [], "bytes": 100}))
+        os.utime(ready, (1000 - age, 1000 - age))
+    in_use = os.open(tmp_path / "venv-old.lock", os.O_RDWR | os.O_CREAT)
+    fcntl.flock(in_use, fcntl.LOCK_SH)
+    try:
+        cache.evict()
+    finally:
+        os.close(in_use)
+    assert sorted(p.name for p in tmp_path.iterdir() if p.is_dir()) == ["venv-new", "venv-old"]
+    assert REGISTRY.get_sample_value("runner_env_cache_bytes") == 200
+
+
+@pytest.mark.asyncio
+async def test_stream_runs_in_cached_environment_and_reports_build_failure(monkeypatch, tmp_path):
+    """POST /execute/stream with cached_deps runs inside the venv; a failed build streams its error and exit code."""
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "requirements.txt").write_text("# no dependencies\n")
+    monkeypatch.setenv("ALLOWED_ROOT", str(tmp_path))
+    monkeypatch.setattr(runner_app, "_runner_settings", RunnerSettings())
+    cache = EnvCache(tmp_path / "envs", max_bytes=10 * 1024**3, build_timeout=120)
+    monkeypatch.setattr(runner_app, "_env_cache", cache)
+    body = {
+        "project_path": str(project),
+        "command": ["python3", "-c", "import sys; print(sys.prefix)"],
+        "cached_deps": True,
+    }
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver", timeout=120) as client:
+        ok = [json.loads(line) for line in (await client.post("/execute/stream", json=body)).text.splitlines()]
+        (project / "requirements.txt").write_text("not a requirement !!!\n")
+        failed = [json.loads(line) for line in (await client.post("/execute/stream", json=body)).text.splitlines()]
+    assert [e["data"] for e in ok if e["type"] == "stdout"][0].startswith(str(tmp_path / "envs" / "venv-"))
+    assert ok[-1]["exit_code"] == 0 and ok[-1]["environments"][0]["kind"] == "venv"
+    assert "building the venv environment" in "".join(e["data"] for e in failed if e["type"] == "stderr")
+    assert failed[-1]["type"] == "exit" and failed[-1]["exit_code"] != 0
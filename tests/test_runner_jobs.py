@@ -0,0 +1,78 @@
+"""Tests for the Runner jobs API (POST/GET/DELETE /jobs) and runner_client.execute polling it."""
+
+import asyncio
+import os
+import time
+
+import pytest
+import httpx
+
+import runner.app as runner_app
+from crew_api import runner_client
+from runner.jobs import JobTable
+from runner.scheduler import Scheduler
+
+
+@pytest.fixture(autouse=True)
+def fresh_runner_state(monkeypatch):
+    monkeypatch.setitem(os.environ, "ALLOWED_ROOT", "/tmp")
+    monkeypatch.setattr(runner_app, "_jobs", JobTable())
+    monkeypatch.setattr(runner_app, "_scheduler", Scheduler(max_concurrent=2, max_queue=2))
+
+
+@pytest.mark.asyncio
+async def test_runner_client_execute_submits_job_and_polls_for_result():
+    """execute() creates one job and returns its result once GET /jobs reports it completed."""
+    transport = httpx.ASGITransport(app=runner_app.app)
+    result = await runner_client.execute(
+        project_path="/tmp",
+        command=["python3", "-c", "import time; time.sleep(0.2); print('done')"],
+        runner_url="http://testserver",
+        transport=transport,
+    )
+    assert result["exit_code"] == 0
+    assert result["stdout"] == "done\n"
+    assert len(runner_app._jobs) == 1
+
+
+@pytest.mark.asyncio
+async def test_delete_job_kills_running_process_group():
+    """DELETE /jobs/{id} cancels a running job promptly, frees its slot and reports it cancelled."""
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        created = await client.post(
+            "/jobs", json={"project_path": "/tmp", "command": ["python3", "-c", "import time; time.sleep(30)"]}
+        )
+        assert created.status_code == 202
+        job_id = created.json()["job_id"]
+        await asyncio.sleep(0.3)
+        assert (await client.get(f"/jobs/{job_id}")).json()["status"] == "running"
+
+        start = time.perf_counter()
+        cancelled = await client.delete(f"/jobs/{job_id}")
+        assert time.perf_counter() - start < 5
+        assert cancelled.json()["status"] == "cancelled"
+        assert cancelled.json()["result"] is None
+        assert runner_app._scheduler.running == 0
+        assert (await client.get("/jobs/unknown")).status_code == 404
+
+
+def test_job_table_drops_finished_jobs_after_ttl():
+    """cleanup() forgets jobs that finished more than ttl_seconds ago and keeps running ones."""
+
+    async def scenario():
+        table = JobTable(ttl_seconds=60)
+
+        async def quick(job):
+            return "ok"
+
+        done = table.start(quick)
+        await asyncio.wait({done.task})
+        slow = table.start(lambda job: asyncio.sleep(10))
+        done.finished_at -= 120
+        assert table.cleanup() == 1
+        assert table.get(done.id) is None and table.get(slow.id) is slow
+        await table.cancel(slow.id)
+        assert slow.status == "cancelled"
+
+    asyncio.run(scenario())
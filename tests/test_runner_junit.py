@@ -0,0 +1,67 @@
+"""Tests for runner.junit: streaming JUnit parsing into compact test reports."""
+
+import os
+
+import pytest
+import httpx
+
+import runner.app as runner_app
+from crew_api.test_report import format_test_report
+from runner.junit import summarize
+from runner.result_cache import ResultCache
+
+REPORT = """<?xml version="1.0" encoding="utf-8"?>
+<testsuites><testsuite name="pytest" tests="4">
+<testcase classname="tests.test_a" name="test_ok" time="0.010"/>
+<testcase classname="tests.test_a" name="test_bad" time="0.020">
+<failure message="assert 1 == 2">def test_bad():
+        x = 1
+&gt;       assert x == 2
+E       assert 1 == 2
+
+tests/test_a.py:5: AssertionError</failure></testcase>
+<testcase classname="tests.test_b" name="test_fixture" time="0.001"><error message="fixture 'db' not found">E       fixture 'db' not found</error></testcase>
+<testcase classname="tests.test_b" name="test_later" time="0"><skipped message="todo"/></testcase>
+</testsuite></testsuites>
+"""
+
+
+@pytest.fixture(autouse=True)
+def allowed_root(monkeypatch):
+    monkeypatch.setitem(os.environ, "ALLOWED_ROOT", "/tmp")
+    monkeypatch.setattr(runner_app, "_result_cache", ResultCache(0, 60))
+
+
+def test_summarize_counts_outcomes_and_keeps_only_failure_lines(tmp_path):
+    """Failures and errors are listed with their E lines and location; passes and skips are only counted."""
+    path = tmp_path / "report.xml"
+    path.write_text(REPORT)
+    report = summarize([path, tmp_path / "missing.xml"])
+    assert (report.total, report.passed, report.failed, report.errors, report.skipped) == (4, 1, 1, 1, 1)
+    assert report.duration_seconds == 0.031
+    bad, fixture = report.failures
+    assert bad.test_id == "tests.test_a::test_bad"
+    assert bad.traceback == "E       assert 1 == 2\ntests/test_a.py:5: AssertionError"
+    assert fixture.outcome == "error"
+
+
+@pytest.mark.asyncio
+async def test_execute_pytest_returns_structured_results_for_compact_summary(tmp_path):
+    """A pytest run carries tests with counts and the failing test, which formats far smaller than stdout."""
+    (tmp_path / "test_mod.py").write_text(
+        "import pytest\n\n"
+        "@pytest.mark.parametrize('n', range(30))\ndef test_many(n):\n    print('noise ' * 50)\n    assert n != 7\n"
+    )
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.post(
+            "/execute", json={"project_path": str(tmp_path), "command": ["python3", "-m", "pytest", "-rA"]}
+        )
+
+    data = response.json()
+    tests = data["tests"]
+    assert (tests["total"], tests["passed"], tests["failed"]) == (30, 29, 1)
+    assert tests["failures"][0]["test_id"] == "test_mod::test_many[7]"
+    summary = format_test_report(tests)
+    assert summary.startswith("29 passed, 1 failed in ")
+    assert len(summary) * 10 < len(data["stdout"])
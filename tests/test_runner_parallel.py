@@ -0,0 +1,57 @@
+"""Tests for runner.parallel: balanced pytest shards run as concurrent processes."""
+
+import os
+
+import pytest
+import httpx
+
+import runner.app as runner_app
+from runner.config import RunnerSettings
+from runner.parallel import DurationStore, balance, merge_exit_codes
+from runner.result_cache import ResultCache
+
+
+@pytest.fixture(autouse=True)
+def fresh_runner_state(monkeypatch, tmp_path):
+    monkeypatch.setitem(os.environ, "ALLOWED_ROOT", "/tmp")
+    monkeypatch.setattr(runner_app, "_result_cache", ResultCache(0, 60))
+    monkeypatch.setattr(runner_app, "_durations", DurationStore(tmp_path / "state"))
+    monkeypatch.setenv("RUNNER_MAX_SHARDS", "4")
+    monkeypatch.setattr(runner_app, "_runner_settings", RunnerSettings())
+
+
+def test_balance_spreads_known_durations_and_merge_prefers_failures():
+    """Longest tests go to the least loaded shard; merged exit codes keep failures and timeouts."""
+    durations = {"test_a::test_slow": 4.0, "test_a::test_mid": 2.0, "test_a::test_quick": 1.0, "test_a::test_tiny": 1.0}
+    ids = ["test_a.py::test_quick", "test_a.py::test_slow", "test_a.py::test_tiny", "test_a.py::test_mid"]
+    groups = balance(ids, durations, shards=2)
+    assert sorted(map(sorted, groups)) == [
+        ["test_a.py::test_mid", "test_a.py::test_quick", "test_a.py::test_tiny"],
+        ["test_a.py::test_slow"],
+    ]
+    assert balance(ids[:1], durations, shards=4) == [ids[:1]]
+    assert merge_exit_codes([0, 5]) == 0
+    assert merge_exit_codes([0, 1, 5]) == 1
+    assert merge_exit_codes([1, -1]) == -1
+
+
+@pytest.mark.asyncio
+async def test_execute_with_shards_runs_tests_in_parallel_and_records_durations(tmp_path):
+    """shards=2 runs each test once across two pytest processes, merges the exit code and stores timings."""
+    project = tmp_path / "proj"
+    project.mkdir()
+    (project / "test_one.py").write_text("def test_a():\n    pass\n\ndef test_b():\n    assert False\n")
+    (project / "test_two.py").write_text("def test_c():\n    pass\n")
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.post(
+            "/execute",
+            json={"project_path": str(project), "command": ["python3", "-m", "pytest", "-q"], "shards": 2},
+        )
+
+    data = response.json()
+    assert data["exit_code"] == 1
+    assert data["stdout"].count("[shard ") == 2
+    assert "1 failed" in data["stdout"]
+    durations = runner_app._durations.load(str(project))
+    assert set(durations) == {"test_one::test_a", "test_one::test_b", "test_two::test_c"}
@@ -0,0 +1,70 @@
+"""Tests for per-execution resource accounting and setrlimit caps."""
+
+import os
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+import runner.app as runner_app
+from runner.config import RunnerSettings
+from runner.executor import ResourceLimits, run_process
+
+ALLOCATE = "import sys; x = bytearray(int(sys.argv[1])); print('allocated')"
+
+
+@pytest.fixture(autouse=True)
+def set_allowed_root(monkeypatch):
+    monkeypatch.setitem(os.environ, "ALLOWED_ROOT", "/tmp")
+
+
+@pytest.mark.asyncio
+async def test_run_process_reports_usage_and_enforces_limits():
+    """wait4 usage covers the child's CPU and memory; RLIMIT_AS and RLIMIT_NOFILE stop a runaway child."""
+    result = await run_process(
+        ["python3", "-c", ALLOCATE + "; sum(range(3_000_000))", str(64 * 1024 * 1024)], timeout=30
+    )
+    assert result.exit_code == 0
+    assert result.cpu_user_seconds + result.cpu_system_seconds > 0
+    assert result.max_rss_bytes >= 64 * 1024 * 1024
+
+    limited = await run_process(
+        ["python3", "-c", ALLOCATE, str(1024 * 1024 * 1024)],
+        timeout=30,
+        limits=ResourceLimits(memory_bytes=512 * 1024 * 1024),
+    )
+    assert limited.exit_code == 1
+    assert b"MemoryError" in limited.stderr
+
+    files = await run_process(
+        ["python3", "-c", "fs = [open('/dev/null') for _ in range(64)]"],
+        timeout=30,
+        limits=ResourceLimits(open_files=32),
+    )
+    assert files.exit_code == 1
+    assert b"Too many open files" in files.stderr
+
+
+@pytest.mark.asyncio
+async def test_execute_returns_usage_and_observes_histograms(monkeypatch):
+    """POST /execute applies RUNNER_LIMIT_* and reports usage in the response and the Prometheus histograms."""
+    monkeypatch.setenv("RUNNER_LIMIT_MEMORY_BYTES", str(512 * 1024 * 1024))
+    monkeypatch.setattr(runner_app, "_runner_settings", RunnerSettings())
+    before = REGISTRY.get_sample_value("runner_execution_cpu_seconds_count") or 0
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        ok = await client.post(
+            "/execute",
+            json={"project_path": "/tmp", "command": ["python3", "-c", ALLOCATE, str(32 * 1024 * 1024)]},
+        )
+        too_big = await client.post(
+            "/execute",
+            json={"project_path": "/tmp", "command": ["python3", "-c", ALLOCATE, str(1024 * 1024 * 1024)]},
+        )
+    data = ok.json()
+    assert data["exit_code"] == 0
+    assert data["max_rss_bytes"] >= 32 * 1024 * 1024
+    assert data["cpu_user_seconds"] + data["cpu_system_seconds"] > 0
+    assert too_big.json()["exit_code"] == 1 and "MemoryError" in too_big.json()["stderr"]
+    assert REGISTRY.get_sample_value("runner_execution_cpu_seconds_count") == before + 2
+    assert REGISTRY.get_sample_value("runner_execution_output_bytes_sum") > 0
@@ -0,0 +1,103 @@
+"""Tests for runner.result_cache: tree fingerprints and cached POST /execute results."""
+
+import json
+import os
+
+import pytest
+import httpx
+
+import runner.app as runner_app
+from runner.result_cache import ResultCache, TreeFingerprinter
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setitem(os.environ, "ALLOWED_ROOT", "/tmp")
+    monkeypatch.setattr(runner_app, "_result_cache", ResultCache(16, 60))
+
+
+def test_fingerprint_follows_content_not_mtime_and_ignores_caches(tmp_path):
+    """Touching a file keeps the fingerprint; editing or adding one changes it; caches, envs, builds are ignored."""
+    (tmp_path / "mod.py").write_text("x = 1\n")
+    fingerprinter = TreeFingerprinter()
+    first = fingerprinter.fingerprint(str(tmp_path))
+
+    os.utime(tmp_path / "mod.py", ns=(1, 1))
+    (tmp_path / "__pycache__").mkdir()
+    (tmp_path / "__pycache__" / "mod.cpython-313.pyc").write_bytes(b"\0")
+    for generated in ("node_modules/dep", ".venv/lib", "build/lib", "dist"):
+        (tmp_path / generated).mkdir(parents=True)
+        (tmp_path / generated / "out.txt").write_text("generated")
+    assert fingerprinter.fingerprint(str(tmp_path)) == first
+
+    (tmp_path / "mod.py").write_text("x = 2\n")
+    second = fingerprinter.fingerprint(str(tmp_path))
+    assert second != first
+    (tmp_path / "new.py").write_text("")
+    assert fingerprinter.fingerprint(str(tmp_path)) != second
+
+
+def test_fingerprinter_remembers_only_files_of_the_latest_walk(tmp_path):
+    """Deleted files drop out of the remembered hashes; forget() drops the root."""
+    (tmp_path / "keep.py").write_text("")
+    (tmp_path / "gone.py").write_text("")
+    fingerprinter = TreeFingerprinter()
+    fingerprinter.fingerprint(str(tmp_path))
+    (tmp_path / "gone.py").unlink()
+    fingerprinter.fingerprint(str(tmp_path))
+    assert list(fingerprinter._roots[str(tmp_path)]) == [str(tmp_path / "keep.py")]
+    fingerprinter.forget(str(tmp_path))
+    assert fingerprinter._roots == {}
+
+
+@pytest.mark.asyncio
+async def test_execute_serves_unchanged_tree_from_cache_with_bypass(tmp_path):
+    """A repeated run is served from the cache; use_cache=false (not cached itself) or an edited tree runs again."""
+    (tmp_path / "test_x.py").write_text("")
+    body = {"project_path": str(tmp_path), "command": ["python3", "-c", "import uuid; print(uuid.uuid4())"]}
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        first = (await client.post("/execute", json=body)).json()
+        second = (await client.post("/execute", json=body)).json()
+        bypassed = (await client.post("/execute", json={**body, "use_cache": False})).json()
+        after_bypass = (await client.post("/execute", json=body)).json()
+        (tmp_path / "test_x.py").write_text("def test_x(): pass\n")
+        edited = (await client.post("/execute", json=body)).json()
+
+    assert not first["cached"]
+    assert second["cached"] and second["stdout"] == first["stdout"]
+    assert not bypassed["cached"] and bypassed["stdout"] != first["stdout"]
+    assert after_bypass["cached"] and after_bypass["stdout"] == first["stdout"]  # bypassed runs are not stored
+    assert not edited["cached"] and edited["stdout"] not in (first["stdout"], bypassed["stdout"])
+
+
+@pytest.mark.asyncio
+async def test_execute_without_use_cache_skips_fingerprinting(monkeypatch, tmp_path):
+    """use_cache=false runs never walk the project tree."""
+    fingerprinter = TreeFingerprinter()
+    monkeypatch.setattr(runner_app, "_fingerprinter", fingerprinter)
+    body = {"project_path": str(tmp_path), "command": ["python3", "-c", "print(1)"], "use_cache": False}
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        assert (await client.post("/execute", json=body)).json()["exit_code"] == 0
+        assert (await client.post("/jobs", json=body)).status_code == 202
+    assert fingerprinter._roots == {}
+
+
+@pytest.mark.asyncio
+async def test_execute_stream_replays_cached_results_and_rejects_shards(tmp_path):
+    """/execute/stream replays a cache hit as events (cached=true), runs afresh without use_cache; shards > 1 is 400."""
+    (tmp_path / "test_x.py").write_text("")
+    body = {"project_path": str(tmp_path), "command": ["python3", "-c", "import uuid; print(uuid.uuid4())"]}
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        ran = (await client.post("/execute", json=body)).json()
+        replayed = [json.loads(line) for line in (await client.post("/execute/stream", json=body)).text.splitlines()]
+        fresh = (await client.post("/execute/stream", json={**body, "use_cache": False})).text.splitlines()
+        sharded = await client.post("/execute/stream", json={**body, "command": ["pytest"], "shards": 2})
+
+    assert [e["type"] for e in replayed] == ["start", "stdout", "exit"]
+    assert replayed[1]["data"] == ran["stdout"] and replayed[-1]["cached"] is True
+    fresh_events = [json.loads(line) for line in fresh]
+    assert fresh_events[1]["data"] != ran["stdout"] and "cached" not in fresh_events[-1]
+    assert sharded.status_code == 400 and sharded.json()["code"] == "invalid_input"
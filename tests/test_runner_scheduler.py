@@ -0,0 +1,124 @@
+"""Tests for runner.scheduler and runner.executor: bounded async execution with a wait queue."""
+
+import asyncio
+import os
+import sys
+
+import pytest
+import httpx
+from prometheus_client import REGISTRY
+
+import runner.app as runner_app
+from runner.config import RunnerSettings
+from runner.executor import run_process
+from runner.scheduler import AGENT, INTERACTIVE, QueueFull, Scheduler
+
+PRINT_START = "import sys, time; print(time.time()); time.sleep(float(sys.argv[1]))"
+
+
+@pytest.fixture(autouse=True)
+def set_allowed_root(monkeypatch):
+    monkeypatch.setitem(os.environ, "ALLOWED_ROOT", "/tmp")
+
+
+@pytest.mark.asyncio
+async def test_scheduler_limits_concurrency_queues_fifo_and_rejects_when_full():
+    """One slot, one queue place: the second caller waits, the third gets QueueFull, release hands over."""
+    scheduler = Scheduler(max_concurrent=1, max_queue=1)
+    await scheduler.acquire()
+    waiter = asyncio.create_task(scheduler.acquire())
+    await asyncio.sleep(0)
+    assert scheduler.queued == 1 and not waiter.done()
+
+    with pytest.raises(QueueFull) as exc_info:
+        await scheduler.acquire()
+    assert exc_info.value.retry_after >= 1
+
+    scheduler.release(run_seconds=1.0)
+    assert await waiter >= 0.0
+    assert scheduler.running == 1 and scheduler.queued == 0
+    scheduler.release()
+    assert scheduler.running == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_serves_interactive_first_then_projects_by_weighted_share():
+    """A later interactive run jumps the agent queue; project a (weight 4) gets more of the slots than b."""
+    scheduler = Scheduler(max_concurrent=1, max_queue=10, weights={"a": 4})
+    await scheduler.acquire("x")
+    order = []
+
+    async def run(project, priority, name):
+        await scheduler.acquire(project, priority)
+        order.append(name)
+
+    tasks = [asyncio.create_task(run("a", AGENT, f"a{i}")) for i in (1, 2, 3)]
+    tasks += [asyncio.create_task(run("b", AGENT, f"b{i}")) for i in (1, 2)]
+    tasks.append(asyncio.create_task(run("c", INTERACTIVE, "c1")))
+    await asyncio.sleep(0)
+    assert scheduler.queued == 6
+    for project in ["x", "c", "a", "b", "a", "a", "b"]:
+        scheduler.release(project=project)
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    assert order == ["c1", "a1", "b1", "a2", "a3", "b2"]
+    assert scheduler.running == 0 and scheduler.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_per_project_limit_lets_other_projects_run(monkeypatch, tmp_path):
+    """With RUNNER_MAX_PER_PROJECT=1 a project's second run waits while another project's run starts at once."""
+    busy, other = tmp_path / "busy", tmp_path / "other"
+    busy.mkdir()
+    other.mkdir()
+    monkeypatch.setenv("ALLOWED_ROOT", str(tmp_path))
+    monkeypatch.setenv("RUNNER_MAX_CONCURRENT", "2")
+    monkeypatch.setenv("RUNNER_MAX_PER_PROJECT", "1")
+    monkeypatch.setattr(runner_app, "_runner_settings", RunnerSettings())
+    monkeypatch.setattr(runner_app, "_scheduler", None)
+    wait_label = {"project": str(busy.resolve()), "priority": "agent"}
+    waits = REGISTRY.get_sample_value("runner_project_queue_wait_seconds_count", wait_label) or 0
+
+    def post(client, project, seconds, priority="agent"):
+        body = {"project_path": str(project), "command": ["python3", "-c", PRINT_START, seconds]}
+        return client.post("/execute", json={**body, "use_cache": False, "priority": priority})
+
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        first, second = asyncio.create_task(post(client, busy, "0.8")), asyncio.create_task(post(client, busy, "0.1"))
+        await asyncio.sleep(0.2)
+        assert REGISTRY.get_sample_value("runner_project_queue_depth", {"project": str(busy.resolve())}) == 1
+        third = await post(client, other, "0", "interactive")
+        responses = [await first, await second, third]
+    starts = [float(r.json()["stdout"]) for r in responses]
+    assert starts[2] < starts[1] and starts[1] - starts[0] >= 0.7
+    assert REGISTRY.get_sample_value("runner_project_queue_wait_seconds_count", wait_label) == waits + 2
+
+
+@pytest.mark.asyncio
+async def test_run_process_timeout_kills_group_and_keeps_partial_output():
+    """A timed-out run returns exit_code -1 with the output printed before the timeout."""
+    result = await run_process(
+        [sys.executable, "-c", "import time; print('started', flush=True); time.sleep(30)"],
+        timeout=1,
+    )
+    assert result.timed_out
+    assert result.exit_code == -1
+    assert result.stdout == b"started\n"
+    assert result.duration_seconds < 10
+
+
+@pytest.mark.asyncio
+async def test_post_execute_returns_429_with_retry_after_when_queue_is_full(monkeypatch):
+    """With every slot busy and no queue room, POST /execute is rejected with 429 and Retry-After."""
+    scheduler = Scheduler(max_concurrent=1, max_queue=0)
+    await scheduler.acquire()
+    monkeypatch.setattr(runner_app, "_scheduler", scheduler)
+
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.post("/execute", json={"project_path": "/tmp", "command": ["python3", "-c", "pass"]})
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert response.json()["detail"]["code"] == "queue_full"
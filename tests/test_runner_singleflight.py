@@ -0,0 +1,62 @@
+"""Tests for runner.singleflight: identical concurrent executions share one run."""
+
+import asyncio
+import os
+
+import pytest
+import httpx
+from prometheus_client import REGISTRY
+
+import runner.app as runner_app
+from runner.jobs import JobTable
+from runner.result_cache import ResultCache
+from runner.scheduler import Scheduler
+from runner.singleflight import SingleFlight
+
+
+@pytest.fixture(autouse=True)
+def fresh_runner_state(monkeypatch):
+    monkeypatch.setitem(os.environ, "ALLOWED_ROOT", "/tmp")
+    monkeypatch.setattr(runner_app, "_flights", SingleFlight())
+    monkeypatch.setattr(runner_app, "_jobs", JobTable())
+    monkeypatch.setattr(runner_app, "_result_cache", ResultCache(0, 60))
+    monkeypatch.setattr(runner_app, "_scheduler", Scheduler(max_concurrent=4, max_queue=4))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_executes_share_one_process(tmp_path):
+    """Three identical POST /execute requests in flight together run the command once."""
+    body = {
+        "project_path": str(tmp_path),
+        "command": ["python3", "-c", "import time, uuid; time.sleep(0.5); print(uuid.uuid4())"],
+    }
+    before = REGISTRY.get_sample_value("runner_coalesced_requests_total")
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        responses = await asyncio.gather(*(client.post("/execute", json=body) for _ in range(3)))
+
+    results = [r.json() for r in responses]
+    assert len({r["stdout"] for r in results}) == 1
+    assert sorted(r["coalesced"] for r in results) == [False, True, True]
+    assert REGISTRY.get_sample_value("runner_coalesced_requests_total") - before == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_shared_job_keeps_the_run_for_the_other(tmp_path):
+    """DELETE on one of two coalesced jobs leaves the shared run going; deleting the last one stops it."""
+    body = {"project_path": str(tmp_path), "command": ["python3", "-c", "import time; time.sleep(30)"]}
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        first = (await client.post("/jobs", json=body)).json()["job_id"]
+        second = (await client.post("/jobs", json=body)).json()["job_id"]
+        await asyncio.sleep(0.3)
+        assert (await client.get(f"/jobs/{second}")).json()["status"] == "running"
+
+        assert (await client.delete(f"/jobs/{first}")).json()["status"] == "cancelled"
+        assert (await client.get(f"/jobs/{second}")).json()["status"] == "running"
+        assert len(runner_app._flights) == 1
+
+        assert (await client.delete(f"/jobs/{second}")).json()["status"] == "cancelled"
+        await asyncio.sleep(0.1)
+    assert len(runner_app._flights) == 0
+    assert runner_app._scheduler.running == 0
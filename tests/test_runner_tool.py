@@ -20,3 +20,26 @@ def test_runner_tool_returns_exit_code_and_summary():
     assert result is not None
     assert isinstance(result, str)
     assert "0" in result or "passed" in result or "ok" in result
+
+
+def test_runner_tool_summarizes_structured_tests_instead_of_raw_output():
+    """With a structured test report the tool returns counts and failures, not the raw stdout."""
+    def fake_execute_sync(project_path: str, command: list[str]):
+        return {
+            "exit_code": 1,
+            "stdout": "noise\n" * 500,
+            "stderr": "",
+            "duration_seconds": 2,
+            "tests": {
+                "total": 3, "passed": 2, "failed": 1, "errors": 0, "skipped": 0, "duration_seconds": 1.5,
+                "failures": [
+                    {"test_id": "tests.test_a::test_b", "outcome": "failed", "message": "assert 1 == 2",
+                     "traceback": "E   assert 1 == 2"},
+                ],
+            },
+        }
+
+    result = RunnerTool(execute_sync=fake_execute_sync).run(project_path="/tmp", command=["pytest"])
+    assert "2 passed, 1 failed in 1.5s" in result
+    assert "FAILED tests.test_a::test_b: assert 1 == 2" in result
+    assert "noise" not in result
@@ -0,0 +1,74 @@
+"""Tests for runner.warm: running python commands in forks of a warm worker."""
+
+import os
+import sys
+
+import pytest
+from prometheus_client import REGISTRY
+
+from runner.executor import ResourceLimits, run_process
+from runner.result_cache import TreeFingerprinter
+from runner.warm import WarmPool, warm_command
+
+
+def _count(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_warm_command_mirrors_interpreter_invocation(tmp_path):
+    """-m, -c and scripts run warm with the interpreter's argv; interpreter options and other tools start cold."""
+    env = {"PATH": os.path.dirname(sys.executable)}
+    exe = os.path.basename(sys.executable)
+    module = warm_command([exe, "-m", "pytest", "-q"], env)
+    assert (module.interpreter, module.mode, module.target, module.argv) == (sys.executable, "module", "pytest", ["pytest", "-q"])
+    code = warm_command([exe, "-c", "print(1)", "a"], env)
+    assert (code.mode, code.target, code.argv) == ("code", "print(1)", ["-c", "a"])
+    script = warm_command([exe, "run.py", "x"], env)
+    assert (script.mode, script.target, script.argv) == ("script", "run.py", ["run.py", "x"])
+    assert warm_command([exe, "-u", "run.py"], env) is None
+    assert warm_command(["node", "index.js"], env) is None
+
+    launcher = tmp_path / "pytest"
+    launcher.write_text(f"#!{sys.executable}\nimport sys\n")
+    launcher.chmod(0o755)
+    console = warm_command(["pytest", "-x"], {"PATH": str(tmp_path)})
+    assert (console.interpreter, console.target, console.argv) == (sys.executable, "pytest", [str(launcher), "-x"])
+    assert console.path0 == str(tmp_path)
+
+
+@pytest.mark.asyncio
+async def test_pool_forks_per_run_and_recycles_on_file_changes(tmp_path):
+    """Runs reuse one worker with their own cwd, env, exit code and limits; editing the project starts a new one."""
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "helper.py").write_text("VALUE = 1\n")
+    pool = WarmPool(tmp_path / "warm", TreeFingerprinter(), preload=("helper",))
+    spawn = pool.spawner(str(project))
+    command = [sys.executable, "-c", "import os, sys, helper; print(os.getcwd(), os.environ['RUN'], helper.VALUE); sys.exit(3)"]
+    started = _count("runner_warm_workers_started_total")
+    try:
+        for run in ("a", "b"):
+            result = await run_process(command, cwd=str(project), env={**os.environ, "RUN": run}, spawn=spawn, timeout=30)
+            assert result.exit_code == 3
+            assert result.stdout.decode() == f"{project} {run} 1\n"
+        assert _count("runner_warm_workers_started_total") == started + 1
+
+        limited = await run_process(
+            [sys.executable, "-c", "bytearray(1024 ** 3)"],
+            cwd=str(project),
+            spawn=spawn,
+            timeout=30,
+            limits=ResourceLimits(memory_bytes=512 * 1024 * 1024),
+        )
+        assert limited.exit_code == 1 and b"MemoryError" in limited.stderr
+
+        timed_out = await run_process([sys.executable, "-c", "import time; time.sleep(30)"], spawn=spawn, timeout=0.5)
+        assert timed_out.timed_out and timed_out.exit_code == -1
+
+        (project / "helper.py").write_text("VALUE = 2\n")
+        result = await run_process(command, cwd=str(project), env={**os.environ, "RUN": "c"}, spawn=spawn, timeout=30)
+        assert result.stdout.decode() == f"{project} c 2\n"
+        assert _count("runner_warm_workers_started_total") == started + 2
+        assert len(pool) == 1
+    finally:
+        pool.close()
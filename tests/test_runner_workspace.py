@@ -0,0 +1,111 @@
+"""Tests for runner.workspace: isolated per-run clones of a project tree."""
+
+import asyncio
+import json
+import os
+
+import httpx
+import pytest
+from structlog.testing import capture_logs
+
+import runner.app as runner_app
+from runner.config import RunnerSettings
+from runner.workspace import Workspaces, clone_tree
+
+WRITE_ARTIFACT = (
+    "import os, sys, time; os.makedirs('build', exist_ok=True); "
+    "open('build/out.txt', 'w').write(sys.argv[1]); time.sleep(0.3); print(open('build/out.txt').read(), os.getcwd())"
+)
+
+
+def _project(root):
+    (root / "pkg").mkdir(parents=True)
+    (root / "pkg" / "mod.py").write_text("X = 1\n")
+    (root / "pkg" / "__pycache__").mkdir()
+    (root / "pkg" / "__pycache__" / "mod.pyc").write_bytes(b"stale")
+    (root / "node_modules" / "dep").mkdir(parents=True)
+    (root / "link.py").symlink_to("pkg/mod.py")
+    return root
+
+
+@pytest.mark.parametrize("fallback", ["hardlink", "copy"])
+def test_clone_tree_links_files_skips_caches_and_shares_environments(tmp_path, fallback):
+    """Files are cloned (reflink, else hardlink or copy), caches skipped, node_modules symlinked, links kept."""
+    src = _project(tmp_path / "src")
+    counts = clone_tree(str(src), str(tmp_path / "dst"), fallback=fallback)
+    dst = tmp_path / "dst"
+    assert (dst / "pkg" / "mod.py").read_text() == "X = 1\n"
+    assert not (dst / "pkg" / "__pycache__").exists()
+    assert os.readlink(dst / "node_modules") == str(src / "node_modules")
+    assert os.readlink(dst / "link.py") == "pkg/mod.py"
+    same_inode = os.stat(dst / "pkg" / "mod.py").st_ino == os.stat(src / "pkg" / "mod.py").st_ino
+    assert counts["reflink"] or same_inode == (fallback == "hardlink")
+    assert counts["symlink"] == 2
+
+    (dst / "pkg" / "new.py").write_text("")
+    (dst / "pkg" / "mod.py").unlink()
+    assert not (src / "pkg" / "new.py").exists() and (src / "pkg" / "mod.py").exists()
+
+
+@pytest.mark.asyncio
+async def test_isolated_runs_do_not_clobber_each_other(monkeypatch, tmp_path):
+    """Concurrent isolated runs each see their own build/ artifact; the project is untouched and clones are removed.
+
+    Responses count the clone's files by method; falling back to hardlinks is logged once.
+    """
+    project = _project(tmp_path / "proj")
+    monkeypatch.setenv("ALLOWED_ROOT", str(tmp_path))
+    monkeypatch.setattr(runner_app, "_runner_settings", RunnerSettings())
+    monkeypatch.setattr(runner_app, "_workspaces", Workspaces(tmp_path / "workspaces"))
+    transport = httpx.ASGITransport(app=runner_app.app)
+    with capture_logs() as logs:
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            responses = await asyncio.gather(
+                *(
+                    client.post(
+                        "/execute",
+                        json={
+                            "project_path": str(project),
+                            "command": ["python3", "-c", WRITE_ARTIFACT, run],
+                            "isolated": True,
+                            "use_cache": False,
+                        },
+                    )
+                    for run in ("first", "second")
+                )
+            )
+    outputs = [r.json()["stdout"].split() for r in responses]
+    assert [out[0] for out in outputs] == ["first", "second"]
+    assert all(out[1].startswith(str(tmp_path / "workspaces")) and out[1].endswith("/proj") for out in outputs)
+    assert not (project / "build").exists()
+    assert list((tmp_path / "workspaces").iterdir()) == []
+    files = [r.json()["workspace"] for r in responses]
+    assert all(f["symlink"] == 2 and f["reflink"] + f["hardlink"] + f["copy"] == 1 for f in files)
+    hardlinked = any(f["hardlink"] for f in files)
+    assert [e["event"] for e in logs].count("workspace_hardlinked") == int(hardlinked)  # once per Runner
+
+
+@pytest.mark.asyncio
+async def test_isolated_stream_runs_in_a_clone(monkeypatch, tmp_path):
+    """POST /execute/stream with isolated writes into a clone (removed afterwards), never into the project."""
+    project = _project(tmp_path / "proj")
+    monkeypatch.setenv("ALLOWED_ROOT", str(tmp_path))
+    monkeypatch.setattr(runner_app, "_runner_settings", RunnerSettings())
+    monkeypatch.setattr(runner_app, "_workspaces", Workspaces(tmp_path / "workspaces"))
+    transport = httpx.ASGITransport(app=runner_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.post(
+            "/execute/stream",
+            json={
+                "project_path": str(project),
+                "command": ["python3", "-c", WRITE_ARTIFACT, "streamed"],
+                "cwd": str(project),
+                "isolated": True,
+            },
+        )
+    events = [json.loads(line) for line in response.text.splitlines()]
+    out = "".join(e["data"] for e in events if e["type"] == "stdout").split()
+    assert out[0] == "streamed" and out[1].startswith(str(tmp_path / "workspaces"))
+    assert events[-1]["type"] == "exit" and events[-1]["exit_code"] == 0 and events[-1]["workspace"]["symlink"] == 2
+    assert not (project / "build").exists()
+    assert list((tmp_path / "workspaces").iterdir()) == []